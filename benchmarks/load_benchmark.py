@@ -0,0 +1,199 @@
+"""
+End-to-end load benchmark against the in-process BigQuery stand-in (test/fake_bigquery_server.py).
+
+Every case loads a synthetic CSV file through `Writer.write_table_sync` or `App.action_run` in a fresh process
+and records the throughput, the number of API requests and the peak RSS.
+
+    python -m benchmarks.load_benchmark --sizes 1,10,100 --latency 0.05 --bandwidth 100 --output results.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+
+MB = 1024 * 1024
+SCENARIO_WRITER = 'writer'
+SCENARIO_APP = 'app'
+PROJECT = 'project'
+DATASET = 'benchmark'
+TABLE = 'table'
+ITEMS = [
+    {'name': 'id', 'dbName': 'id', 'type': 'INTEGER'},
+    {'name': 'name', 'dbName': 'name', 'type': 'STRING'},
+    {'name': 'amount', 'dbName': 'amount', 'type': 'FLOAT'},
+    {'name': 'note', 'dbName': 'note', 'type': 'STRING'},
+    {'name': 'created', 'dbName': 'created', 'type': 'TIMESTAMP'},
+]
+
+
+def generate_csv(csv_file_path: str, size: int) -> int:
+    """
+    Writes a CSV file of at least `size` bytes made of whole records, returns the actual size.
+    """
+    rows = []
+    for i in range(1000):
+        note = '"multi\nline ""quoted"" note"' if i % 10 == 0 else 'note %s' % i
+        rows.append('%s,"name %s",%s.%s,%s,2024-01-01 00:00:%02d\n' % (i, i, i, i % 100, note, i % 60))
+    block = ''.join(rows).encode()
+    with open(csv_file_path, 'wb') as csv_file:
+        csv_file.write(b'"id","name","amount","note","created"\n')
+        while csv_file.tell() < size:
+            csv_file.write(block)
+        return csv_file.tell()
+
+
+def prepare_data_dir(data_dir: str, size: int, table_options: dict, token_uri: str) -> str:
+    tables_path = os.path.join(data_dir, 'in', 'tables')
+    os.makedirs(tables_path, exist_ok=True)
+    os.makedirs(os.path.join(data_dir, 'out'), exist_ok=True)
+    csv_file_path = os.path.join(tables_path, 'in.c-benchmark.%s.csv' % TABLE)
+    generate_csv(csv_file_path, size)
+    with open(csv_file_path + '.manifest', 'w') as manifest:
+        json.dump({'columns': list(map(lambda item: item['name'], ITEMS))}, manifest)
+
+    table_definition = dict({'tableId': 'in.c-benchmark.%s' % TABLE, 'dbName': TABLE, 'items': ITEMS},
+                            **table_options)
+    with open(os.path.join(data_dir, 'config.json'), 'w') as config:
+        json.dump({
+            'storage': {'input': {'tables': [{
+                'source': table_definition['tableId'],
+                'destination': os.path.basename(csv_file_path)
+            }]}},
+            'parameters': {
+                'dataset': DATASET,
+                'service_account': get_service_account(token_uri),
+                'tables': [table_definition]
+            },
+            'action': 'run'
+        }, config)
+    return csv_file_path
+
+
+def get_service_account(token_uri: str) -> dict:
+    import rsa
+    _, private_key = rsa.newkeys(2048)
+    return {
+        '#private_key': private_key.save_pkcs1().decode(),
+        'client_email': 'benchmark@%s.iam.gserviceaccount.com' % PROJECT,
+        'token_uri': token_uri,
+        'project_id': PROJECT
+    }
+
+
+def run_case(scenario: str, size: int, work_dir: str, options: dict) -> dict:
+    from test.fake_bigquery_server import FakeBigqueryServer
+
+    data_dir = tempfile.mkdtemp(dir=work_dir)
+    try:
+        with FakeBigqueryServer(
+                projects=[PROJECT],
+                latency=options['latency'],
+                bandwidth=options['bandwidth'],
+                job_duration=options['job_duration']
+        ) as server:
+            csv_file_path = prepare_data_dir(data_dir, size, options['table_options'], server.url + '/token')
+            input_size = os.path.getsize(csv_file_path)
+            with open(os.path.join(data_dir, 'config.json')) as config:
+                table_definition = json.load(config)['parameters']['tables'][0]
+
+            started = time.monotonic()
+            if scenario == SCENARIO_APP:
+                os.environ['KBC_DATADIR'] = data_dir
+                os.environ['BIGQUERY_EMULATOR_HOST'] = server.url
+                from google_bigquery_writer.app import App
+                App().run()
+            else:
+                from google_bigquery_writer.writer import Writer
+                Writer(server.create_client(PROJECT)).write_table_sync(
+                    csv_file_path,
+                    DATASET,
+                    table_definition,
+                    polling_delay=1
+                )
+            seconds = time.monotonic() - started
+
+            return {
+                'scenario': scenario,
+                'size_mb': round(input_size / MB, 2),
+                'seconds': round(seconds, 3),
+                'mb_per_s': round(input_size / MB / seconds, 2),
+                'rpc_count': server.rpc_count,
+                'rpc_counts': dict(server.rpc_counts),
+                'uploaded_mb': round(server.uploaded_bytes / MB, 2),
+                # ru_maxrss is in kilobytes on Linux
+                'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+                'peak_children_rss_mb': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+            }
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def _run_case_process(queue, scenario: str, size: int, work_dir: str, options: dict) -> None:
+    try:
+        queue.put(run_case(scenario, size, work_dir, options))
+    except BaseException as err:
+        queue.put({'scenario': scenario, 'size_mb': round(size / MB, 2), 'error': '%s: %s' % (
+            type(err).__name__,
+            str(err)
+        )})
+
+
+def run_benchmarks(scenarios: list, sizes_mb: list, work_dir: str, options: dict) -> list:
+    """
+    Every case runs in a spawned process, so the peak RSS of one case is not inherited by the next one.
+    """
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for scenario in scenarios:
+        for size_mb in sizes_mb:
+            queue = context.Queue()
+            process = context.Process(
+                target=_run_case_process,
+                args=(queue, scenario, int(size_mb * MB), work_dir, options)
+            )
+            process.start()
+            result = queue.get()
+            process.join()
+            print(json.dumps(result))
+            results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1,10,100,1000,10000', help='CSV sizes in MB, comma separated')
+    parser.add_argument('--scenarios', default='%s,%s' % (SCENARIO_WRITER, SCENARIO_APP),
+                        help='writer (Writer.write_table_sync), app (App.action_run) or both')
+    parser.add_argument('--latency', type=float, default=0.0, help='added to every request, seconds')
+    parser.add_argument('--bandwidth', type=float, default=0.0, help='upload bandwidth limit, MB/s (0 unlimited)')
+    parser.add_argument('--job-duration', type=float, default=0.0, help='load job run time, seconds')
+    parser.add_argument('--table-options', default='{}', help='JSON merged into the table definition')
+    parser.add_argument('--work-dir', default=None, help='directory for the synthetic data')
+    parser.add_argument('--output', default=None, help='JSON file the results are written into')
+    args = parser.parse_args()
+
+    options = {
+        'latency': args.latency,
+        'bandwidth': args.bandwidth * MB or None,
+        'job_duration': args.job_duration,
+        'table_options': json.loads(args.table_options),
+    }
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='bigquery-writer-benchmark-')
+    os.makedirs(work_dir, exist_ok=True)
+    results = run_benchmarks(
+        args.scenarios.split(','),
+        list(map(float, args.sizes.split(','))),
+        work_dir,
+        options
+    )
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
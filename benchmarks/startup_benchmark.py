@@ -0,0 +1,117 @@
+"""
+Cold-start benchmark of main.py, every run is a fresh interpreter started with `-X importtime`.
+
+Scenarios: `import` (import of the app module only), `config_error` (a run failing on the configuration validation)
+and `list` (the list action against the in-process BigQuery stand-in). The median wall time of every scenario is
+reported together with the modules taking the most of the import time.
+
+    python -m benchmarks.startup_benchmark --runs 10 --top 15 --output startup.json
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.load_benchmark import PROJECT, prepare_data_dir
+
+SCENARIO_IMPORT = 'import'
+SCENARIO_CONFIG_ERROR = 'config_error'
+SCENARIO_LIST = 'list'
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$')
+
+
+def parse_import_times(output: str) -> dict:
+    """
+    Cumulative import time (seconds) of every module imported directly by the started script, not by another module.
+    """
+    import_times = {}
+    for line in output.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match and not match.group(3):
+            import_times[match.group(4)] = int(match.group(2)) / 1_000_000
+    return import_times
+
+
+def get_command(scenario: str) -> list:
+    if scenario == SCENARIO_IMPORT:
+        return [sys.executable, '-X', 'importtime', '-c', 'import google_bigquery_writer.app']
+    return [sys.executable, '-X', 'importtime', os.path.join(ROOT_PATH, 'main.py')]
+
+
+def prepare_config(scenario: str, data_dir: str, token_uri: str) -> None:
+    prepare_data_dir(data_dir, 1024, {}, token_uri)
+    config_path = os.path.join(data_dir, 'config.json')
+    with open(config_path) as config_file:
+        config = json.load(config_file)
+    if scenario == SCENARIO_CONFIG_ERROR:
+        del config['parameters']['dataset']
+    config['action'] = 'list' if scenario == SCENARIO_LIST else 'run'
+    with open(config_path, 'w') as config_file:
+        json.dump(config, config_file)
+
+
+def run_scenario(scenario: str, runs: int, work_dir: str) -> dict:
+    from test.fake_bigquery_server import FakeBigqueryServer
+
+    data_dir = tempfile.mkdtemp(dir=work_dir)
+    try:
+        with FakeBigqueryServer(projects=[PROJECT]) as server:
+            prepare_config(scenario, data_dir, server.url + '/token')
+            env = dict(os.environ, KBC_DATADIR=data_dir, BIGQUERY_EMULATOR_HOST=server.url)
+            env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT_PATH, env.get('PYTHONPATH')]))
+            durations = []
+            import_times = {}
+            for _ in range(runs):
+                started = time.monotonic()
+                process = subprocess.run(get_command(scenario), cwd=ROOT_PATH, env=env, capture_output=True,
+                                         text=True)
+                durations.append(time.monotonic() - started)
+                for module, seconds in parse_import_times(process.stderr).items():
+                    import_times.setdefault(module, []).append(seconds)
+            return {
+                'scenario': scenario,
+                'runs': runs,
+                'exit_code': process.returncode,
+                'median_seconds': round(statistics.median(durations), 4),
+                'min_seconds': round(min(durations), 4),
+                'import_seconds': dict(map(
+                    lambda item: (item[0], round(statistics.median(item[1]), 4)),
+                    sorted(import_times.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+                )),
+            }
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', default='%s,%s,%s' % (SCENARIO_IMPORT, SCENARIO_CONFIG_ERROR, SCENARIO_LIST),
+                        help='comma separated scenarios')
+    parser.add_argument('--runs', type=int, default=10, help='fresh processes per scenario')
+    parser.add_argument('--top', type=int, default=15, help='number of slowest imports reported')
+    parser.add_argument('--work-dir', default=None, help='directory for the data directories of the runs')
+    parser.add_argument('--output', default=None, help='JSON file the results are written into')
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='bigquery-writer-startup-')
+    os.makedirs(work_dir, exist_ok=True)
+    results = []
+    for scenario in args.scenarios.split(','):
+        result = run_scenario(scenario, args.runs, work_dir)
+        result['import_seconds'] = dict(list(result['import_seconds'].items())[:args.top])
+        print(json.dumps(result))
+        results.append(result)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,22 +1,40 @@
 from keboola import docker
-from google_bigquery_writer.exceptions import UserException
-import google_bigquery_writer.writer
-import google.api_core
-from google.cloud import bigquery
-from google.auth.exceptions import RefreshError
+from google_bigquery_writer.exceptions import ApplicationException, UserException
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
 import json
 import os
-from google_bigquery_writer import schema_mapper
-from google_bigquery_writer.bigquery_client_factory \
-    import BigqueryClientFactory
-from google.oauth2 import service_account
+import sys
+from typing import TYPE_CHECKING, Optional
+from google_bigquery_writer.listing_cache import ListingCache
+from google_bigquery_writer.metrics import Metrics
+from google_bigquery_writer.spill import SpillManager
+from google_bigquery_writer.state import State
+
+# Google Cloud clients, pyarrow and the crypto libraries take most of the start-up time, they are imported
+# by the methods using them, so runs failing on the configuration (and list runs) don't load what they don't use
+if TYPE_CHECKING:
+    from google_bigquery_writer.bigquery_client_factory import BigqueryClientFactory
+    from google_bigquery_writer.token_cache import TokenCache
+
+MB = 1024 * 1024
 
 
 class App:
+    DEFAULT_MAX_PARALLEL_TABLES = 4
+    METRICS_FILE_NAME = 'bigquery-writer-metrics.json'
+    TOKEN_CACHE_DIR = 'token-cache'
+    LIST_CACHE_DIR = 'list-cache'
+
     def __init__(self):
         self.data_dir = os.environ.get('KBC_DATADIR')
         self.cfg = docker.Config(self.data_dir)
         self.writer = None
+        self.bigquery_client_factory = None
+        self.credentials = None
+        self.token_refresher = None
+        self.state = None
+        self.metrics = Metrics()
 
     def validate_credentials(self):
         parameters = (self.cfg.config_data.get('image_parameters', {}).get('service_account')
@@ -42,6 +60,12 @@ class App:
             raise UserException('Service account project id missing.')
 
     def get_credentials(self):
+        """
+        Late loading method, all clients of the run share the credentials and their access token
+        """
+        if self.credentials is not None:
+            return self.credentials
+
         credentials_json = (self.cfg.config_data.get('image_parameters', {}).get('service_account')
                             or self.cfg.get_parameters().get('service_account'))
 
@@ -58,8 +82,10 @@ class App:
         scopes = [
             'https://www.googleapis.com/auth/bigquery'
         ]
+        if self.cfg.get_parameters().get('stagingBucket'):
+            scopes.append('https://www.googleapis.com/auth/devstorage.read_write')
         try:
-            return service_account.Credentials.from_service_account_info(
+            credentials = self._create_service_account_credentials(
                 service_account_info,
                 scopes=scopes
             )
@@ -70,12 +96,64 @@ class App:
             )
             raise UserException(message)
 
-    def get_writer(self):
+        from google.auth.exceptions import RefreshError
+        from google_bigquery_writer.token_refresher import TokenRefresher
+
+        # the token is renewed in the background before it expires, requests never wait for the token exchange
+        token_refresher = TokenRefresher(credentials, cache=self.get_token_cache(private_key, client_email, scopes))
+        try:
+            token_refresher.start()
+        except RefreshError:
+            message = 'Cannot connect to BigQuery.' \
+                      ' Please try reauthorizing.'
+            raise UserException(message)
+        self.token_refresher = token_refresher
+        self.credentials = credentials
+        return credentials
+
+    @staticmethod
+    def _create_service_account_credentials(service_account_info: dict, scopes: list):
+        from google.oauth2 import service_account
+        return service_account.Credentials.from_service_account_info(service_account_info, scopes=scopes)
+
+    def get_token_cache(self, private_key: str, client_email: str, scopes: list) -> Optional['TokenCache']:
+        token_cache = self.cfg.get_parameters().get('tokenCache')
+        if not token_cache:
+            return None
+        from google_bigquery_writer.token_cache import TokenCache
+        cache_path = token_cache if isinstance(token_cache, str) else os.path.join(self.data_dir, self.TOKEN_CACHE_DIR)
+        return TokenCache(cache_path, private_key, client_email, scopes)
+
+    def get_listing_cache(self) -> Optional[ListingCache]:
+        parameters = self.cfg.get_parameters()
+        list_cache = parameters.get('listCache')
+        if not list_cache:
+            return None
+        credentials_json = (self.cfg.config_data.get('image_parameters', {}).get('service_account')
+                            or parameters.get('service_account'))
+        return ListingCache(
+            list_cache if isinstance(list_cache, str) else os.path.join(self.data_dir, self.LIST_CACHE_DIR),
+            credentials_json.get('client_email'),
+            parameters.get('listCacheTtl') or ListingCache.DEFAULT_TTL
+        )
+
+    def get_state(self) -> State:
         """
         Late loading method
         """
-        if self.writer:
-            return self.writer
+        if self.state is None:
+            self.state = State(self.data_dir)
+        return self.state
+
+    def get_bigquery_client_factory(self) -> 'BigqueryClientFactory':
+        """
+        Late loading method, all clients of the run share the connection pool of the factory
+        """
+        if self.bigquery_client_factory is not None:
+            return self.bigquery_client_factory
+        from google_bigquery_writer.bigquery_client_factory import BigqueryClientFactory
+        from google_bigquery_writer.project_lister import ProjectLister
+        from google_bigquery_writer.writer import Writer
 
         config_data_service_account = self.cfg.config_data.get('image_parameters', {}).get('service_account', {})
         parameters_service_account = self.cfg.get_parameters().get('service_account')
@@ -85,14 +163,58 @@ class App:
                 config_data_service_account.get('project_id', None) or
                 parameters_service_account.get('project_id'))
 
-        bigquery_client_factory = BigqueryClientFactory(
+        parameters = self.cfg.get_parameters()
+        max_parallel_tables = parameters.get('maxParallelTables') or self.DEFAULT_MAX_PARALLEL_TABLES
+        upload_chunk_size = parameters.get('uploadChunkSize')
+        self.bigquery_client_factory = BigqueryClientFactory(
             project,
             self.get_credentials(),
-            location=self.cfg.get_parameters().get('location', None)
+            location=parameters.get('location', None),
+            # every table uploads chunks and polls its jobs in parallel
+            pool_size=max(
+                max_parallel_tables * Writer.MAX_WORKERS * 2,
+                ProjectLister.MAX_WORKERS
+            ),
+            keep_alive=parameters.get('httpKeepAlive'),
+            upload_chunk_size=int(upload_chunk_size * MB) if upload_chunk_size else None
         )
+        return self.bigquery_client_factory
 
+    def get_writer(self):
+        """
+        Late loading method
+        """
+        if self.writer:
+            return self.writer
+
+        from google_bigquery_writer.writer import Writer
+
+        parameters = self.cfg.get_parameters()
+        bigquery_client_factory = self.get_bigquery_client_factory()
         bigquery_client = bigquery_client_factory.create()
-        self.writer = google_bigquery_writer.writer.Writer(bigquery_client)
+        staging = None
+        staging_bucket = parameters.get('stagingBucket')
+        if staging_bucket:
+            from google_bigquery_writer.gcs_staging import GcsStaging
+            staging = GcsStaging(bigquery_client_factory.create_storage_client(), staging_bucket)
+        stream_writer = None
+        tables = parameters.get('tables') or []
+        if any(map(lambda table: table.get('mode') == Writer.MODE_STREAM, tables)):
+            from google_bigquery_writer.stream_writer import StreamWriter
+            stream_writer = StreamWriter(bigquery_client_factory.create_write_client())
+        spill_budget = parameters.get('spillBudget')
+        spill = SpillManager(
+            Writer.TEMP_PATH,
+            int(spill_budget * MB) if spill_budget else None
+        )
+        self.writer = Writer(
+            bigquery_client,
+            state=self.get_state(),
+            staging=staging,
+            stream_writer=stream_writer,
+            metrics=self.metrics,
+            spill=spill
+        )
         return self.writer
 
     def run(self):
@@ -120,15 +242,21 @@ class App:
             message = 'Google BigQuery project not specified in the configuration.'
             raise UserException(message)
 
-        if action == 'run' or action is None or action == '':
-            self.action_run()
-            return
-        if action == 'list':
-            self.action_list()
-            return
+        try:
+            if action == 'run' or action is None or action == '':
+                self.action_run()
+                return
+            if action == 'list':
+                self.action_list()
+                return
+        finally:
+            if self.token_refresher is not None:
+                self.token_refresher.stop()
         raise UserException('Action %s not defined' % action)
 
     def action_run(self):
+        from google_bigquery_writer import schema_mapper
+
         # validate application parameters
         parameters = self.cfg.get_parameters()
         # check for empty tables
@@ -138,6 +266,7 @@ class App:
         if not tables:
             raise UserException('There are no tables specified in the configuration.')
 
+        uploads = []
         for table in tables:
             # skip tables with export: false
             if 'export' in table.keys() and table['export'] is False:
@@ -159,25 +288,100 @@ class App:
                 self.data_dir,
                 input_table_mapping['destination']
             )
+            uploads.append((input_table_mapping, csv_file_path, table, incremental))
+
+        # biggest files first, so the longest loads don't end up as the tail of the run
+        uploads.sort(key=lambda upload: self._get_file_size(upload[1]), reverse=True)
 
-            print('Loading table %s into BigQuery as %s.%s' % (
-                input_table_mapping['source'],
-                parameters.get('dataset'),
-                table['dbName']
-            ))
+        max_parallel_tables = parameters.get('maxParallelTables') or self.DEFAULT_MAX_PARALLEL_TABLES
+        self.get_writer()  # initialize the shared writer before the worker threads start
 
-            self._process_upload(csv_file_path, parameters, table, incremental)
+        failures = []
+        try:
+            with self.metrics.timer('run_seconds'), ThreadPoolExecutor(max_workers=max_parallel_tables) as executor:
+                futures = {}
+                for input_table_mapping, csv_file_path, table, incremental in uploads:
+                    future = executor.submit(self._process_upload, input_table_mapping['source'], csv_file_path,
+                                             parameters, table, incremental)
+                    futures[future] = table
+
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                        self.metrics.increment('tables_loaded_total')
+                    except Exception as err:
+                        self.metrics.increment('tables_failed_total')
+                        failures.append((futures[future]['dbName'], err))
+        finally:
+            self.get_state().save()
+            self.write_metrics()
+            self.invalidate_listing_cache()
+
+        if len(failures) == 1:
+            raise failures[0][1]
+        if failures:
+            # failures other than UserException are unexpected, reported with their type as an application error
+            unexpected = list(filter(lambda failure: not isinstance(failure[1], UserException), failures))
+            message = 'Loading of %s tables failed:\n%s' % (
+                len(failures),
+                '\n'.join(map(lambda failure: '[%s] %s' % (failure[0], self._describe_failure(failure[1])), failures))
+            )
+            if unexpected:
+                raise ApplicationException(message) from unexpected[0][1]
+            raise UserException(message)
 
         print('BigQuery Writer finished')
 
-    def _process_upload(self, csv_file_path: str, parameters: dict, table: dict, incremental: bool):
+    @staticmethod
+    def _describe_failure(err: Exception) -> str:
+        if isinstance(err, UserException):
+            return err.message
+        return '%s: %s' % (type(err).__name__, str(err))
+
+    @staticmethod
+    def _get_file_size(csv_file_path: str) -> int:
         try:
-            self.get_writer().write_table_sync(
-                csv_file_path,
-                parameters.get('dataset'),
-                table,
-                incremental=incremental
-            )
+            return os.path.getsize(csv_file_path)
+        except OSError:
+            return 0
+
+    def invalidate_listing_cache(self):
+        """
+        The run may have created datasets, the next listing of the project must show them.
+        """
+        listing_cache = self.get_listing_cache()
+        if listing_cache is not None and self.bigquery_client_factory is not None:
+            listing_cache.invalidate(self.bigquery_client_factory.project_name)
+            listing_cache.save()
+
+    def write_metrics(self):
+        if self.bigquery_client_factory is not None:
+            for pool_stats in self.bigquery_client_factory.get_pool_stats():
+                self.metrics.add_event('http_pool', **pool_stats)
+        self.metrics.write_summary(os.path.join(self.data_dir, 'out', 'files', self.METRICS_FILE_NAME))
+        prometheus_textfile = self.cfg.get_parameters().get('prometheusTextfile')
+        if prometheus_textfile:
+            self.metrics.write_prometheus(prometheus_textfile)
+
+    def _process_upload(self, source: str, csv_file_path: str, parameters: dict, table: dict, incremental: bool):
+        import google.api_core.exceptions
+        from google.auth.exceptions import RefreshError
+
+        print('[%s] Loading table %s into BigQuery as %s.%s' % (
+            table['dbName'],
+            source,
+            parameters.get('dataset'),
+            table['dbName']
+        ))
+        try:
+            with self.metrics.timer('table_seconds', table=table['dbName']):
+                self.get_writer().write_table_sync(
+                    csv_file_path,
+                    parameters.get('dataset'),
+                    table,
+                    incremental=incremental,
+                    skip_unchanged=bool(parameters.get('skipUnchanged'))
+                )
         except RefreshError:
             message = 'Cannot connect to BigQuery.' \
                       ' Please try reauthorizing.'
@@ -186,38 +390,39 @@ class App:
             raise UserException(err.message)
 
     def action_list(self):
-        client = bigquery.client.Client(
-            credentials=self.get_credentials(),
-            project='dummy'
+        import google.api_core.exceptions
+        from google.auth.exceptions import RefreshError
+        from google_bigquery_writer.project_lister import ProjectLister
+
+        parameters = self.cfg.get_parameters()
+        listing_cache = self.get_listing_cache()
+        if listing_cache is not None:
+            for project_id in parameters.get('listCacheInvalidate') or []:
+                listing_cache.invalidate(project_id)
+        lister = ProjectLister(
+            self.get_bigquery_client_factory().create(),
+            time_budget=parameters.get('listTimeBudget') or ProjectLister.TIME_BUDGET,
+            cache=listing_cache
         )
-        response = {
-            'projects': []
-        }
+        # every project is written out as soon as it is listed, a listing failing after that still ends
+        # with a complete document, flagged as incomplete
+        started = False
+        listed = False
         try:
-            projects = list(client.list_projects())
-            for project in projects:
-                client = bigquery.client.Client(
-                    credentials=self.get_credentials(),
-                    project=project.project_id,
-                )
-                datasets = list(client.list_datasets())
-                response['projects'].append({
-                    'id': project.project_id,
-                    'name': project.friendly_name,
-                    'datasets': list(map(
-                        lambda dataset: {
-                            'id': dataset.dataset_id,
-                            'name': dataset.dataset_id
-                        },
-                        datasets
-                    ))
-                })
-
+            for project in lister.iter_projects():
+                print(', ' if started else '{"projects": [', end='')
+                print(json.dumps(project), end='', flush=True)
+                started = True
+            listed = True
         except RefreshError:
             message = 'Cannot connect to BigQuery.' \
                       ' Please try reauthorizing.'
             raise UserException(message)
         except google.api_core.exceptions.Forbidden as err:
             raise UserException(err.message)
-
-        print(json.dumps(response))
+        finally:
+            if started or listed:
+                if not started:
+                    print('{"projects": [', end='')
+                print('], "incomplete": %s}' % json.dumps(lister.incomplete or not listed))
+            sys.stdout.flush()
@@ -0,0 +1,20 @@
+import os
+import threading
+from typing import Union
+
+
+def write_atomic(path: str, content: Union[str, bytes], mode: int = 0o666) -> None:
+    """
+    Writes the file at once, readers never see a partial file: the content goes into a temporary file
+    next to it, which then replaces the file. `mode` applies to a newly created file (before the umask).
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = '%s.%s.%s.tmp' % (path, os.getpid(), threading.get_ident())
+    try:
+        with open(os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode), 'wb') as temp_file:
+            temp_file.write(content.encode() if isinstance(content, str) else content)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
@@ -1,16 +1,131 @@
+import socket
+from typing import TYPE_CHECKING
+
+from google.auth.transport.requests import AuthorizedSession
 from google.oauth2.credentials import Credentials
 from google.cloud.bigquery import Client
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+from google_bigquery_writer.exceptions import UserException
+
+if TYPE_CHECKING:
+    # the storage clients are imported only by the runs using them
+    from google.cloud import storage
+    from google.cloud.bigquery_storage_v1 import BigQueryWriteClient
+
+UPLOAD_CHUNK_GRANULARITY = 256 * 1024  # resumable upload chunks are multiples of 256kB
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    HTTP adapter with TCP keep-alive probes on its connections, so idle pooled connections are not silently dropped
+    by NATs and load balancers between the uploads.
+    """
+
+    def __init__(self, keep_alive: int = None, **kwargs):
+        self.keep_alive = keep_alive  # seconds of idleness before the first probe
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.keep_alive:
+            kwargs['socket_options'] = self._get_socket_options(self.keep_alive)
+        super().init_poolmanager(*args, **kwargs)
+
+    @staticmethod
+    def _get_socket_options(keep_alive: int) -> list:
+        options = HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+        if hasattr(socket, 'TCP_KEEPIDLE'):
+            options += [
+                (socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, keep_alive),
+                (socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, max(1, keep_alive // 3)),
+                (socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3),
+            ]
+        return options
+
+    def get_pool_stats(self) -> list:
+        stats = []
+        pools = self.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            stats.append({
+                'host': '%s://%s:%s' % (pool.scheme, pool.host, pool.port),
+                'max_size': pool.pool.maxsize if pool.pool is not None else 0,
+                'created_connections': pool.num_connections,
+                'idle_connections': len(list(filter(None, pool.pool.queue))) if pool.pool is not None else 0,
+                'requests': pool.num_requests,
+            })
+        return stats
+
+
+class PooledClient(Client):
+    """
+    BigQuery client uploading files in resumable upload chunks of the configured size.
+    """
+
+    def __init__(self, *args, upload_chunk_size: int = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.upload_chunk_size = upload_chunk_size
+
+    def _initiate_resumable_upload(self, *args, **kwargs):
+        upload, transport = super()._initiate_resumable_upload(*args, **kwargs)
+        if self.upload_chunk_size:
+            # the library has a fixed chunk size, the upload reads it only once the data is being transmitted
+            upload._chunk_size = self.upload_chunk_size
+        return upload, transport
 
 
 class BigqueryClientFactory(object):
-    def __init__(self, project_name: str, credentials: Credentials, location: str = 'US'):
+    DEFAULT_POOL_SIZE = 10
+
+    def __init__(self, project_name: str, credentials: Credentials, location: str = 'US',
+                 pool_size: int = DEFAULT_POOL_SIZE, keep_alive: int = None, upload_chunk_size: int = None):
+        if upload_chunk_size is not None and (
+                upload_chunk_size <= 0 or upload_chunk_size % UPLOAD_CHUNK_GRANULARITY
+        ):
+            raise UserException('Upload chunk size must be a positive multiple of 256kB, %s bytes given' % (
+                upload_chunk_size
+            ))
         self.project_name = project_name
         self.credentials = credentials
         self.location = location
+        self.upload_chunk_size = upload_chunk_size
+        # one connection pool shared by all clients, sized for every thread sending requests at once
+        self.adapter = PooledHTTPAdapter(keep_alive=keep_alive, pool_connections=pool_size, pool_maxsize=pool_size)
+        self._session = None
+
+    def get_session(self) -> AuthorizedSession:
+        if self._session is None:
+            self._session = AuthorizedSession(self.credentials)
+            self._session.mount('https://', self.adapter)
+            self._session.mount('http://', self.adapter)
+        return self._session
 
     def create(self) -> Client:
-        return Client(
+        return PooledClient(
             self.project_name,
             self.credentials,
-            location=self.location
+            location=self.location,
+            _http=self.get_session(),
+            upload_chunk_size=self.upload_chunk_size
         )
+
+    def create_storage_client(self) -> 'storage.Client':
+        from google.cloud import storage
+        return storage.Client(
+            self.project_name,
+            self.credentials,
+            _http=self.get_session()
+        )
+
+    def create_write_client(self) -> 'BigQueryWriteClient':
+        from google.cloud.bigquery_storage_v1 import BigQueryWriteClient
+        return BigQueryWriteClient(credentials=self.credentials)
+
+    def get_pool_stats(self) -> list:
+        """
+        Usage of the connection pools, one per host.
+        """
+        return self.adapter.get_pool_stats()
@@ -0,0 +1,61 @@
+import math
+from typing import NamedTuple
+
+from google_bigquery_writer.exceptions import UserException
+
+MB = 1024 * 1024
+MAX_LOAD_JOBS_PER_TABLE = 1500  # https://cloud.google.com/bigquery/quotas#load_jobs
+MAX_ROUNDING_CHUNKS = 0.25  # chunks added to fill the last round of uploads, as a share of the required chunks
+
+
+class ChunkPlan(NamedTuple):
+    nr_of_chunks: int
+    chunk_size: int  # bytes
+    reason: str
+
+    def describe(self, data_size: int, max_chunk_size: int, workers: int) -> str:
+        return '%s chunks of ~%.1fMB for %.1fMB of data (chunk limit %.0fMB, %s workers): %s' % (
+            self.nr_of_chunks,
+            self.chunk_size / MB,
+            data_size / MB,
+            max_chunk_size / MB,
+            workers,
+            self.reason
+        )
+
+
+def plan_chunks(data_size: int, max_chunk_size: int, workers: int, min_chunk_size: int,
+                max_chunks: int = MAX_LOAD_JOBS_PER_TABLE) -> ChunkPlan:
+    """
+    Chooses the number of chunks the data is uploaded in.
+
+    Chunks never exceed `max_chunk_size`. Data that fits into fewer chunks than there are workers is still split
+    so all workers upload in parallel, as long as every chunk keeps at least `min_chunk_size`. Data needing more
+    chunks than workers is split into whole rounds of uploads, so no worker is left with a lone chunk at the end,
+    unless filling the last round adds more than a quarter of the required chunks (load jobs).
+    """
+    required = max(1, math.ceil(data_size / max_chunk_size))
+    if required > max_chunks:
+        raise UserException('Data of %.1fMB needs %s chunks of up to %.0fMB, more than the %s load jobs a table '
+                            'can take in a day. Increase the chunk size.' % (
+                                data_size / MB,
+                                required,
+                                max_chunk_size / MB,
+                                max_chunks
+                            ))
+
+    if required >= workers:
+        nr_of_chunks = min(max_chunks, math.ceil(required / workers) * workers)
+        if nr_of_chunks - required > required * MAX_ROUNDING_CHUNKS:
+            nr_of_chunks = required
+        reason = 'chunk size limit, %s rounds of parallel uploads' % math.ceil(nr_of_chunks / workers)
+    else:
+        useful_chunks = max(1, data_size // max(1, min_chunk_size))
+        nr_of_chunks = max(required, min(workers, useful_chunks))
+        if nr_of_chunks == 1:
+            reason = 'single upload, smaller than two minimal chunks of %.0fMB' % (min_chunk_size / MB)
+        elif nr_of_chunks > required:
+            reason = 'parallel uploads'
+        else:
+            reason = 'chunk size limit'
+    return ChunkPlan(nr_of_chunks, math.ceil(data_size / nr_of_chunks) if data_size else 0, reason)
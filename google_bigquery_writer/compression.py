@@ -0,0 +1,42 @@
+import gzip
+import os
+import time
+
+from google_bigquery_writer.file_window import FileWindow
+from google_bigquery_writer.load_progress import new_content_hash
+
+COMPRESSION_GZIP = 'gzip'
+COMPRESSION_LEVEL = 6
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def compress_chunk(source_path: str, target_path: str, byte_range: tuple = None,
+                   compression_level: int = COMPRESSION_LEVEL) -> dict:
+    """
+    Gzips the file (or its byte range) into `target_path`, runs in a worker process.
+    """
+    started = time.process_time()
+    if byte_range:
+        readable = FileWindow(source_path, *byte_range)
+        raw_bytes = byte_range[1] - byte_range[0]
+    else:
+        readable = open(source_path, 'rb')
+        raw_bytes = os.path.getsize(source_path)
+
+    content_hash = new_content_hash()
+    with readable, open(target_path, 'wb') as raw_output:
+        with gzip.GzipFile(fileobj=raw_output, mode='wb', compresslevel=compression_level, mtime=0) as output:
+            while True:
+                buffer = readable.read(COPY_BUFFER_SIZE)
+                if not buffer:
+                    break
+                content_hash.update(buffer)
+                output.write(buffer)
+
+    return {
+        'path': target_path,
+        'raw_bytes': raw_bytes,
+        'compressed_bytes': os.path.getsize(target_path),
+        'hash': content_hash.hexdigest(),
+        'cpu_time': time.process_time() - started
+    }
@@ -0,0 +1,165 @@
+import math
+import os
+from typing import Iterator, List, Tuple
+
+from google_bigquery_writer.exceptions import UserException
+
+BLOCK_SIZE = 16 * 1024 * 1024  # bytes read from the source file at once
+NEWLINE = b'\n'
+QUOTE = b'"'
+
+
+def find_record_end(block: bytes, start: int, in_quotes: bool) -> Tuple[int, bool]:
+    """
+    Finds the end of the record the position `start` belongs to.
+
+    A newline terminates a record only outside of a quoted value. Escaped quotes ("") do not change
+    the parity, so counting quote characters is enough to know whether a newline is quoted.
+    Returns offset right after the terminating newline (-1 if the block doesn't contain it)
+    and the quoting state at that offset (at the end of the block respectively).
+    """
+    position = start
+    while True:
+        newline = block.find(NEWLINE, position)
+        if newline == -1:
+            return -1, in_quotes ^ bool(block.count(QUOTE, position) & 1)
+        in_quotes ^= bool(block.count(QUOTE, position, newline) & 1)
+        if not in_quotes:
+            return newline + 1, False
+        position = newline + 1
+
+
+def find_header_end(csv_file_path: str, block_size: int = BLOCK_SIZE) -> int:
+    with open(csv_file_path, 'rb') as readable:
+        offset = 0
+        in_quotes = False
+        while True:
+            block = readable.read(block_size)
+            if not block:
+                return offset
+            end, in_quotes = find_record_end(block, 0, in_quotes)
+            if end != -1:
+                return offset + end
+            offset += len(block)
+
+
+def split_csv(csv_file_path: str, output_path: str, nr_of_slices: int, skip_header: bool = True,
+              block_size: int = BLOCK_SIZE) -> Iterator[Tuple[str, Tuple[int, int]]]:
+    """
+    Streams the CSV file into `nr_of_slices` record aligned slices without the header.
+
+    Slice paths are yielded together with the byte range of the slice in the source file as soon as each slice
+    is complete, so uploads can start while the rest of the file is being split.
+    Only one block of the file is held in memory at any time.
+    """
+    data_start = find_header_end(csv_file_path, block_size) if skip_header else 0
+    data_size = os.path.getsize(csv_file_path) - data_start
+    slice_size = max(1, math.ceil(data_size / nr_of_slices))
+    file_name = os.path.basename(csv_file_path)
+
+    slice_index = 0
+    slice_written = 0
+    seeking_record_end = False
+    in_quotes = False
+    output = None
+    block_offset = data_start
+    try:
+        with open(csv_file_path, 'rb') as readable:
+            readable.seek(data_start)
+            while True:
+                block = readable.read(block_size)
+                if not block:
+                    break
+                view = memoryview(block)
+                position = 0
+                while position < len(block):
+                    if output is None:
+                        slice_path = os.path.join(output_path, '%s.part%04d' % (file_name, slice_index))
+                        slice_start = block_offset + position
+                        output = open(slice_path, 'wb')
+
+                    if seeking_record_end:
+                        end, in_quotes = find_record_end(block, position, in_quotes)
+                        if end == -1:
+                            output.write(view[position:])
+                            position = len(block)
+                            continue
+                        output.write(view[position:end])
+                        position = end
+                        output.close()
+                        output = None
+                        yield slice_path, (slice_start, block_offset + end)
+                        slice_index += 1
+                        slice_written = 0
+                        seeking_record_end = False
+                        continue
+
+                    end = min(len(block), position + slice_size - slice_written)
+                    output.write(view[position:end])
+                    in_quotes ^= bool(block.count(QUOTE, position, end) & 1)
+                    slice_written += end - position
+                    position = end
+                    if slice_written >= slice_size and slice_index < nr_of_slices - 1:
+                        seeking_record_end = True
+                block_offset += len(block)
+
+        if in_quotes:
+            raise UserException('Cannot split file %s: unterminated quoted value at the end of the file.' % file_name)
+
+        if output is not None:
+            output.close()
+            output = None
+            yield slice_path, (slice_start, block_offset)
+    finally:
+        if output is not None:
+            output.close()
+
+
+def find_record_ranges(csv_file_path: str, nr_of_ranges: int, block_size: int = BLOCK_SIZE, start: int = 0,
+                       end: int = None) -> List[Tuple[int, int]]:
+    """
+    Finds up to `nr_of_ranges` record aligned byte ranges covering the whole file (header included in the first one)
+    or the part of the file between `start` (a record boundary) and `end`.
+
+    The file is only scanned up to the start of the last range.
+    """
+    if end is None:
+        end = os.path.getsize(csv_file_path)
+    range_size = max(1, math.ceil((end - start) / nr_of_ranges))
+
+    offsets = [start]
+    target = start + range_size
+    seeking_record_end = False
+    in_quotes = False
+    block_offset = start
+    with open(csv_file_path, 'rb') as readable:
+        readable.seek(start)
+        while len(offsets) < nr_of_ranges:
+            block = readable.read(min(block_size, end - block_offset))
+            if not block:
+                break
+            position = 0
+            while position < len(block) and len(offsets) < nr_of_ranges:
+                if seeking_record_end:
+                    record_end, in_quotes = find_record_end(block, position, in_quotes)
+                    if record_end == -1:
+                        position = len(block)
+                        continue
+                    offsets.append(block_offset + record_end)
+                    target = block_offset + record_end + range_size
+                    position = record_end
+                    seeking_record_end = False
+                    continue
+
+                target_position = min(len(block), target - block_offset)
+                in_quotes ^= bool(block.count(QUOTE, position, target_position) & 1)
+                position = target_position
+                if block_offset + position >= target:
+                    seeking_record_end = True
+            block_offset += len(block)
+
+    offsets.append(end)
+    return list(filter(
+        lambda byte_range: byte_range[1] > byte_range[0],
+        zip(offsets, offsets[1:])
+    ))
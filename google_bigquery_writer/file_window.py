@@ -0,0 +1,60 @@
+import io
+import os
+
+
+class FileWindow(io.RawIOBase):
+    """
+    Read-only file object exposing the byte range [start, end) of a file as a standalone stream.
+    """
+    mode = 'rb'
+
+    def __init__(self, file_path: str, start: int, end: int):
+        super().__init__()
+        self.file_path = file_path
+        self.start = start
+        self.end = end
+        self._file = open(file_path, 'rb')
+        self._file.seek(start)
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_SET:
+            position = offset
+        elif whence == os.SEEK_CUR:
+            position = self._position + offset
+        elif whence == os.SEEK_END:
+            position = self.end - self.start + offset
+        else:
+            raise ValueError('Invalid whence (%s)' % whence)
+        if position < 0:
+            raise ValueError('Negative seek position %s' % position)
+        self._position = position
+        self._file.seek(self.start + position)
+        return self._position
+
+    def read(self, size: int = -1) -> bytes:
+        remaining = max(0, self.end - self.start - self._position)
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        data = self._file.read(size)
+        self._position += len(data)
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self) -> None:
+        if not self.closed:
+            self._file.close()
+        super().close()
@@ -0,0 +1,54 @@
+import logging
+import uuid
+from typing import List, Tuple
+
+from google.api_core.exceptions import GoogleAPICallError, NotFound
+from google.cloud import storage
+
+from google_bigquery_writer.file_window import FileWindow
+
+
+class GcsStaging(object):
+    """
+    Chunks are uploaded into the staging bucket and loaded into the table by one load job from all the objects.
+    """
+    OBJECT_PREFIX = 'google-bigquery-writer'
+    UPLOAD_TIMEOUT = 600  # Timeout in seconds
+
+    def __init__(self, storage_client: storage.Client, bucket_name: str):
+        self.bucket = storage_client.bucket(bucket_name)
+
+    def get_staging_path(self, table_name: str) -> str:
+        # every load gets its own path, loads of the same table never share objects
+        return '%s/%s/%s' % (self.OBJECT_PREFIX, table_name, uuid.uuid4().hex)
+
+    def get_uri(self, object_name: str) -> str:
+        return 'gs://%s/%s' % (self.bucket.name, object_name)
+
+    def upload(self, file_path: str, object_name: str, byte_range: Tuple[int, int] = None) -> str:
+        blob = self.bucket.blob(object_name)
+        if byte_range:
+            readable = FileWindow(file_path, *byte_range)
+            size = byte_range[1] - byte_range[0]
+        else:
+            readable = open(file_path, 'rb')
+            size = None
+        with readable:
+            # the generation precondition makes the upload safe to retry
+            blob.upload_from_file(
+                readable,
+                size=size,
+                content_type='application/octet-stream',
+                if_generation_match=0,
+                timeout=self.UPLOAD_TIMEOUT
+            )
+        return self.get_uri(object_name)
+
+    def delete(self, object_names: List[str]) -> None:
+        for object_name in object_names:
+            try:
+                self.bucket.blob(object_name).delete()
+            except NotFound:
+                pass
+            except GoogleAPICallError as err:
+                logging.warning('Cannot delete staged object %s: %s' % (self.get_uri(object_name), str(err)))
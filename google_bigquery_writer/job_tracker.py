@@ -0,0 +1,50 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from google.cloud import bigquery
+
+
+class JobTracker(object):
+    """
+    Waits for a group of jobs at once, polling them with increasing delays under a single deadline.
+    """
+    DEFAULT_INITIAL_DELAY = 0.5  # seconds
+    DEFAULT_BACKOFF_FACTOR = 1.5
+
+    def __init__(self, timeout: float, max_delay: float, initial_delay: float = DEFAULT_INITIAL_DELAY,
+                 backoff_factor: float = DEFAULT_BACKOFF_FACTOR, max_workers: int = 5):
+        self.timeout = timeout
+        self.max_delay = max_delay
+        self.initial_delay = min(initial_delay, max_delay)
+        self.backoff_factor = backoff_factor
+        self.max_workers = max_workers
+        self.reloads = 0  # job status requests made by the tracker
+
+    def wait(self, jobs: List[bigquery.LoadJob]) -> Optional[bigquery.LoadJob]:
+        """
+        Returns the first failed job as soon as it is seen, None when all jobs succeeded.
+        Raises TimeoutError when the jobs didn't finish before the deadline.
+        """
+        deadline = time.monotonic() + self.timeout
+        delay = self.initial_delay
+        pending = list(jobs)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                running = []
+                for job in pending:
+                    if job.state != 'DONE':
+                        running.append(job)
+                    elif job.errors or job.error_result:
+                        return job
+                pending = running
+                if not pending:
+                    return None
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError('%s jobs did not finish in %s seconds' % (len(pending), self.timeout))
+                time.sleep(min(delay, remaining))
+                delay = min(delay * self.backoff_factor, self.max_delay)
+                list(executor.map(lambda job: job.reload(), pending))
+                self.reloads += len(pending)
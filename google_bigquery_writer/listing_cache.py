@@ -0,0 +1,69 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import List, Optional
+
+from google_bigquery_writer.atomic_file import write_atomic
+
+
+class ListingCache(object):
+    """
+    Projects visible to a service account and datasets of every project, persisted across runs of the list action.
+
+    Entries expire after `ttl` seconds; the datasets of a project are cached and invalidated on their own, so a
+    change in one project does not make the whole organization be listed again.
+    """
+    DEFAULT_TTL = 300  # seconds
+
+    def __init__(self, cache_path: str, client_email: str, ttl: float = DEFAULT_TTL):
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.file_path = os.path.join(cache_path, '%s.json' % hashlib.sha256(client_email.encode()).hexdigest())
+        self._content = None
+
+    def get_projects(self) -> Optional[List[dict]]:
+        return self._get_entry(self._load().get('projects'))
+
+    def set_projects(self, projects: List[dict]) -> None:
+        self._load()['projects'] = self._get_new_entry(projects)
+
+    def get_project(self, project_id: str) -> Optional[dict]:
+        return self._get_entry(self._load()['datasets'].get(project_id))
+
+    def set_project(self, project_item: dict) -> None:
+        self._load()['datasets'][project_item['id']] = self._get_new_entry(project_item)
+
+    def invalidate(self, project_id: str) -> None:
+        self._load()['datasets'].pop(project_id, None)
+
+    def save(self) -> None:
+        content = self._load()
+        now = time.time()
+        content['datasets'] = dict(filter(lambda item: item[1]['expires'] > now, content['datasets'].items()))
+        try:
+            write_atomic(self.file_path, json.dumps(content))
+        except OSError as err:
+            logging.warning('Cannot write listing cache: %s' % str(err))
+
+    def _load(self) -> dict:
+        if self._content is None:
+            self._content = {'projects': None, 'datasets': {}}
+            try:
+                with open(self.file_path) as cache_file:
+                    self._content.update(json.load(cache_file))
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError) as err:
+                logging.warning('Cannot read listing cache: %s' % str(err))
+        return self._content
+
+    def _get_new_entry(self, value) -> dict:
+        return {'expires': time.time() + self.ttl, 'value': value}
+
+    @staticmethod
+    def _get_entry(entry: Optional[dict]):
+        if entry is None or entry['expires'] <= time.time():
+            return None
+        return entry['value']
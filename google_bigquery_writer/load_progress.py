@@ -0,0 +1,76 @@
+import hashlib
+from typing import List, Optional
+
+from google_bigquery_writer.file_window import FileWindow
+from google_bigquery_writer.state import State
+
+HASH_BUFFER_SIZE = 1024 * 1024
+
+
+def new_content_hash():
+    return hashlib.blake2b(digest_size=16)
+
+
+def get_content_hash(file_path: str, byte_range: tuple = None) -> str:
+    content_hash = new_content_hash()
+    readable = FileWindow(file_path, *byte_range) if byte_range else open(file_path, 'rb')
+    with readable:
+        while True:
+            buffer = readable.read(HASH_BUFFER_SIZE)
+            if not buffer:
+                break
+            content_hash.update(buffer)
+    return content_hash.hexdigest()
+
+
+class LoadProgress(object):
+    """
+    Chunks of a table load with their source byte ranges, content hashes and load job ids,
+    persisted in the component state so an interrupted load can be resumed.
+    """
+    STATE_KEY = 'loadProgress'
+
+    def __init__(self, state: State, table_key: str):
+        self.state = state
+        self.table_key = table_key
+
+    def get(self) -> Optional[dict]:
+        return self.state.get(self.STATE_KEY, {}).get(self.table_key)
+
+    def start(self, input_size: int, chunks: List[dict] = None) -> None:
+        self._update({
+            'inputSize': input_size,
+            'chunks': chunks or []
+        })
+
+    def add_chunk(self, byte_range: tuple, content_hash: str, job_id: str) -> None:
+        with self.state.transaction():
+            progress = self.get()
+            if progress is None:
+                return
+            progress['chunks'].append({
+                'start': byte_range[0],
+                'end': byte_range[1],
+                'hash': content_hash,
+                'jobId': job_id
+            })
+            self._update(progress)
+
+    def get_chunks(self) -> List[dict]:
+        progress = self.get()
+        return progress['chunks'] if progress else []
+
+    def complete(self) -> None:
+        self._update(None)
+
+    def _update(self, progress: Optional[dict]) -> None:
+        # read-modify-write of the shared state key, serialized over all tables
+        with self.state.transaction():
+            all_progress = dict(self.state.get(self.STATE_KEY, {}))
+            if progress is None:
+                if self.table_key not in all_progress:
+                    return
+                all_progress.pop(self.table_key)
+            else:
+                all_progress[self.table_key] = progress
+            self.state.set(self.STATE_KEY, all_progress)
@@ -0,0 +1,60 @@
+import os
+from typing import Optional, Tuple
+
+from google_bigquery_writer.load_progress import HASH_BUFFER_SIZE, new_content_hash
+from google_bigquery_writer.state import State
+
+
+class LoadedPrefix(object):
+    """
+    Size and content hash of the last loaded input of an append-only table, persisted in the component state.
+
+    An input starting with the loaded content has only rows appended since the last load, its tail is loaded alone.
+    """
+    STATE_KEY = 'loadedPrefix'
+
+    def __init__(self, state: State, table_key: str):
+        self.state = state
+        self.table_key = table_key
+
+    def get(self) -> Optional[dict]:
+        return self.state.get(self.STATE_KEY, {}).get(self.table_key)
+
+    def find_tail(self, csv_file_path: str) -> Tuple[Optional[int], str]:
+        """
+        Start of the rows appended since the last load (None when the input doesn't start with the loaded content)
+        and the content hash of the whole input, both from a single pass over the file.
+        """
+        recorded = self.get()
+        input_size = os.path.getsize(csv_file_path)
+        content_hash = new_content_hash()
+        tail_start = None
+        with open(csv_file_path, 'rb') as readable:
+            if recorded and 0 < recorded['size'] <= input_size:
+                last_byte = self._update_hash(content_hash, readable, recorded['size'])
+                # appended rows start on a new line only when the loaded content ended with one
+                if content_hash.hexdigest() == recorded['hash'] and last_byte in (b'\n', b'\r'):
+                    tail_start = recorded['size']
+            self._update_hash(content_hash, readable, input_size - readable.tell())
+        return tail_start, content_hash.hexdigest()
+
+    def save(self, size: int, content_hash: str) -> None:
+        with self.state.transaction():
+            loaded_prefixes = dict(self.state.get(self.STATE_KEY, {}))
+            loaded_prefixes[self.table_key] = {
+                'size': size,
+                'hash': content_hash
+            }
+            self.state.set(self.STATE_KEY, loaded_prefixes)
+
+    @staticmethod
+    def _update_hash(content_hash, readable, size: int) -> bytes:
+        last_byte = b''
+        while size > 0:
+            buffer = readable.read(min(HASH_BUFFER_SIZE, size))
+            if not buffer:
+                break
+            content_hash.update(buffer)
+            size -= len(buffer)
+            last_byte = buffer[-1:]
+        return last_byte
@@ -0,0 +1,91 @@
+from typing import List
+
+from google.cloud import bigquery
+
+from google_bigquery_writer.exceptions import UserException
+
+STAGING_TABLE_SUFFIX = '__merge_staging'
+STAGING_TABLE_OPTIONS = ('partitioning', 'clustering', 'require_partition_filter', 'primaryKey', 'appendOnly')
+
+
+def get_primary_key(table_definition: dict) -> List[str]:
+    primary_key = table_definition['primaryKey']
+    if isinstance(primary_key, str):
+        primary_key = [primary_key]
+    columns = list(map(lambda item: item['dbName'], table_definition['items']))
+    missing_columns = list(filter(lambda column: column not in columns, primary_key))
+    if missing_columns:
+        raise UserException('Primary key columns %s of table %s are not in the table items.' % (
+            ', '.join(missing_columns),
+            table_definition['dbName']
+        ))
+    return primary_key
+
+
+def get_staging_definition(table_definition: dict) -> dict:
+    """
+    Definition of the table the chunks are loaded into before the merge, in the dataset of the target table.
+
+    The staging table has the columns of the target table only; the first load job creates or truncates it, so
+    a staging table left by a failed merge is replaced, while a resumed load keeps appending into it.
+    """
+    staging_definition = dict(filter(
+        lambda option: option[0] not in STAGING_TABLE_OPTIONS,
+        table_definition.items()
+    ))
+    staging_definition['dbName'] = table_definition['dbName'] + STAGING_TABLE_SUFFIX
+    staging_definition['fullLoadMode'] = 'truncate'
+    return staging_definition
+
+
+def get_merge_query(staging_reference: bigquery.TableReference, target_reference: bigquery.TableReference,
+                    items: list, primary_key: List[str]) -> str:
+    """
+    MERGE of the staging table into the target table by the primary key.
+
+    Rows of the target table are updated only when a value differs, keys missing in the target table are inserted.
+    The query fails on a key staged more than once, which of the rows would be merged is not defined.
+    """
+    columns = list(map(lambda item: item['dbName'], items))
+    value_columns = list(filter(lambda column: column not in primary_key, columns))
+    query = 'MERGE %s AS target\nUSING (\n' \
+            '  SELECT * FROM %s\n' \
+            '  WHERE TRUE\n' \
+            '  QUALIFY IF(COUNT(*) OVER (PARTITION BY %s) > 1, ERROR(CONCAT(\n' \
+            '    \'Primary key \', TO_JSON_STRING(STRUCT(%s)), \' is not unique in the loaded data\'\n' \
+            '  )), TRUE)\n' \
+            ') AS source\nON %s\n' % (
+                quote_table(target_reference),
+                quote_table(staging_reference),
+                ', '.join(map(quote_column, primary_key)),
+                ', '.join(map(quote_column, primary_key)),
+                ' AND '.join(map(
+                    lambda column: 'target.%s IS NOT DISTINCT FROM source.%s' % (
+                        quote_column(column),
+                        quote_column(column)
+                    ),
+                    primary_key
+                ))
+            )
+    if value_columns:
+        query += 'WHEN MATCHED AND (%s) THEN\n  UPDATE SET %s\n' % (
+            ' OR '.join(map(
+                lambda column: 'target.%s IS DISTINCT FROM source.%s' % (quote_column(column), quote_column(column)),
+                value_columns
+            )),
+            ', '.join(map(lambda column: '%s = source.%s' % (quote_column(column), quote_column(column)),
+                          value_columns))
+        )
+    query += 'WHEN NOT MATCHED THEN\n  INSERT (%s) VALUES (%s)' % (
+        ', '.join(map(quote_column, columns)),
+        ', '.join(map(lambda column: 'source.%s' % quote_column(column), columns))
+    )
+    return query
+
+
+def quote_table(table_reference: bigquery.TableReference) -> str:
+    return '`%s.%s.%s`' % (table_reference.project, table_reference.dataset_id, table_reference.table_id)
+
+
+def quote_column(column: str) -> str:
+    return '`%s`' % column
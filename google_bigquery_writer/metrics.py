@@ -0,0 +1,148 @@
+import bisect
+import contextlib
+import json
+import math
+import threading
+import time
+from typing import Iterator
+
+from google_bigquery_writer.atomic_file import write_atomic
+
+DURATION_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 1800)  # seconds
+SIZE_BUCKETS = tuple(map(lambda size_mb: size_mb * 1024 * 1024, (1, 10, 100, 500, 1000, 4000)))  # bytes
+PROMETHEUS_PREFIX = 'bigquery_writer_'
+
+
+class Histogram(object):
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def observe(self, value: float) -> None:
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'min': round(self.min, 6) if self.count else None,
+            'max': round(self.max, 6) if self.count else None,
+        }
+
+
+class Metrics(object):
+    """
+    Thread safe registry of counters, timers and histograms labelled e.g. by table, plus a log of events
+    (one per loaded chunk). Timers are histograms of durations in seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._events = []
+        self.started = time.time()
+
+    def increment(self, name: str, value: float = 1, **labels) -> None:
+        key = self._get_key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets: tuple = SIZE_BUCKETS, **labels) -> None:
+        key = self._get_key(name, labels)
+        with self._lock:
+            if key not in self._histograms:
+                self._histograms[key] = Histogram(buckets)
+            self._histograms[key].observe(value)
+
+    @contextlib.contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - started, DURATION_BUCKETS, **labels)
+
+    def add_event(self, name: str, **values) -> None:
+        with self._lock:
+            self._events.append(dict(values, event=name))
+
+    def get_counter(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(self._get_key(name, labels), 0)
+
+    def get_histogram(self, name: str, **labels) -> dict:
+        with self._lock:
+            histogram = self._histograms.get(self._get_key(name, labels))
+            return histogram.to_dict() if histogram else None
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                'started': round(self.started, 3),
+                'duration': round(time.time() - self.started, 3),
+                'counters': list(map(
+                    lambda item: {'name': item[0][0], 'labels': dict(item[0][1]), 'value': item[1]},
+                    sorted(self._counters.items())
+                )),
+                'histograms': list(map(
+                    lambda item: dict(item[1].to_dict(), name=item[0][0], labels=dict(item[0][1])),
+                    sorted(self._histograms.items(), key=lambda item: item[0])
+                )),
+                'events': list(self._events),
+            }
+
+    def to_prometheus(self) -> str:
+        """
+        Metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            for name in sorted(set(map(lambda key: key[0], self._counters))):
+                lines.append('# TYPE %s%s counter' % (PROMETHEUS_PREFIX, name))
+                for key, value in sorted(filter(lambda item: item[0][0] == name, self._counters.items())):
+                    lines.append('%s%s%s %s' % (PROMETHEUS_PREFIX, name, self._format_labels(key[1]), value))
+            for name in sorted(set(map(lambda key: key[0], self._histograms))):
+                lines.append('# TYPE %s%s histogram' % (PROMETHEUS_PREFIX, name))
+                for key, histogram in sorted(
+                        filter(lambda item: item[0][0] == name, self._histograms.items()),
+                        key=lambda item: item[0]
+                ):
+                    cumulative = 0
+                    for bound, bucket_count in zip(histogram.buckets + ('+Inf',), histogram.bucket_counts):
+                        cumulative += bucket_count
+                        labels = key[1] + (('le', str(bound)),)
+                        lines.append('%s%s_bucket%s %s' % (PROMETHEUS_PREFIX, name, self._format_labels(labels),
+                                                           cumulative))
+                    lines.append('%s%s_sum%s %s' % (PROMETHEUS_PREFIX, name, self._format_labels(key[1]),
+                                                    histogram.sum))
+                    lines.append('%s%s_count%s %s' % (PROMETHEUS_PREFIX, name, self._format_labels(key[1]),
+                                                      histogram.count))
+        return '\n'.join(lines) + '\n'
+
+    def write_summary(self, path: str) -> None:
+        write_atomic(path, json.dumps(self.to_dict(), indent=2))
+
+    def write_prometheus(self, path: str) -> None:
+        write_atomic(path, self.to_prometheus())
+
+    @staticmethod
+    def _get_key(name: str, labels: dict) -> tuple:
+        return name, tuple(sorted(map(lambda item: (item[0], str(item[1])), labels.items())))
+
+    @staticmethod
+    def _format_labels(labels: tuple) -> str:
+        if not labels:
+            return ''
+        return '{%s}' % ','.join(map(
+            lambda item: '%s="%s"' % (item[0], item[1].replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')),
+            labels
+        ))
@@ -0,0 +1,204 @@
+import os
+from typing import Iterator
+
+import pyarrow
+import pyarrow.compute
+import pyarrow.csv
+import pyarrow.parquet
+
+from google_bigquery_writer.exceptions import UserException
+
+BLOCK_SIZE = 64 * 1024 * 1024  # CSV bytes converted into one row group
+
+PARQUET_TYPES = {
+    'STRING': pyarrow.string(),
+    'INTEGER': pyarrow.int64(),
+    'INT64': pyarrow.int64(),
+    'FLOAT': pyarrow.float64(),
+    'FLOAT64': pyarrow.float64(),
+    'BOOLEAN': pyarrow.bool_(),
+    'BOOL': pyarrow.bool_(),
+    'NUMERIC': pyarrow.decimal128(38, 9),
+    'DATE': pyarrow.date32(),
+    'DATETIME': pyarrow.timestamp('us'),
+    'TIMESTAMP': pyarrow.timestamp('us', tz='UTC'),
+}
+NUMERIC_PARSE_TYPE = pyarrow.decimal256(76, 38)  # NUMERIC values with any decimal places, rounded afterwards
+TRUE_VALUES = ['true', 't', 'yes', 'y', '1']
+FALSE_VALUES = ['false', 'f', 'no', 'n', '0']
+DATE_TIME_PATTERNS = (
+    # single digit month, day, hour, minute and second
+    (r'^(\d{4})-(\d)-', r'\1-0\2-'),
+    (r'^(\d{4}-\d{2})-(\d)(\D|$)', r'\1-0\2\3'),
+    (r'^(\d{4}-\d{2}-\d{2}[ T])(\d)(\D|$)', r'\10\2\3'),
+    (r'^(\d{4}-\d{2}-\d{2}[ T]\d{2}):(\d)(\D|$)', r'\1:0\2\3'),
+    (r'^(\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}):(\d)(\D|$)', r'\1:0\2\3'),
+)
+ZONE_PATTERNS = (
+    (r'^(\d{4}-\d{2}-\d{2})$', r'\1 00:00:00'),
+    (r'(?i)\s*(UTC|Z)$', 'Z'),
+    (r'(\d)\s+([+-]\d{2}(:?\d{2})?)$', r'\1\2'),
+)
+ZONE_SUFFIX_PATTERN = r'(Z|[+-]\d{2}(:?\d{2})?)$'
+
+
+def get_parquet_type(item_definition: dict) -> pyarrow.DataType:
+    data_type = item_definition['type'].upper()
+    if data_type not in PARQUET_TYPES:
+        raise UserException('Column %s: type %s is not supported by the parquet load format.' % (
+            item_definition['dbName'],
+            item_definition['type']
+        ))
+    return PARQUET_TYPES[data_type]
+
+
+def get_parquet_schema(items: list) -> pyarrow.Schema:
+    return pyarrow.schema(list(map(
+        lambda item: (item['dbName'], get_parquet_type(item)),
+        items
+    )))
+
+
+def convert_column(column: pyarrow.Array, data_type: pyarrow.DataType) -> pyarrow.Array:
+    if pyarrow.types.is_string(data_type):
+        return column
+
+    column = normalize_column(column, data_type)
+    if pyarrow.types.is_decimal(data_type):
+        # more decimal places than the type has are rounded, as BigQuery does
+        column = pyarrow.compute.round(
+            pyarrow.compute.cast(column, NUMERIC_PARSE_TYPE),
+            ndigits=data_type.scale,
+            round_mode='half_towards_infinity'
+        )
+    return pyarrow.compute.cast(column, data_type)
+
+
+def normalize_column(column: pyarrow.Array, data_type: pyarrow.DataType) -> pyarrow.Array:
+    """
+    Rewrites the value forms accepted by BigQuery CSV loads into the forms parsed by the pyarrow casts,
+    value by value. Values BigQuery doesn't accept either are left to fail the cast.
+    """
+    column = pyarrow.compute.utf8_trim_whitespace(column)
+    # empty values are nulls in BigQuery CSV loads for all types but STRING
+    column = pyarrow.compute.if_else(pyarrow.compute.equal(column, ''), None, column)
+
+    if pyarrow.types.is_boolean(data_type):
+        lower_column = pyarrow.compute.utf8_lower(column)
+        column = pyarrow.compute.if_else(
+            pyarrow.compute.is_in(lower_column, value_set=pyarrow.array(TRUE_VALUES)),
+            'true',
+            pyarrow.compute.if_else(
+                pyarrow.compute.is_in(lower_column, value_set=pyarrow.array(FALSE_VALUES)),
+                'false',
+                column
+            )
+        )
+    elif pyarrow.types.is_integer(data_type):
+        column = pyarrow.compute.replace_substring_regex(column, pattern=r'^\+', replacement='')
+    elif pyarrow.types.is_date(data_type) or pyarrow.types.is_timestamp(data_type):
+        column = _replace_patterns(column, DATE_TIME_PATTERNS)
+        if pyarrow.types.is_timestamp(data_type) and data_type.tz:
+            column = _replace_patterns(column, ZONE_PATTERNS)
+            # values without a zone offset are in UTC
+            column = pyarrow.compute.if_else(
+                pyarrow.compute.match_substring_regex(column, ZONE_SUFFIX_PATTERN),
+                column,
+                pyarrow.compute.binary_join_element_wise(column, 'Z', '')
+            )
+    return column
+
+
+def _replace_patterns(column: pyarrow.Array, patterns: tuple) -> pyarrow.Array:
+    for pattern, replacement in patterns:
+        column = pyarrow.compute.replace_substring_regex(column, pattern=pattern, replacement=replacement)
+    return column
+
+
+def read_csv(csv_file_path: str, items: list, block_size: int = BLOCK_SIZE) -> Iterator[pyarrow.Table]:
+    """
+    Streams the CSV file as tables typed by the table items, one table per CSV block.
+    """
+    schema = get_parquet_schema(items)
+    file_name = os.path.basename(csv_file_path)
+    try:
+        reader = pyarrow.csv.open_csv(
+            csv_file_path,
+            read_options=pyarrow.csv.ReadOptions(
+                column_names=schema.names,
+                skip_rows=1,
+                block_size=block_size
+            ),
+            parse_options=pyarrow.csv.ParseOptions(newlines_in_values=True),
+            convert_options=pyarrow.csv.ConvertOptions(
+                column_types=dict(map(lambda name: (name, pyarrow.string()), schema.names)),
+                strings_can_be_null=True,
+                quoted_strings_can_be_null=False
+            )
+        )
+    except pyarrow.ArrowInvalid as err:
+        raise UserException('Cannot read file %s: %s' % (file_name, str(err)))
+
+    rows_read = 0
+    while True:
+        try:
+            batch = reader.read_next_batch()
+        except StopIteration:
+            return
+        except pyarrow.ArrowInvalid as err:
+            raise UserException('Cannot read file %s after row %s: %s' % (file_name, rows_read, str(err)))
+
+        columns = []
+        for index, field in enumerate(schema):
+            try:
+                columns.append(convert_column(batch.column(index), field.type))
+            except (pyarrow.ArrowInvalid, pyarrow.ArrowNotImplementedError) as err:
+                raise UserException('Cannot convert column %s in rows %s-%s of file %s to %s: %s' % (
+                    field.name,
+                    rows_read + 1,
+                    rows_read + batch.num_rows,
+                    file_name,
+                    field.type,
+                    str(err)
+                ))
+        rows_read += batch.num_rows
+        yield pyarrow.Table.from_arrays(columns, schema=schema)
+
+
+def convert_csv(csv_file_path: str, output_path: str, items: list, max_file_size: int,
+                compression: str = 'snappy', block_size: int = BLOCK_SIZE) -> Iterator[str]:
+    """
+    Streams the CSV file into parquet files typed by the table items.
+
+    Every CSV block becomes one row group, a new file is started once the current one exceeds `max_file_size`.
+    File paths are yielded as soon as each file is complete.
+    """
+    schema = get_parquet_schema(items)
+    file_name = os.path.basename(csv_file_path)
+    file_index = 0
+    sink = None
+    writer = None
+    try:
+        for table in read_csv(csv_file_path, items, block_size):
+            if writer is None:
+                parquet_path = os.path.join(output_path, '%s.%04d.parquet' % (file_name, file_index))
+                sink = pyarrow.OSFile(parquet_path, 'wb')
+                writer = pyarrow.parquet.ParquetWriter(sink, schema, compression=compression)
+            writer.write_table(table)
+
+            if sink.tell() >= max_file_size:
+                writer.close()
+                sink.close()
+                writer = None
+                yield parquet_path
+                file_index += 1
+
+        if writer is not None:
+            writer.close()
+            sink.close()
+            writer = None
+            yield parquet_path
+    finally:
+        if writer is not None:
+            writer.close()
+            sink.close()
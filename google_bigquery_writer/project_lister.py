@@ -0,0 +1,108 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
+from typing import Iterator
+
+from google.api_core.exceptions import GoogleAPICallError, RetryError
+from google.api_core.retry import Retry
+from google.cloud import bigquery
+from requests import exceptions as req_exceptions
+
+from google_bigquery_writer.listing_cache import ListingCache
+
+
+class ProjectLister(object):
+    """
+    Lists the projects visible to the service account with their datasets.
+
+    Datasets of the projects are listed in parallel by one client. Projects whose datasets can't be listed (e.g. not
+    accessible to the account) are returned with the error instead of failing the whole listing; projects not listed
+    within the time budget are returned without datasets and the listing is flagged as incomplete. With a cache,
+    projects cached by previous listings are returned first, without any requests.
+    """
+    MAX_WORKERS = 10
+    TIME_BUDGET = 25  # seconds
+
+    def __init__(self, bigquery_client: bigquery.Client, max_workers: int = MAX_WORKERS,
+                 time_budget: float = TIME_BUDGET, cache: ListingCache = None):
+        self.bigquery_client = bigquery_client
+        self.cache = cache
+        self.max_workers = max_workers
+        self.time_budget = time_budget
+        self.incomplete = False
+        self._deadline = None
+
+    def iter_projects(self) -> Iterator[dict]:
+        """
+        Projects are yielded as soon as their datasets are listed.
+        """
+        self.incomplete = False
+        self._deadline = time.monotonic() + self.time_budget
+        projects = self._get_projects()
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        futures = {}
+        try:
+            for project in projects:
+                cached_item = self.cache.get_project(project['id']) if self.cache is not None else None
+                if cached_item is not None:
+                    yield cached_item
+                else:
+                    futures[executor.submit(self._list_project, project)] = project
+            for future in as_completed(list(futures), timeout=self._get_timeout()):
+                futures.pop(future)
+                project_item = future.result()
+                if self.cache is not None and not project_item.get('incomplete'):
+                    self.cache.set_project(project_item)
+                yield project_item
+        except TimeoutError:
+            self.incomplete = True
+            for project in futures.values():
+                yield dict(project, datasets=[], incomplete=True)
+        finally:
+            # requests of the running workers time out with the budget, the pending ones are not started at all
+            executor.shutdown(wait=False, cancel_futures=True)
+            if self.cache is not None:
+                self.cache.save()
+
+    def _get_projects(self) -> list:
+        projects = self.cache.get_projects() if self.cache is not None else None
+        if projects is None:
+            projects = list(map(
+                lambda project: {
+                    'id': project.project_id,
+                    'name': project.friendly_name
+                },
+                self.bigquery_client.list_projects(retry=self._get_retry(), timeout=self._get_timeout())
+            ))
+            if self.cache is not None:
+                self.cache.set_projects(projects)
+        return projects
+
+    def _list_project(self, project: dict) -> dict:
+        project_item = dict(project, datasets=[])
+        try:
+            datasets = self.bigquery_client.list_datasets(
+                project['id'],
+                retry=self._get_retry(),
+                timeout=self._get_timeout()
+            )
+            project_item['datasets'] = list(map(
+                lambda dataset: {
+                    'id': dataset.dataset_id,
+                    'name': dataset.dataset_id
+                },
+                datasets
+            ))
+        except GoogleAPICallError as err:
+            project_item['error'] = err.message
+        except (req_exceptions.Timeout, req_exceptions.ConnectionError, RetryError):
+            self.incomplete = True
+            project_item['incomplete'] = True
+        return project_item
+
+    def _get_retry(self) -> Retry:
+        # failed requests are retried within the budget only
+        return bigquery.DEFAULT_RETRY.with_timeout(self._get_timeout())
+
+    def _get_timeout(self) -> float:
+        return max(0.1, self._deadline - time.monotonic())
@@ -0,0 +1,96 @@
+import contextlib
+import os
+import shutil
+import tempfile
+import threading
+from typing import Callable, Iterable, Iterator, Optional
+
+
+class SpillManager(object):
+    """
+    Local disk space of the files written before the upload (slices, compressed chunks, parquet files).
+
+    Every table load gets its own scratch directory, removed with everything left in it once the load is over.
+    Files are tracked against a disk budget shared by all tables loaded in parallel; producers reserve the space
+    of the next file first and wait until the uploaded files are removed and the budget allows it.
+    """
+
+    def __init__(self, base_path: str, budget: Optional[int] = None):
+        self.base_path = base_path
+        self.budget = budget  # bytes, None is unlimited
+        self.used = 0
+        self.peak = 0
+        self._files = {}  # path -> tracked size
+        self._condition = threading.Condition()
+
+    @contextlib.contextmanager
+    def directory(self, table_name: str) -> Iterator[str]:
+        os.makedirs(self.base_path, exist_ok=True)
+        path = tempfile.mkdtemp(prefix=table_name + '.', dir=self.base_path)
+        try:
+            yield path
+        finally:
+            with self._condition:
+                left = list(filter(lambda file_path: os.path.dirname(file_path) == path, self._files))
+            for file_path in left:
+                self._untrack(file_path)
+            shutil.rmtree(path, ignore_errors=True)
+
+    def reserve(self, size: int) -> None:
+        """
+        Blocks until `size` bytes fit into the budget. A file bigger than the whole budget is let through once
+        nothing else is on the disk, otherwise it would never be written.
+        """
+        with self._condition:
+            while self.budget is not None and self.used > 0 and self.used + size > self.budget:
+                self._condition.wait()
+            self._add(size)
+
+    def release(self, size: int) -> None:
+        with self._condition:
+            self._add(-size)
+            self._condition.notify_all()
+
+    def track(self, path: str, reserved: int = 0) -> None:
+        """
+        Replaces the space reserved for the file by its actual size.
+        """
+        size = os.path.getsize(path)
+        with self._condition:
+            self._files[path] = size
+            self._add(size - reserved)
+            self._condition.notify_all()
+
+    def remove(self, path: str) -> None:
+        try:
+            os.remove(path)
+        finally:
+            self._untrack(path)
+
+    def iter_files(self, items: Iterable, expected_size: int, get_path: Callable = lambda item: item) -> Iterator:
+        """
+        Reserves `expected_size` bytes before every item of a lazy file producer (e.g. the CSV splitter) is
+        produced, so the producer only runs ahead of the uploads as far as the budget allows.
+        """
+        items = iter(items)
+        while True:
+            self.reserve(expected_size)
+            try:
+                item = next(items)
+            except StopIteration:
+                self.release(expected_size)
+                return
+            except BaseException:
+                self.release(expected_size)
+                raise
+            self.track(get_path(item), expected_size)
+            yield item
+
+    def _untrack(self, path: str) -> None:
+        with self._condition:
+            size = self._files.pop(path, 0)
+        self.release(size)
+
+    def _add(self, size: int) -> None:
+        self.used += size
+        self.peak = max(self.peak, self.used)
@@ -0,0 +1,46 @@
+import json
+import os
+import threading
+
+from google_bigquery_writer.atomic_file import write_atomic
+
+
+class State(object):
+    """
+    Component state, loaded from in/state.json and persisted to out/state.json on every change and at the end
+    of the run, so an unchanged state is kept too.
+    """
+
+    def __init__(self, data_dir: str):
+        self.in_path = os.path.join(data_dir, 'in', 'state.json')
+        self.out_path = os.path.join(data_dir, 'out', 'state.json')
+        self._lock = threading.RLock()
+        self._data = {}
+        if os.path.exists(self.in_path):
+            with open(self.in_path) as state_file:
+                self._data = json.load(state_file) or {}
+
+    def transaction(self) -> threading.RLock:
+        """
+        Lock to hold for read-modify-write sequences over the state.
+        """
+        return self._lock
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            return self._data.get(key, default)
+
+    def set(self, key: str, value) -> None:
+        with self._lock:
+            self._data[key] = value
+            self.save()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if key in self._data:
+                del self._data[key]
+                self.save()
+
+    def save(self) -> None:
+        with self._lock:
+            write_atomic(self.out_path, json.dumps(self._data))
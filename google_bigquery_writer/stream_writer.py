@@ -0,0 +1,163 @@
+from typing import Iterator, List, Tuple
+
+import pyarrow
+import pyarrow.compute
+from google.cloud.bigquery_storage_v1 import BigQueryWriteClient, types, writer
+from google.protobuf import descriptor_pb2, descriptor_pool, message_factory
+
+from google_bigquery_writer import parquet_converter
+from google_bigquery_writer.exceptions import UserException
+
+MB = 1024 * 1024
+ROW_MESSAGE_NAME = 'Row'
+
+
+def get_proto_type(data_type: pyarrow.DataType) -> int:
+    if pyarrow.types.is_int64(data_type):
+        return descriptor_pb2.FieldDescriptorProto.TYPE_INT64
+    if pyarrow.types.is_float64(data_type):
+        return descriptor_pb2.FieldDescriptorProto.TYPE_DOUBLE
+    if pyarrow.types.is_boolean(data_type):
+        return descriptor_pb2.FieldDescriptorProto.TYPE_BOOL
+    if pyarrow.types.is_date32(data_type):
+        return descriptor_pb2.FieldDescriptorProto.TYPE_INT32  # days since the epoch
+    if pyarrow.types.is_timestamp(data_type) and data_type.tz:
+        return descriptor_pb2.FieldDescriptorProto.TYPE_INT64  # microseconds since the epoch
+    # strings, numerics and datetimes are sent in their canonical string form
+    return descriptor_pb2.FieldDescriptorProto.TYPE_STRING
+
+
+def get_proto_column(column: pyarrow.Array, data_type: pyarrow.DataType) -> pyarrow.Array:
+    proto_type = get_proto_type(data_type)
+    if proto_type == descriptor_pb2.FieldDescriptorProto.TYPE_INT32:
+        return pyarrow.compute.cast(column, pyarrow.int32())
+    if proto_type == descriptor_pb2.FieldDescriptorProto.TYPE_INT64:
+        return pyarrow.compute.cast(column, pyarrow.int64())
+    if proto_type == descriptor_pb2.FieldDescriptorProto.TYPE_STRING and not pyarrow.types.is_string(data_type):
+        return pyarrow.compute.cast(column, pyarrow.string())
+    return column
+
+
+def get_row_descriptor(schema: pyarrow.Schema) -> descriptor_pb2.DescriptorProto:
+    descriptor = descriptor_pb2.DescriptorProto(name=ROW_MESSAGE_NAME)
+    for index, field in enumerate(schema):
+        descriptor.field.add(
+            name=field.name,
+            number=index + 1,
+            type=get_proto_type(field.type),
+            label=descriptor_pb2.FieldDescriptorProto.LABEL_OPTIONAL
+        )
+    return descriptor
+
+
+def get_row_class(descriptor: descriptor_pb2.DescriptorProto):
+    file_descriptor = descriptor_pb2.FileDescriptorProto(name='row.proto', syntax='proto2')
+    file_descriptor.message_type.add().CopyFrom(descriptor)
+    pool = descriptor_pool.DescriptorPool()
+    try:
+        pool.Add(file_descriptor)
+    except TypeError as err:
+        raise UserException('Cannot stream columns %s: %s' % (
+            ', '.join(map(lambda field: field.name, descriptor.field)),
+            str(err)
+        ))
+    return message_factory.GetMessageClass(pool.FindMessageTypeByName(ROW_MESSAGE_NAME))
+
+
+class StreamWriter(object):
+    """
+    Appends rows of the CSV file into the table through a pending stream of the Storage Write API,
+    all the rows become visible at once when the stream is committed.
+    """
+    MAX_REQUEST_SIZE = 8 * MB  # append requests are limited to 10MB
+    MAX_PENDING_REQUESTS = 10
+    REQUEST_TIMEOUT = 120  # Timeout in seconds
+
+    def __init__(self, write_client: BigQueryWriteClient):
+        self.write_client = write_client
+
+    def write(self, csv_file_path: str, table_reference, items: list) -> int:
+        """
+        Returns the number of streamed rows.
+        """
+        table_path = self.write_client.table_path(
+            table_reference.project,
+            table_reference.dataset_id,
+            table_reference.table_id
+        )
+        schema = parquet_converter.get_parquet_schema(items)
+        descriptor = get_row_descriptor(schema)
+        row_class = get_row_class(descriptor)
+
+        write_stream = self.write_client.create_write_stream(
+            parent=table_path,
+            write_stream=types.WriteStream(type_=types.WriteStream.Type.PENDING),
+            timeout=self.REQUEST_TIMEOUT
+        )
+        template = types.AppendRowsRequest(
+            write_stream=write_stream.name,
+            proto_rows=types.AppendRowsRequest.ProtoData(
+                writer_schema=types.ProtoSchema(proto_descriptor=descriptor)
+            )
+        )
+        append_rows_stream = writer.AppendRowsStream(self.write_client, template)
+        offset = 0
+        futures = []
+        try:
+            for serialized_rows in self._iter_serialized_rows(csv_file_path, items, row_class):
+                # offsets make retried appends idempotent
+                futures.append(append_rows_stream.send(types.AppendRowsRequest(
+                    offset=offset,
+                    proto_rows=types.AppendRowsRequest.ProtoData(
+                        rows=types.ProtoRows(serialized_rows=serialized_rows)
+                    )
+                )))
+                offset += len(serialized_rows)
+                if len(futures) >= self.MAX_PENDING_REQUESTS:
+                    futures.pop(0).result(timeout=self.REQUEST_TIMEOUT)
+            for future in futures:
+                future.result(timeout=self.REQUEST_TIMEOUT)
+        finally:
+            append_rows_stream.close()
+
+        self.write_client.finalize_write_stream(name=write_stream.name, timeout=self.REQUEST_TIMEOUT)
+        response = self.write_client.batch_commit_write_streams(
+            types.BatchCommitWriteStreamsRequest(parent=table_path, write_streams=[write_stream.name]),
+            timeout=self.REQUEST_TIMEOUT
+        )
+        if response.stream_errors:
+            raise UserException('Cannot commit streamed rows: %s' % ', '.join(map(
+                lambda stream_error: stream_error.error_message,
+                response.stream_errors
+            )))
+        return offset
+
+    def _iter_serialized_rows(self, csv_file_path: str, items: list, row_class) -> Iterator[List[bytes]]:
+        """
+        Rows serialized into batches fitting into one append request.
+        """
+        batch = []
+        batch_size = 0
+        for names, rows in self._iter_rows(csv_file_path, items):
+            for row in rows:
+                serialized_row = row_class(**dict(filter(
+                    lambda value: value[1] is not None,
+                    zip(names, row)
+                ))).SerializeToString()
+                if batch and batch_size + len(serialized_row) > self.MAX_REQUEST_SIZE:
+                    yield batch
+                    batch = []
+                    batch_size = 0
+                batch.append(serialized_row)
+                batch_size += len(serialized_row)
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _iter_rows(csv_file_path: str, items: list) -> Iterator[Tuple[List[str], Iterator[tuple]]]:
+        for table in parquet_converter.read_csv(csv_file_path, items):
+            columns = list(map(
+                lambda index: get_proto_column(table.column(index), table.schema.field(index).type).to_pylist(),
+                range(table.num_columns)
+            ))
+            yield table.schema.names, zip(*columns)
@@ -0,0 +1,52 @@
+import json
+from typing import Optional
+
+from google_bigquery_writer.load_progress import get_content_hash, new_content_hash
+from google_bigquery_writer.state import State
+
+# options of the table definition the loaded table depends on, the others only change how it's loaded
+FINGERPRINT_OPTIONS = ('dbName', 'items', 'partitioning', 'partitioning_granularity', 'partitioning_column',
+                       'partition_expiration_ms', 'partitioning_range_start', 'partitioning_range_end',
+                       'partitioning_range_interval', 'require_partition_filter', 'clustering', 'clustering_columns')
+
+
+def get_fingerprint(csv_file_path: str, table_definition: dict) -> str:
+    fingerprint = new_content_hash()
+    fingerprint.update(get_content_hash(csv_file_path).encode())
+    fingerprint.update(json.dumps(
+        dict(filter(lambda option: option[0] in FINGERPRINT_OPTIONS, table_definition.items())),
+        sort_keys=True
+    ).encode())
+    return fingerprint.hexdigest()
+
+
+class TableFingerprint(object):
+    """
+    Fingerprint of the input and the definition of the last successful full load of a table,
+    persisted in the component state.
+    """
+    STATE_KEY = 'tableFingerprints'
+
+    def __init__(self, state: State, table_key: str):
+        self.state = state
+        self.table_key = table_key
+
+    def get(self) -> Optional[str]:
+        return self.state.get(self.STATE_KEY, {}).get(self.table_key)
+
+    def save(self, fingerprint: str) -> None:
+        self._update(fingerprint)
+
+    def delete(self) -> None:
+        self._update(None)
+
+    def _update(self, fingerprint: Optional[str]) -> None:
+        with self.state.transaction():
+            fingerprints = dict(self.state.get(self.STATE_KEY, {}))
+            if fingerprint is None:
+                if self.table_key not in fingerprints:
+                    return
+                fingerprints.pop(self.table_key)
+            else:
+                fingerprints[self.table_key] = fingerprint
+            self.state.set(self.STATE_KEY, fingerprints)
@@ -0,0 +1,63 @@
+import base64
+import datetime
+import hashlib
+import json
+import logging
+import os
+
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from google.auth import credentials as google_credentials
+
+from google_bigquery_writer.atomic_file import write_atomic
+
+
+class TokenCache(object):
+    """
+    Access tokens of a service account persisted across runs, one file per account and scopes.
+
+    Files are encrypted by a key derived from the private key of the account, so only runs configured with the same
+    service account can read them. Unreadable or expired files are ignored.
+    """
+
+    def __init__(self, cache_path: str, private_key: str, client_email: str, scopes: list):
+        self.cache_path = cache_path
+        key = HKDF(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=client_email.encode(),
+            info=b'google-bigquery-writer token cache'
+        ).derive(private_key.encode())
+        self._fernet = Fernet(base64.urlsafe_b64encode(key))
+        cache_key = '%s %s' % (client_email, ' '.join(sorted(scopes)))
+        self.file_path = os.path.join(cache_path, '%s.token' % hashlib.sha256(cache_key.encode()).hexdigest())
+
+    def load(self, credentials: google_credentials.Credentials) -> bool:
+        """
+        Sets the cached token to the credentials, if it has not expired yet.
+        """
+        try:
+            with open(self.file_path, 'rb') as cache_file:
+                cached = json.loads(self._fernet.decrypt(cache_file.read()))
+            expiry = datetime.datetime.fromisoformat(cached['expiry'])
+        except FileNotFoundError:
+            return False
+        except (OSError, InvalidToken, ValueError, KeyError) as err:
+            logging.warning('Cannot read cached access token: %s' % (str(err) or type(err).__name__))
+            return False
+
+        if expiry <= datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None):
+            return False
+        credentials.token = cached['token']
+        credentials.expiry = expiry
+        return True
+
+    def save(self, credentials: google_credentials.Credentials) -> None:
+        if not credentials.token or credentials.expiry is None:
+            return
+        content = self._fernet.encrypt(json.dumps({
+            'token': credentials.token,
+            'expiry': credentials.expiry.isoformat()
+        }).encode())
+        write_atomic(self.file_path, content, 0o600)
@@ -0,0 +1,79 @@
+import datetime
+import logging
+import threading
+
+import google.auth.transport.requests
+from google.auth import credentials as google_credentials
+from google.auth.exceptions import RefreshError, TransportError
+
+from google_bigquery_writer.token_cache import TokenCache
+
+
+class TokenRefresher(object):
+    """
+    Keeps the access token of credentials shared by all clients of a run valid from a background thread.
+
+    The token is renewed `margin` seconds before it expires, earlier than the clients would refresh it themselves
+    (google-auth refreshes tokens expiring in less than ~4 minutes), so no request waits for the token exchange.
+    With a cache, a token cached by a previous run is used as long as it is not due for a refresh, and every new
+    token is cached.
+    """
+    DEFAULT_MARGIN = 300  # seconds
+    RETRY_DELAY = 10  # seconds
+
+    def __init__(self, credentials: google_credentials.Credentials, margin: int = DEFAULT_MARGIN,
+                 request: google.auth.transport.Request = None, cache: TokenCache = None):
+        self.credentials = credentials
+        self.margin = margin
+        self.cache = cache
+        self.request = request or google.auth.transport.requests.Request()
+        self.refreshes = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        """
+        Obtains the first token (unless a cached one is valid long enough) and starts the background refreshes.
+        Fails with RefreshError when the credentials are rejected.
+        """
+        if self.cache is not None and self.cache.load(self.credentials):
+            print('Using cached access token')
+        if not self.credentials.token or self.get_seconds_to_refresh() <= 0:
+            self.refresh()
+        self._thread = threading.Thread(target=self._run, name='token-refresher', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def refresh(self) -> None:
+        with self._lock:
+            self.credentials.refresh(self.request)
+            self.refreshes += 1
+        if self.cache is not None:
+            try:
+                self.cache.save(self.credentials)
+            except OSError as err:
+                logging.warning('Cannot cache access token: %s' % str(err))
+
+    def get_seconds_to_refresh(self) -> float:
+        if self.credentials.expiry is None:
+            return float('inf')  # the token never expires
+        # expiry of google-auth credentials is a naive UTC datetime
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return (self.credentials.expiry - now).total_seconds() - self.margin
+
+    def _run(self) -> None:
+        delay = self.get_seconds_to_refresh()
+        while not self._stopped.wait(max(0.0, delay)):
+            try:
+                self.refresh()
+                delay = self.get_seconds_to_refresh()
+            except (RefreshError, TransportError) as err:
+                # the current token may still be valid, the clients refresh it themselves once it is not
+                logging.warning('Cannot refresh access token: %s' % str(err))
+                delay = self.RETRY_DELAY
@@ -0,0 +1,178 @@
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional, Tuple
+
+import pyarrow
+import pyarrow.compute
+import pyarrow.csv
+
+from google_bigquery_writer import csv_splitter, parquet_converter
+from google_bigquery_writer.exceptions import UserException
+from google_bigquery_writer.file_window import FileWindow
+
+RANGE_SIZE = 64 * 1024 * 1024  # CSV bytes validated by one task
+BLOCK_SIZE = 16 * 1024 * 1024  # CSV bytes validated by one vectorized pass
+VALIDATED_TYPES = ('INTEGER', 'INT64', 'FLOAT', 'FLOAT64', 'BOOLEAN', 'BOOL', 'NUMERIC', 'DATE', 'DATETIME',
+                   'TIMESTAMP')
+DATE_PATTERN = r'\d{4}-\d{1,2}-\d{1,2}'
+DATETIME_PATTERN = DATE_PATTERN + r'([ T]\d{1,2}:\d{1,2}(:\d{1,2}(\.\d{1,6})?)?)?'
+ZONE_NAME_PATTERN = r'[A-Za-z_]+(/[A-Za-z0-9_+-]+)+'
+# forms of the values accepted by BigQuery CSV loads, matched against values without surrounding whitespace
+CSV_GRAMMAR = {
+    'INTEGER': r'[+-]?\d+',
+    'FLOAT': r'[+-]?((\d+(\.\d*)?|\.\d+)([eE][+-]?\d+)?|(?i:inf|infinity|nan))',
+    'BOOLEAN': r'(?i:true|false|t|f|yes|no|y|n|1|0)',
+    'NUMERIC': r'[+-]?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d+)?',
+    'DATE': DATE_PATTERN,
+    'DATETIME': DATETIME_PATTERN,
+    'TIMESTAMP': DATETIME_PATTERN + r'(\s*(Z|UTC|[+-]\d{1,2}(:?\d{2})?|' + ZONE_NAME_PATTERN + r'))?',
+}
+CSV_GRAMMAR.update({'INT64': CSV_GRAMMAR['INTEGER'], 'FLOAT64': CSV_GRAMMAR['FLOAT'], 'BOOL': CSV_GRAMMAR['BOOLEAN']})
+# types whose values matching the grammar can still be out of range or not exist in the calendar
+RANGE_CHECKED_TYPES = ('INTEGER', 'INT64', 'NUMERIC', 'DATE', 'DATETIME', 'TIMESTAMP')
+
+
+class InvalidValue(NamedTuple):
+    row: int  # data row in the byte range, from 0
+    column: str
+    data_type: str
+    value: str
+
+
+class RangeResult(NamedTuple):
+    nr_of_rows: int
+    invalid_value: Optional[InvalidValue]
+
+
+def find_invalid_index(column: pyarrow.Array, data_type: str) -> Optional[int]:
+    """
+    Index of the first value of the string column BigQuery CSV loads don't accept as the type, None if all are valid.
+
+    Values are matched against the CSV grammar of the type at once; values matching it are checked for the range
+    (and the calendar) by the conversion of the parquet load format, value by value when the column fails it.
+    """
+    trimmed = pyarrow.compute.utf8_trim_whitespace(column)
+    matches = pyarrow.compute.match_substring_regex(trimmed, '^(%s)?$' % CSV_GRAMMAR[data_type])  # or empty
+    invalid_index = pyarrow.compute.index(pyarrow.compute.fill_null(matches, True), False).as_py()
+    invalid_index = None if invalid_index == -1 else invalid_index
+    if data_type not in RANGE_CHECKED_TYPES:
+        return invalid_index
+
+    checked = pyarrow.compute.if_else(matches, column, None)
+    if data_type == 'TIMESTAMP':
+        # zone names are not converted, their values are checked by the grammar only
+        named_zone = pyarrow.compute.match_substring_regex(trimmed, ZONE_NAME_PATTERN + '$')
+        checked = pyarrow.compute.if_else(named_zone, None, checked)
+    if invalid_index is not None:
+        checked = checked.slice(0, invalid_index)
+    parquet_type = parquet_converter.PARQUET_TYPES[data_type]
+    if is_convertible(checked, parquet_type):
+        return invalid_index
+    return next(filter(lambda index: not is_convertible(checked.slice(index, 1), parquet_type), range(len(checked))))
+
+
+def is_convertible(column: pyarrow.Array, parquet_type: pyarrow.DataType) -> bool:
+    try:
+        parquet_converter.convert_column(column, parquet_type)
+        return True
+    except (pyarrow.ArrowInvalid, pyarrow.ArrowNotImplementedError):
+        return False
+
+
+class CsvTypeValidator(object):
+    """
+    Checks the values of a CSV file against the types of the table items before the file is uploaded.
+
+    The file is split into record aligned byte ranges validated in parallel, every column in a vectorized pass
+    per block. Validation stops at the first invalid value; ranges following an invalid value are skipped,
+    the preceding ones are only finished to count their rows, so the value is reported with its row number.
+    """
+
+    def __init__(self, csv_file_path: str, items: list, workers: int, range_size: int = RANGE_SIZE,
+                 block_size: int = BLOCK_SIZE):
+        self.csv_file_path = csv_file_path
+        self.items = items
+        self.workers = workers
+        self.range_size = range_size
+        self.block_size = block_size
+        self.columns = list(filter(lambda item: item['type'].upper() in VALIDATED_TYPES, items))
+        self._failed_range = math.inf
+        self._lock = threading.Lock()
+
+    def validate(self) -> int:
+        """
+        Returns the number of validated rows, fails with UserException on an invalid value.
+        """
+        if not self.columns:
+            return 0
+        file_size = os.path.getsize(self.csv_file_path)
+        byte_ranges = csv_splitter.find_record_ranges(
+            self.csv_file_path,
+            max(self.workers, math.ceil(file_size / self.range_size))
+        )
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = list(executor.map(self._validate_range, range(len(byte_ranges)), byte_ranges))
+
+        rows_before = 0
+        for result in results:
+            if result.invalid_value is not None:
+                invalid_value = result.invalid_value
+                raise UserException('Column %s has invalid %s value "%s" in row %s of file %s.' % (
+                    invalid_value.column,
+                    invalid_value.data_type,
+                    invalid_value.value,
+                    rows_before + invalid_value.row + 1,
+                    os.path.basename(self.csv_file_path)
+                ))
+            rows_before += result.nr_of_rows
+        return rows_before
+
+    def _validate_range(self, range_index: int, byte_range: Tuple[int, int]) -> RangeResult:
+        if range_index > self._failed_range:
+            return RangeResult(0, None)
+        names = list(map(lambda item: item['dbName'], self.items))
+        with FileWindow(self.csv_file_path, *byte_range) as readable:
+            try:
+                reader = pyarrow.csv.open_csv(
+                    readable,
+                    read_options=pyarrow.csv.ReadOptions(
+                        column_names=names,
+                        skip_rows=1 if byte_range[0] == 0 else 0,  # only the first range starts with the header
+                        block_size=self.block_size
+                    ),
+                    parse_options=pyarrow.csv.ParseOptions(newlines_in_values=True),
+                    convert_options=pyarrow.csv.ConvertOptions(
+                        include_columns=list(map(lambda item: item['dbName'], self.columns)),
+                        column_types=dict(map(lambda name: (name, pyarrow.string()), names)),
+                        strings_can_be_null=True,
+                        quoted_strings_can_be_null=False
+                    )
+                )
+            except StopIteration:
+                return RangeResult(0, None)  # nothing but the header
+            except pyarrow.ArrowInvalid as err:
+                raise UserException('Cannot read file %s: %s' % (os.path.basename(self.csv_file_path), str(err)))
+
+            nr_of_rows = 0
+            for batch in reader:
+                if range_index > self._failed_range:
+                    return RangeResult(nr_of_rows, None)
+                invalid_value = self._validate_batch(batch)
+                if invalid_value is not None:
+                    with self._lock:
+                        self._failed_range = min(self._failed_range, range_index)
+                    return RangeResult(nr_of_rows, invalid_value._replace(row=nr_of_rows + invalid_value.row))
+                nr_of_rows += batch.num_rows
+            return RangeResult(nr_of_rows, None)
+
+    def _validate_batch(self, batch: pyarrow.RecordBatch) -> Optional[InvalidValue]:
+        invalid_values = []
+        for item in self.columns:
+            column = batch.column(batch.schema.get_field_index(item['dbName']))
+            index = find_invalid_index(column, item['type'].upper())
+            if index is not None:
+                invalid_values.append(InvalidValue(index, item['dbName'], item['type'].upper(), column[index].as_py()))
+        # the first invalid row, the first invalid column in it
+        return min(invalid_values, key=lambda invalid_value: invalid_value.row, default=None)
@@ -2,32 +2,118 @@ import logging
 
 from requests import exceptions as req_exceptions
 from google.cloud import bigquery, exceptions as bq_exceptions
-from typing import List
+from typing import TYPE_CHECKING, Dict, Iterator, List, NamedTuple, Optional, Tuple
 
 from google_bigquery_writer.exceptions import UserException
-from google_bigquery_writer import schema_mapper
-from google.api_core.exceptions import BadRequest, TooManyRequests
+from google_bigquery_writer import chunk_planner, compression, csv_splitter, load_progress, merge_query, schema_mapper
+from google_bigquery_writer.compression import COMPRESSION_GZIP
+from google_bigquery_writer.file_window import FileWindow
+from google_bigquery_writer.job_tracker import JobTracker
+from google_bigquery_writer.load_progress import LoadProgress
+from google_bigquery_writer.loaded_prefix import LoadedPrefix
+from google_bigquery_writer.metrics import DURATION_BUCKETS, Metrics
+from google_bigquery_writer.spill import SpillManager
+from google_bigquery_writer.state import State
+from google_bigquery_writer.table_fingerprint import TableFingerprint, get_fingerprint
+from google.api_core.exceptions import BadRequest, GoogleAPICallError, PreconditionFailed, TooManyRequests
 from google.cloud.bigquery.dataset import DatasetReference
 from google.cloud.bigquery.table import TimePartitioning, RangePartitioning, PartitionRange
 
+from concurrent.futures import ProcessPoolExecutor
 from concurrent.futures import ThreadPoolExecutor
 from concurrent.futures import as_completed
 
 import backoff
-import math
+import datetime
+import itertools
+import multiprocessing
 import os
-import subprocess
+import threading
 import time
 
+if TYPE_CHECKING:
+    # pyarrow and the storage clients are imported only by the runs using them
+    from google_bigquery_writer.gcs_staging import GcsStaging
+    from google_bigquery_writer.stream_writer import StreamWriter
+
+MB = 1024 * 1024
+
+
+def count_retry(details: dict) -> None:
+    """
+    Backoff handler counting retries of writer methods in the writer metrics.
+    """
+    writer = details['args'][0]
+    table_name = details['kwargs'].get('table_name', '')
+    for arg in details['args'][1:]:
+        if isinstance(arg, bigquery.TableReference):
+            table_name = arg.table_id
+        elif isinstance(arg, dict) and 'dbName' in arg:
+            table_name = arg['dbName']
+    writer.metrics.increment('retries_total', operation=details['target'].__name__, table=table_name)
+
+
+class Chunk(NamedTuple):
+    file_path: str
+    skip: int
+    byte_range: Optional[Tuple[int, int]] = None
+    source_format: str = 'CSV'
+    temporary: bool = False  # removed as soon as its job is accepted
+    source_range: Optional[Tuple[int, int]] = None  # byte range of the chunk data in the input file
+    content_hash: Optional[str] = None
+
+
+class LoadJobs(list):
+    """
+    Load jobs of a table; close() deletes the objects of the staging bucket they load, once they are finished.
+    """
+
+    def __init__(self, jobs=(), staging: 'GcsStaging' = None, object_names: List[str] = ()):
+        super(LoadJobs, self).__init__(jobs)
+        self.staging = staging
+        self.object_names = list(object_names)
+
+    def close(self) -> None:
+        if self.object_names:
+            object_names, self.object_names = self.object_names, []
+            self.staging.delete(object_names)
+
+    def __enter__(self) -> 'LoadJobs':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
 
 class Writer(object):
     REQUEST_TIMEOUT = 120  # Timeout in seconds
     DEFAULT_CHUNK_SIZE_MB = 1_000
+    DEFAULT_MIN_CHUNK_SIZE_MB = 64  # smaller chunks don't pay off the overhead of another load job
     MAX_WORKERS = 5  # https://cloud.google.com/bigquery/quotas#standard_tables
     TEMP_PATH = '/tmp/data'
+    CHUNK_MODE_SLICES = 'slices'
+    CHUNK_MODE_RANGES = 'ranges'
+    LOAD_FORMAT_CSV = 'csv'
+    LOAD_FORMAT_PARQUET = 'parquet'
+    FULL_LOAD_MODE_RECREATE = 'recreate'
+    FULL_LOAD_MODE_TRUNCATE = 'truncate'
+    MODE_LOAD = 'load'
+    MODE_STREAM = 'stream'
+    POLLING_DELAY = 5  # Maximal delay between job status checks in seconds
+    STAGING_TABLE_EXPIRATION = datetime.timedelta(days=7)  # a staging table kept for a resumed load
 
-    def __init__(self, bigquery_client: bigquery.Client):
+    def __init__(self, bigquery_client: bigquery.Client, state: State = None, staging: 'GcsStaging' = None,
+                 stream_writer: 'StreamWriter' = None, metrics: Metrics = None, spill: SpillManager = None):
         self.bigquery_client = bigquery_client
+        self.metrics = metrics or Metrics()
+        self.spill = spill or SpillManager(self.TEMP_PATH)
+        self.state = state
+        self.staging = staging
+        self.stream_writer = stream_writer
+        self._verified_projects = {}
+        self._verified_projects_lock = threading.Lock()
+        self._loaded_inputs = {}  # table key -> size and content hash of the input being loaded
+        self._loaded_inputs_lock = threading.Lock()
 
     def obtain_dataset(self, dataset_name: str) -> bigquery.Dataset:
         dataset_reference = DatasetReference(self.bigquery_client.project, dataset_name)
@@ -47,27 +133,44 @@ class Writer(object):
             )
             raise UserException(message)
 
-    @backoff.on_exception(backoff.expo, bq_exceptions.Forbidden, max_tries=5)
     def verify_project(self) -> None:
-        projects = self.bigquery_client.list_projects(timeout=self.REQUEST_TIMEOUT)
-        project_list = list(map(
-            lambda project: project.project_id,
-            projects
-        ))
+        project = self.bigquery_client.project
+        with self._verified_projects_lock:
+            if project not in self._verified_projects:
+                self._verified_projects[project] = self._project_exists(project)
 
-        if self.bigquery_client.project not in project_list:
+        if not self._verified_projects[project]:
             message = 'Project %s was not found.' % (
-                self.bigquery_client.project
+                project
             )
             raise UserException(message)
 
-    def prepare_table(
-            self,
-            dataset: bigquery.Dataset,
-            table_definition: dict,
-            columns_schema: list,
-            incremental: bool
-    ) -> bigquery.TableReference:
+    @backoff.on_exception(backoff.expo, bq_exceptions.Forbidden, max_tries=5, on_backoff=count_retry)
+    def _project_exists(self, project: str) -> bool:
+        try:
+            self.bigquery_client.get_service_account_email(project=project, timeout=self.REQUEST_TIMEOUT)
+            return True
+        except bq_exceptions.NotFound:
+            return False
+        except bq_exceptions.Forbidden as err:
+            if self._is_rate_limit_error(err):
+                raise
+            # no direct access to the project, check whether it is at least visible to the account
+            projects = self.bigquery_client.list_projects(timeout=self.REQUEST_TIMEOUT)
+            return project in map(
+                lambda project_item: project_item.project_id,
+                projects
+            )
+
+    @staticmethod
+    def _is_rate_limit_error(err: bq_exceptions.GoogleCloudError) -> bool:
+        return any(map(
+            lambda error: error.get('reason') in ('rateLimitExceeded', 'quotaExceeded'),
+            err.errors or []
+        ))
+
+    @staticmethod
+    def get_table_object(dataset: bigquery.Dataset, table_definition: dict, columns_schema: list) -> bigquery.Table:
         table_reference = dataset.table(table_definition['dbName'])
         table = bigquery.Table(table_reference, columns_schema)
 
@@ -102,6 +205,18 @@ class Writer(object):
         if table_definition.get("clustering"):
             table.clustering_fields = table_definition.get("clustering_columns")
 
+        return table
+
+    def prepare_table(
+            self,
+            dataset: bigquery.Dataset,
+            table_definition: dict,
+            columns_schema: list,
+            incremental: bool
+    ) -> bigquery.TableReference:
+        table = self.get_table_object(dataset, table_definition, columns_schema)
+        table_reference = table.reference
+
         try:
             bq_table = self.bigquery_client.get_table(table_reference, timeout=self.REQUEST_TIMEOUT)
             table_exist = True
@@ -133,13 +248,46 @@ class Writer(object):
                 raise UserException(message)
         return table_reference
 
-    def write_table(self, csv_file_path: str, dataset_name: str, table_definition: dict, incremental: bool = False) \
-            -> List[bigquery.LoadJob]:
+    def write_table(self, csv_file_path: str, dataset_name: str, table_definition: dict, incremental: bool = False,
+                    polling_max_retries: int = 360, polling_delay: int = 5) -> LoadJobs:
+        """
+        Submits the load jobs of the table; close the returned jobs once they are finished (or use them as a context
+        manager), so the chunks uploaded into the staging bucket are deleted. The polling arguments limit the wait
+        for a truncating job the other chunks are appended after.
+        """
 
         chunk_size = table_definition.get('chunkSize')
         if not chunk_size:
             chunk_size = self.DEFAULT_CHUNK_SIZE_MB
-            logging.info('Chunk size not specified, using default value: %s' % self.DEFAULT_CHUNK_SIZE_MB)
+            logging.info('[%s] Chunk size not specified, using default value: %s' % (
+                table_definition.get('dbName'),
+                self.DEFAULT_CHUNK_SIZE_MB
+            ))
+
+        chunk_mode = table_definition.get('chunkMode') or self.CHUNK_MODE_SLICES
+        if chunk_mode not in (self.CHUNK_MODE_SLICES, self.CHUNK_MODE_RANGES):
+            raise UserException(f"Unsupported chunk mode: {chunk_mode}")
+
+        compression_type = table_definition.get('compression')
+        if compression_type not in (None, '', COMPRESSION_GZIP):
+            raise UserException(f"Unsupported compression: {compression_type}")
+
+        load_format = table_definition.get('loadFormat') or self.LOAD_FORMAT_CSV
+        if load_format not in (self.LOAD_FORMAT_CSV, self.LOAD_FORMAT_PARQUET):
+            raise UserException(f"Unsupported load format: {load_format}")
+
+        full_load_mode = table_definition.get('fullLoadMode') or self.FULL_LOAD_MODE_RECREATE
+        if full_load_mode not in (self.FULL_LOAD_MODE_RECREATE, self.FULL_LOAD_MODE_TRUNCATE):
+            raise UserException(f"Unsupported full load mode: {full_load_mode}")
+
+        mode = table_definition.get('mode') or self.MODE_LOAD
+        if mode not in (self.MODE_LOAD, self.MODE_STREAM):
+            raise UserException(f"Unsupported mode: {mode}")
+        if mode == self.MODE_STREAM and not incremental:
+            raise UserException("Stream mode is supported for incremental tables only")
+
+        if self.staging is not None and compression_type and load_format == self.LOAD_FORMAT_CSV:
+            raise UserException("Compression is not supported when loading through the staging bucket")
 
         if dataset_name == '' or dataset_name is None:
             raise UserException('Dataset name not specified.')
@@ -148,7 +296,13 @@ class Writer(object):
                 or table_definition['dbName'] is None:
             raise UserException('Table name not specified.')
 
-        self.verify_project()  # Verify that defined project exists
+        table_name = table_definition['dbName']
+        with self.metrics.timer('verify_project_seconds', table=table_name):
+            self.verify_project()  # Verify that defined project exists
+
+        if self.state is not None:
+            # the table is about to change, its fingerprint would make the next load of the same input be skipped
+            TableFingerprint(self.state, self._get_table_key(dataset_name, table_definition)).delete()
 
         columns_schema = schema_mapper.get_schema(table_definition)
         if columns_schema is None or len(columns_schema) == 0:
@@ -160,126 +314,754 @@ class Writer(object):
             csv_schema
         )
 
-        dataset = self.obtain_dataset(dataset_name)
-        table_reference = self.prepare_table(
-            dataset,
-            table_definition,
-            columns_schema,
-            incremental
-        )
+        if table_definition.get('validateTypes'):
+            with self.metrics.timer('validation_seconds', table=table_name):
+                self._validate_types(csv_file_path, table_definition)
 
-        size_mb = int(os.path.getsize(csv_file_path) / (1024 * 1024))
+        if mode == self.MODE_STREAM:
+            self._stream_table(csv_file_path, dataset_name, table_definition, columns_schema)
+            return LoadJobs()
+
+        # progress of CSV loads is persisted in the state, so an interrupted load can be resumed
+        progress = None
+        resumed_jobs = {}
+        if self._is_resumable(table_definition):
+            progress = LoadProgress(self.state, self._get_table_key(dataset_name, table_definition))
+            resumed_jobs = self._get_resumed_jobs(progress, csv_file_path)
+
+        tail_start = 0
+        if table_definition.get('appendOnly') and self.state is not None and load_format == self.LOAD_FORMAT_CSV:
+            tail_start = self._find_appended_tail(csv_file_path, dataset_name, table_definition, incremental)
+
+        with self.metrics.timer('obtain_dataset_seconds', table=table_name):
+            dataset = self.obtain_dataset(dataset_name)
+        if resumed_jobs:
+            print(f"[{table_definition['dbName']}] Resuming interrupted load, {len(resumed_jobs)} chunks "
+                  f"are already loaded")
+        truncate_job_options = None
+        if (
+                full_load_mode == self.FULL_LOAD_MODE_TRUNCATE and
+                not incremental and
+                not resumed_jobs and
+                not table_definition.get('require_partition_filter')  # not available in load job configuration
+        ):
+            # the table is created and truncated by the first load job, unless its layout changed
+            table = self.get_table_object(dataset, table_definition, columns_schema)
+            if self._has_table_layout(table):
+                table_reference = table.reference
+                truncate_job_options = self._get_truncate_job_options(table)
+        if truncate_job_options is None:
+            with self.metrics.timer('prepare_table_seconds', table=table_name):
+                table_reference = self.prepare_table(
+                    dataset,
+                    table_definition,
+                    columns_schema,
+                    incremental or bool(resumed_jobs)  # resumed load keeps the already loaded chunks
+                )
 
-        jobs = []
         try:
-            if size_mb > chunk_size:
-                nr_of_slices = self._calculate_slices(size_mb, chunk_size)
-                print(f"File will be split into {nr_of_slices} chunks because it exceeds the {chunk_size}"
-                      f"MB file limit - file size: {size_mb}MB")
-                os.makedirs(self.TEMP_PATH, exist_ok=True)
-                self._split_csv(csv_file_path, table_definition['dbName'], nr_of_slices=nr_of_slices)
-                os.remove(csv_file_path)
-
-                all_files = os.listdir(self.TEMP_PATH)
-
-                futures = set()
-                with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
-                    for file in all_files:
-                        file_path = os.path.join(self.TEMP_PATH, file)
-                        futures.add(executor.submit(self._write_table, file_path, table_reference, 0))
-
-                    for future in as_completed(futures):
-                        jobs.append(future.result())
-            else:
-                jobs.append(self._write_table(csv_file_path, table_reference, 1))
+            with self.spill.directory(table_name) as spill_path:
+                if load_format == self.LOAD_FORMAT_PARQUET:
+                    chunks = self._iter_parquet_chunks(csv_file_path, table_definition, chunk_size, compression_type,
+                                                       spill_path)
+                elif resumed_jobs or tail_start:
+                    chunks = self._iter_resumed_chunks(csv_file_path, resumed_jobs.keys(), chunk_size,
+                                                       table_definition, tail_start)
+                else:
+                    chunks = self._iter_chunks(csv_file_path, table_definition, chunk_mode, chunk_size, spill_path)
+                chunks = self._iter_timed_chunks(chunks, table_name)
+
+                if self.staging is not None:
+                    if load_format == self.LOAD_FORMAT_CSV:
+                        chunks = self._iter_headless_chunks(csv_file_path, chunks)
+                    jobs = self._write_staged_chunks(chunks, table_reference, table_definition['dbName'],
+                                                     truncate_job_options)
+                elif compression_type and load_format == self.LOAD_FORMAT_CSV:
+                    jobs = LoadJobs(self._write_compressed_chunks(chunks, table_reference, table_definition['dbName'],
+                                                                  spill_path, progress, truncate_job_options,
+                                                                  polling_max_retries, polling_delay))
+                else:
+                    jobs = LoadJobs(self._write_chunks(chunks, table_reference, progress, truncate_job_options,
+                                                       polling_max_retries, polling_delay))
+            jobs.extend(resumed_jobs.values())
         except (ConnectionError, req_exceptions.RequestException, bq_exceptions.ClientError,
                 bq_exceptions.ServerError, TooManyRequests) as e:
             raise UserException(f"Loading data into table {dataset_name}.{table_definition['dbName']} failed: {e}")
 
         return jobs
 
+    def _validate_types(self, csv_file_path: str, table_definition: dict) -> None:
+        from google_bigquery_writer.type_validator import CsvTypeValidator
+
+        nr_of_rows = CsvTypeValidator(csv_file_path, table_definition['items'], os.cpu_count() or 1).validate()
+        print(f"[{table_definition['dbName']}] Types of {nr_of_rows} rows validated")
+
+    def _stream_table(self, csv_file_path: str, dataset_name: str, table_definition: dict,
+                      columns_schema: list) -> None:
+        if self.stream_writer is None:
+            raise UserException("Stream mode is not available")
+        table_name = table_definition['dbName']
+        with self.metrics.timer('obtain_dataset_seconds', table=table_name):
+            dataset = self.obtain_dataset(dataset_name)
+        with self.metrics.timer('prepare_table_seconds', table=table_name):
+            table_reference = self.prepare_table(dataset, table_definition, columns_schema, True)
+        try:
+            with self.metrics.timer('stream_seconds', table=table_name):
+                nr_of_rows = self.stream_writer.write(csv_file_path, table_reference, table_definition['items'])
+        except GoogleAPICallError as e:
+            raise UserException(f"Streaming data into table {dataset_name}.{table_definition['dbName']} failed: {e}")
+        self.metrics.increment('streamed_rows_total', nr_of_rows, table=table_name)
+        self.metrics.increment('uploaded_bytes_total', os.path.getsize(csv_file_path), table=table_name)
+        print(f"[{table_definition['dbName']}] {nr_of_rows} rows streamed")
+
+    def _plan_chunks(self, data_size: int, chunk_size: float, table_definition: dict) -> chunk_planner.ChunkPlan:
+        min_chunk_size = table_definition.get('minChunkSize') or self.DEFAULT_MIN_CHUNK_SIZE_MB
+        plan = chunk_planner.plan_chunks(data_size, int(chunk_size * MB), self.MAX_WORKERS, int(min_chunk_size * MB))
+        print(f"[{table_definition['dbName']}] Upload plan: "
+              f"{plan.describe(data_size, int(chunk_size * MB), self.MAX_WORKERS)}")
+        return plan
+
+    def _iter_chunks(self, csv_file_path: str, table_definition: dict, chunk_mode: str,
+                     chunk_size: float, spill_path: str) -> Iterator[Chunk]:
+        file_size = os.path.getsize(csv_file_path)
+        plan = self._plan_chunks(file_size, chunk_size, table_definition)
+        if plan.nr_of_chunks == 1:
+            yield Chunk(csv_file_path, 1, source_range=(0, file_size))
+            return
+
+        if chunk_mode == self.CHUNK_MODE_RANGES:
+            byte_ranges = csv_splitter.find_record_ranges(csv_file_path, plan.nr_of_chunks)
+            print(f"[{table_definition['dbName']}] File will be uploaded in {len(byte_ranges)} byte ranges")
+            for index, byte_range in enumerate(byte_ranges):
+                # only the first range starts with the header
+                yield Chunk(csv_file_path, 1 if index == 0 else 0, byte_range, source_range=byte_range)
+            return
+
+        print(f"[{table_definition['dbName']}] File will be split into {plan.nr_of_chunks} slices")
+        # the splitter waits for uploaded slices to be removed whenever the next one would exceed the disk budget
+        slices = self.spill.iter_files(
+            csv_splitter.split_csv(csv_file_path, spill_path, plan.nr_of_chunks),
+            plan.chunk_size,
+            lambda slice_item: slice_item[0]
+        )
+        for slice_path, source_range in slices:
+            yield Chunk(slice_path, 0, temporary=True, source_range=source_range)
+        os.remove(csv_file_path)
+
+    def _get_resumed_jobs(self, progress: LoadProgress, csv_file_path: str) -> Dict[Tuple[int, int], bigquery.LoadJob]:
+        """
+        Chunks of an interrupted load of the same input, with jobs that are loaded or still running.
+
+        Chunks of failed jobs are loaded again. When a chunk whose job may have loaded data can't be resumed (its
+        content changed or the job is gone), the load starts over, so the table is recreated without its rows.
+        """
+        input_size = os.path.getsize(csv_file_path)
+        recorded = progress.get()
+        if not recorded or recorded['inputSize'] != input_size:
+            progress.start(input_size)
+            return {}
+
+        jobs = list(map(lambda chunk: self._get_recorded_job(chunk['jobId']), recorded['chunks']))
+        resumed_jobs = {}
+        resumed_chunks = []
+        for chunk, job in zip(recorded['chunks'], jobs):
+            if job is not None and job.state == 'DONE' and (job.errors or job.error_result):
+                continue
+            byte_range = (chunk['start'], chunk['end'])
+            if job is None or load_progress.get_content_hash(csv_file_path, byte_range) != chunk['hash']:
+                self._cancel_running_jobs(list(filter(lambda job: job is not None, jobs)))
+                progress.start(input_size)
+                return {}
+            resumed_jobs[byte_range] = job
+            resumed_chunks.append(chunk)
+
+        progress.start(input_size, resumed_chunks)
+        return resumed_jobs
+
+    def _get_recorded_job(self, job_id: str) -> Optional[bigquery.LoadJob]:
+        try:
+            return self.bigquery_client.get_job(job_id, timeout=self.REQUEST_TIMEOUT)
+        except bq_exceptions.NotFound:
+            return None
+
+    def _iter_resumed_chunks(self, csv_file_path: str, loaded_ranges, chunk_size: float,
+                             table_definition: dict, start: int = 0) -> Iterator[Chunk]:
+        """
+        Uploads the parts of the input from `start` not covered by already loaded chunks as byte ranges.
+        """
+        gap_start = start
+        gaps = []
+        for range_start, range_end in sorted(loaded_ranges):
+            if range_end <= start:
+                continue  # loaded before the part to upload
+            if range_start > gap_start:
+                gaps.append((gap_start, range_start))
+            gap_start = max(gap_start, range_end)
+        input_size = os.path.getsize(csv_file_path)
+        if input_size > gap_start:
+            gaps.append((gap_start, input_size))
+
+        for gap_start, gap_end in gaps:
+            if gap_start == 0 and gap_end <= csv_splitter.find_header_end(csv_file_path):
+                continue  # nothing but the header
+            nr_of_ranges = self._plan_chunks(gap_end - gap_start, chunk_size, table_definition).nr_of_chunks
+            for byte_range in csv_splitter.find_record_ranges(csv_file_path, nr_of_ranges, start=gap_start,
+                                                              end=gap_end):
+                yield Chunk(csv_file_path, 1 if byte_range[0] == 0 else 0, byte_range, source_range=byte_range)
+
+    def _find_appended_tail(self, csv_file_path: str, dataset_name: str, table_definition: dict,
+                            incremental: bool) -> int:
+        """
+        Start of the rows appended to the input since the last load, 0 when the whole input is to be loaded.
+        """
+        table_name = table_definition['dbName']
+        table_key = self._get_table_key(dataset_name, table_definition)
+        loaded_prefix = LoadedPrefix(self.state, table_key)
+        with self.metrics.timer('tail_detection_seconds', table=table_name):
+            tail_start, content_hash = loaded_prefix.find_tail(csv_file_path)
+        input_size = os.path.getsize(csv_file_path)
+        with self._loaded_inputs_lock:
+            self._loaded_inputs[table_key] = (input_size, content_hash)
+
+        if not incremental:
+            return 0
+        if tail_start is None:
+            if loaded_prefix.get() is not None:
+                print(f"[{table_name}] Input doesn't start with the previously loaded data, loading all of it")
+            return 0
+        self.metrics.increment('skipped_bytes_total', tail_start, table=table_name)
+        print(f"[{table_name}] Input starts with the previously loaded {tail_start / MB:.1f}MB, "
+              f"loading the appended {(input_size - tail_start) / MB:.1f}MB only")
+        return tail_start
+
+    def _save_loaded_input(self, table_key: str) -> None:
+        with self._loaded_inputs_lock:
+            loaded_input = self._loaded_inputs.pop(table_key, None)
+        if loaded_input is not None:
+            LoadedPrefix(self.state, table_key).save(*loaded_input)
+
+    @staticmethod
+    def _get_table_key(dataset_name: str, table_definition: dict) -> str:
+        return '%s.%s' % (dataset_name, table_definition['dbName'])
+
+    def _iter_parquet_chunks(self, csv_file_path: str, table_definition: dict, chunk_size: int,
+                             compression_type: Optional[str], spill_path: str) -> Iterator[Chunk]:
+        from google_bigquery_writer import parquet_converter
+
+        print(f"[{table_definition['dbName']}] File will be converted to parquet files of up to {chunk_size}MB")
+        parquet_files = self.spill.iter_files(
+            parquet_converter.convert_csv(
+                csv_file_path,
+                spill_path,
+                table_definition['items'],
+                chunk_size * MB,
+                compression=compression_type or 'snappy'
+            ),
+            int(chunk_size * MB)
+        )
+        for parquet_path in parquet_files:
+            yield Chunk(parquet_path, 0, source_format='PARQUET', temporary=True)
+
+    def _iter_timed_chunks(self, chunks: Iterator[Chunk], table_name: str) -> Iterator[Chunk]:
+        """
+        Time spent producing the chunks (splitting, finding ranges or converting the file).
+        """
+        chunks = iter(chunks)
+        while True:
+            with self.metrics.timer('chunk_planning_seconds', table=table_name):
+                chunk = next(chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+
+    @staticmethod
+    def _iter_headless_chunks(csv_file_path: str, chunks: Iterator[Chunk]) -> Iterator[Chunk]:
+        """
+        One load job applies the same number of skipped rows to all its files, the header is left out instead.
+        """
+        header_end = None
+        for chunk in chunks:
+            if chunk.skip:
+                if header_end is None:
+                    header_end = csv_splitter.find_header_end(csv_file_path)
+                end = chunk.byte_range[1] if chunk.byte_range else os.path.getsize(csv_file_path)
+                chunk = chunk._replace(skip=0, byte_range=(header_end, end))
+            yield chunk
+
+    def _write_chunks(self, chunks: Iterator[Chunk], table_reference, progress: LoadProgress = None,
+                      truncate_job_options: dict = None, polling_max_retries: int = 360,
+                      polling_delay: int = 5) -> List[bigquery.LoadJob]:
+        jobs = []
+        futures = set()
+        chunks = iter(chunks)
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+            try:
+                if truncate_job_options is not None:
+                    first_chunk = next(chunks, None)
+                    if first_chunk is None:
+                        return jobs
+                    jobs.append(self._write_chunk(first_chunk, table_reference, progress, truncate_job_options))
+                    next_chunk = next(chunks, None)
+                    if next_chunk is None:
+                        return jobs
+                    self._wait_for_truncate_job(jobs[0], polling_max_retries, polling_delay)
+                    chunks = itertools.chain([next_chunk], chunks)
+
+                for chunk in chunks:
+                    futures.add(executor.submit(self._write_chunk, chunk, table_reference, progress))
+            except UserException:
+                self._cancel_jobs(futures)
+                raise
+
+            for future in as_completed(futures):
+                jobs.append(future.result())
+        return jobs
+
+    def _write_compressed_chunks(self, chunks: Iterator[Chunk], table_reference, table_name: str, spill_path: str,
+                                 progress: LoadProgress = None, truncate_job_options: dict = None,
+                                 polling_max_retries: int = 360, polling_delay: int = 5) -> List[bigquery.LoadJob]:
+        """
+        Chunks are gzipped in worker processes, every compressed chunk is uploaded
+        as soon as it is ready while the following chunks are still being compressed.
+
+        Compressed chunks go through spill files rather than a pipe from the worker into the upload:
+        the upload of a file is retried by _write_table, and its compressed size is known when it starts.
+        """
+        jobs = []
+        compress_futures = {}
+        upload_futures = set()
+
+        def upload_compressed(done_futures):
+            nonlocal truncate_job_options
+            for compress_future in done_futures:
+                chunk_index, chunk = compress_futures.pop(compress_future)
+                result = compress_future.result()
+                self.metrics.observe('compression_cpu_seconds', result['cpu_time'], DURATION_BUCKETS,
+                                     table=table_name)
+                self.metrics.increment('compressed_bytes_total', result['compressed_bytes'], table=table_name)
+                print(f"[{table_name}] Chunk {chunk_index} compressed from {result['raw_bytes'] / MB:.1f}MB to "
+                      f"{result['compressed_bytes'] / MB:.1f}MB (ratio "
+                      f"{result['raw_bytes'] / max(1, result['compressed_bytes']):.1f}x) "
+                      f"in {result['cpu_time']:.2f}s of CPU time")
+                self.spill.track(result['path'])
+                compressed_chunk = Chunk(result['path'], chunk.skip, temporary=True, source_range=chunk.source_range,
+                                         content_hash=result['hash'])
+                if truncate_job_options is not None:
+                    jobs.append(self._write_chunk(compressed_chunk, table_reference, progress, truncate_job_options))
+                    self._wait_for_truncate_job(jobs[0], polling_max_retries, polling_delay)
+                    truncate_job_options = None
+                    continue
+                upload_futures.add(executor.submit(self._write_chunk, compressed_chunk, table_reference, progress))
+
+        # worker processes are spawned, forking a process running other threads is not safe
+        with ProcessPoolExecutor(max_workers=self.MAX_WORKERS, mp_context=multiprocessing.get_context('spawn')) \
+                as compressor, ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+            try:
+                for chunk_index, chunk in enumerate(chunks):
+                    compressed_file_path = os.path.join(spill_path, '%s.%04d.csv.gz' % (table_name, chunk_index))
+                    compress_future = compressor.submit(
+                        compression.compress_chunk,
+                        chunk.file_path,
+                        compressed_file_path,
+                        chunk.byte_range
+                    )
+                    if chunk.temporary:
+                        # the slice is not needed once compressed, its space goes back to the splitter right away
+                        compress_future.add_done_callback(lambda future, path=chunk.file_path: self.spill.remove(path))
+                    compress_futures[compress_future] = (chunk_index, chunk)
+                    upload_compressed(list(filter(lambda future: future.done(), compress_futures)))
+                upload_compressed(as_completed(list(compress_futures)))
+                uploaded_jobs = list(map(lambda future: future.result(), as_completed(upload_futures)))
+            except BaseException:
+                # on any failure of a compression or an upload the table must not get the other chunks
+                for compress_future in compress_futures:
+                    compress_future.cancel()
+                self._cancel_jobs(upload_futures)
+                for job in jobs:
+                    job.cancel()  # the truncating job
+                raise
+        return jobs + uploaded_jobs
+
+    def _write_staged_chunks(self, chunks: Iterator[Chunk], table_reference, table_name: str,
+                             job_options: dict = None) -> LoadJobs:
+        """
+        Chunks are uploaded into the staging bucket in parallel and loaded by a single load job,
+        the table gets either all of them or none.
+        """
+        staging_path = self.staging.get_staging_path(table_name)
+        object_names = []
+        source_format = 'CSV'
+        try:
+            futures = []
+            with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+                for chunk_index, chunk in enumerate(chunks):
+                    object_name = '%s/%s.%04d' % (staging_path, table_name, chunk_index)
+                    object_names.append(object_name)
+                    source_format = chunk.source_format
+                    futures.append(executor.submit(self._stage_chunk, chunk, object_name, table_name))
+            uris = list(map(lambda future: future.result(), futures))
+            if not uris:
+                return LoadJobs()
+            print(f"[{table_name}] {len(uris)} chunks uploaded to {self.staging.get_uri(staging_path)}")
+            job = self._write_uris(uris, table_reference, source_format, job_options)
+        except BaseException:
+            self.staging.delete(object_names)
+            raise
+        return LoadJobs([job], self.staging, object_names)
+
+    def _stage_chunk(self, chunk: Chunk, object_name: str, table_name: str) -> str:
+        chunk_size = self._get_chunk_size(chunk)
+        try:
+            started = time.monotonic()
+            with self.metrics.timer('chunk_upload_seconds', table=table_name):
+                uri = self._upload_chunk(chunk, object_name, table_name=table_name)
+            self._record_chunk(table_name, chunk, chunk_size, time.monotonic() - started, uri=uri)
+            return uri
+        finally:
+            if chunk.temporary:
+                self.spill.remove(chunk.file_path)
+
+    @backoff.on_exception(backoff.expo,
+                          (ConnectionError, req_exceptions.RequestException, bq_exceptions.ServerError,
+                           TooManyRequests),
+                          max_tries=5,
+                          on_backoff=count_retry)
+    def _upload_chunk(self, chunk: Chunk, object_name: str, table_name: str) -> str:
+        try:
+            return self.staging.upload(chunk.file_path, object_name, chunk.byte_range)
+        except PreconditionFailed:
+            # object names are unique to the load, the object exists when a failed attempt was in fact uploaded
+            return self.staging.get_uri(object_name)
+
+    @staticmethod
+    def _get_chunk_size(chunk: Chunk) -> int:
+        if chunk.byte_range:
+            return chunk.byte_range[1] - chunk.byte_range[0]
+        return os.path.getsize(chunk.file_path)
+
+    def _record_chunk(self, table_name: str, chunk: Chunk, chunk_size: int, seconds: float, **values) -> None:
+        self.metrics.increment('uploaded_bytes_total', chunk_size, table=table_name)
+        self.metrics.increment('chunks_total', table=table_name)
+        self.metrics.observe('chunk_bytes', chunk_size, table=table_name)
+        self.metrics.add_event(
+            'chunk',
+            table=table_name,
+            bytes=chunk_size,
+            seconds=round(seconds, 3),
+            source_range=chunk.source_range,
+            **values
+        )
+
+    def _write_chunk(self, chunk: Chunk, table_reference, progress: LoadProgress = None,
+                     job_options: dict = None) -> bigquery.LoadJob:
+        try:
+            track_progress = progress is not None and chunk.source_range is not None
+            if track_progress and chunk.content_hash is None:
+                chunk = chunk._replace(content_hash=load_progress.get_content_hash(chunk.file_path, chunk.byte_range))
+            chunk_size = self._get_chunk_size(chunk)
+            started = time.monotonic()
+            with self.metrics.timer('chunk_upload_seconds', table=table_reference.table_id):
+                job = self._write_table(chunk.file_path, table_reference, chunk.skip, chunk.byte_range,
+                                        chunk.source_format, job_options)
+            self._record_chunk(table_reference.table_id, chunk, chunk_size, time.monotonic() - started,
+                               job_id=job.job_id)
+            if track_progress:
+                progress.add_chunk(chunk.source_range, chunk.content_hash, job.job_id)
+            return job
+        finally:
+            if chunk.temporary:
+                self.spill.remove(chunk.file_path)
+
     @backoff.on_exception(backoff.expo,
                           (ConnectionError, req_exceptions.RequestException,
                            bq_exceptions.ClientError, bq_exceptions.ServerError,
                            TooManyRequests),
-                          max_tries=5)
-    def _write_table(self, csv_file_path: str, table_reference, skip: int):
-        with open(csv_file_path, 'rb') as readable:
-            job_config = bigquery.LoadJobConfig()
-            job_config.source_format = 'CSV'
-            job_config.skip_leading_rows = skip
-            job_config.allow_quoted_newlines = True
-            job_config.preserve_ascii_control_characters = True
-
+                          max_tries=5,
+                          on_backoff=count_retry)
+    def _write_table(self, csv_file_path: str, table_reference, skip: int, byte_range: Tuple[int, int] = None,
+                     source_format: str = 'CSV', job_options: dict = None):
+        if byte_range:
+            readable = FileWindow(csv_file_path, *byte_range)
+        else:
+            readable = open(csv_file_path, 'rb')
+        with readable:
             job = self.bigquery_client.load_table_from_file(
                 readable,
                 table_reference,
-                job_config=job_config
+                job_config=self._get_job_config(skip, source_format, job_options)
             )
             return job
 
-    @backoff.on_exception(backoff.expo, TooManyRequests, max_tries=5)
+    @backoff.on_exception(backoff.expo,
+                          (ConnectionError, req_exceptions.RequestException,
+                           bq_exceptions.ClientError, bq_exceptions.ServerError,
+                           TooManyRequests),
+                          max_tries=5,
+                          on_backoff=count_retry)
+    def _write_uris(self, uris: List[str], table_reference, source_format: str = 'CSV', job_options: dict = None):
+        return self.bigquery_client.load_table_from_uri(
+            uris,
+            table_reference,
+            job_config=self._get_job_config(0, source_format, job_options),
+            timeout=self.REQUEST_TIMEOUT
+        )
+
+    @staticmethod
+    def _get_job_config(skip: int, source_format: str = 'CSV', job_options: dict = None) -> bigquery.LoadJobConfig:
+        job_config = bigquery.LoadJobConfig()
+        job_config.source_format = source_format
+        if source_format == 'CSV':
+            job_config.skip_leading_rows = skip
+            job_config.allow_quoted_newlines = True
+            job_config.preserve_ascii_control_characters = True
+        for option, value in (job_options or {}).items():
+            setattr(job_config, option, value)
+        return job_config
+
+    @backoff.on_exception(backoff.expo, TooManyRequests, max_tries=5, on_backoff=count_retry)
     def write_table_sync(self, csv_file_path: str, dataset_name: str, table_definition: dict, incremental: bool = False,
-                         polling_max_retries: int = 360, polling_delay: int = 5) -> None:
+                         polling_max_retries: int = 360, polling_delay: int = 5, skip_unchanged: bool = False) -> None:
+        table_name = table_definition['dbName']
+        table_fingerprint = None
+        fingerprint = None
+        if self.state is not None:
+            table_fingerprint = TableFingerprint(self.state, self._get_table_key(dataset_name, table_definition))
+            if skip_unchanged and not incremental:
+                with self.metrics.timer('fingerprint_seconds', table=table_name):
+                    fingerprint = get_fingerprint(csv_file_path, table_definition)
+                if fingerprint == table_fingerprint.get() and self._table_exists(dataset_name, table_name):
+                    print(f"[{table_name}] Input and table definition didn't change since the last load, skipping")
+                    self.metrics.increment('tables_skipped_total', table=table_name)
+                    return
+            # every load changes the table, only a successful full load with a fingerprint records a new one
+            table_fingerprint.delete()
+
+        if incremental and table_definition.get('primaryKey'):
+            self._merge_table_sync(csv_file_path, dataset_name, table_definition, polling_max_retries, polling_delay)
+            return
+
         jobs = self.write_table(
             csv_file_path,
             dataset_name,
             table_definition,
-            incremental=incremental)
+            incremental=incremental,
+            polling_max_retries=polling_max_retries,
+            polling_delay=polling_delay)
 
-        for job in jobs:
+        self.metrics.increment('load_jobs_total', len(jobs), table=table_name)
+        tracker = JobTracker(polling_delay * polling_max_retries, polling_delay, max_workers=self.MAX_WORKERS)
+        try:
+            with self.metrics.timer('wait_seconds', table=table_name):
+                failed_job = tracker.wait(jobs)
+        except TimeoutError:
+            self._cancel_running_jobs(jobs)
+            message = 'Loading data into table %s.%s didn\'t finish in %s ' \
+                      'seconds' % (
+                          dataset_name,
+                          table_definition['dbName'],
+                          polling_delay * polling_max_retries
+                      )
+            raise UserException(message)
+        finally:
+            self.metrics.increment('job_reloads_total', tracker.reloads, table=table_name)
+            jobs.close()
 
-            polling_retries = 0
-            while polling_retries < polling_max_retries and job.state != u'DONE':
-                time.sleep(polling_delay)
-                polling_retries += 1
-                job.reload()
-
-            if job.state != u'DONE':
-                message = 'Loading data into table %s.%s didn\'t finish in %s ' \
-                          'seconds' % (
-                              dataset_name,
-                              table_definition['dbName'],
-                              polling_delay * polling_max_retries
-                          )
-                raise UserException(message)
+        if failed_job is None:
+            if self.state is not None:
+                table_key = self._get_table_key(dataset_name, table_definition)
+                LoadProgress(self.state, table_key).complete()
+                self._save_loaded_input(table_key)
+                if fingerprint is not None:
+                    table_fingerprint.save(fingerprint)
+            return
+        self._cancel_running_jobs(jobs)
 
-            if job.errors:
-                message = 'Loading data into table %s.%s failed: %s' % (
-                    dataset_name,
-                    table_definition['dbName'],
-                    job.errors
-                )
-                raise UserException(message)
+        if failed_job.errors:
+            message = 'Loading data into table %s.%s failed: %s' % (
+                dataset_name,
+                table_definition['dbName'],
+                failed_job.errors
+            )
+            raise UserException(message)
 
-            if job.error_result:
-                message = 'Loading data into table %s.%s failed: %s' % (
-                    dataset_name,
-                    table_definition['dbName'],
-                    job.error_result
+        message = 'Loading data into table %s.%s failed: %s' % (
+            dataset_name,
+            table_definition['dbName'],
+            failed_job.error_result
+        )
+        raise UserException(message)
+
+    def _is_resumable(self, table_definition: dict) -> bool:
+        load_format = table_definition.get('loadFormat') or self.LOAD_FORMAT_CSV
+        return self.state is not None and load_format == self.LOAD_FORMAT_CSV and self.staging is None
+
+    def _table_exists(self, dataset_name: str, table_name: str) -> bool:
+        table_reference = DatasetReference(self.bigquery_client.project, dataset_name).table(table_name)
+        try:
+            self.bigquery_client.get_table(table_reference, timeout=self.REQUEST_TIMEOUT)
+            return True
+        except bq_exceptions.NotFound:
+            return False
+
+    def _merge_table_sync(self, csv_file_path: str, dataset_name: str, table_definition: dict,
+                          polling_max_retries: int, polling_delay: int) -> None:
+        """
+        Loads the data into a staging table and merges it into the table by the primary key.
+        """
+        table_name = table_definition['dbName']
+        if (table_definition.get('mode') or self.MODE_LOAD) != self.MODE_LOAD:
+            raise UserException("Primary key is supported in load mode only")
+        primary_key = merge_query.get_primary_key(table_definition)
+        columns_schema = schema_mapper.get_schema(table_definition)
+
+        # schema of the table is checked before anything is loaded
+        with self.metrics.timer('verify_project_seconds', table=table_name):
+            self.verify_project()
+        with self.metrics.timer('obtain_dataset_seconds', table=table_name):
+            dataset = self.obtain_dataset(dataset_name)
+        with self.metrics.timer('prepare_table_seconds', table=table_name):
+            table_reference = self.prepare_table(dataset, table_definition, columns_schema, True)
+
+        staging_definition = merge_query.get_staging_definition(table_definition)
+        staging_reference = dataset.table(staging_definition['dbName'])
+        try:
+            self.write_table_sync(csv_file_path, dataset_name, staging_definition, False, polling_max_retries,
+                                  polling_delay)
+        except Exception:
+            # a partially loaded staging table is kept when the next run resumes its load
+            if self._has_load_progress(dataset_name, staging_definition):
+                self._expire_staging_table(staging_reference)
+            else:
+                self._delete_staging_table(staging_reference)
+            raise
+        try:
+            with self.metrics.timer('merge_seconds', table=table_name):
+                query_job = self._run_merge_query(
+                    merge_query.get_merge_query(staging_reference, table_reference, table_definition['items'],
+                                                primary_key),
+                    '%s.%s' % (dataset_name, table_name),
+                    polling_max_retries * polling_delay
                 )
-                raise UserException(message)
+        finally:
+            self._delete_staging_table(staging_reference)
+
+        dml_stats = query_job.dml_stats
+        inserted = dml_stats.inserted_row_count if dml_stats else 0
+        updated = dml_stats.updated_row_count if dml_stats else 0
+        self.metrics.increment('merged_rows_total', inserted, table=table_name, operation='insert')
+        self.metrics.increment('merged_rows_total', updated, table=table_name, operation='update')
+        print(f"[{table_name}] Merged by primary key {', '.join(primary_key)}: {inserted} rows inserted, "
+              f"{updated} rows updated")
+
+    def _has_load_progress(self, dataset_name: str, table_definition: dict) -> bool:
+        if not self._is_resumable(table_definition):
+            return False
+        return LoadProgress(self.state, self._get_table_key(dataset_name, table_definition)).get_chunks() != []
+
+    def _expire_staging_table(self, staging_reference: bigquery.TableReference) -> None:
+        """
+        A kept staging table is removed by BigQuery when no later run resumes its load.
+        """
+        table = bigquery.Table(staging_reference)
+        table.expires = datetime.datetime.now(datetime.timezone.utc) + self.STAGING_TABLE_EXPIRATION
+        try:
+            self.bigquery_client.update_table(table, ['expires'], timeout=self.REQUEST_TIMEOUT)
+        except (bq_exceptions.ClientError, bq_exceptions.ServerError) as err:
+            logging.warning('Cannot set expiration of staging table %s: %s' % (staging_reference.table_id, str(err)))
+
+    def _delete_staging_table(self, staging_reference: bigquery.TableReference) -> None:
+        try:
+            self.bigquery_client.delete_table(staging_reference, timeout=self.REQUEST_TIMEOUT, not_found_ok=True)
+        except (bq_exceptions.ClientError, bq_exceptions.ServerError) as err:
+            logging.warning('Cannot delete staging table %s: %s' % (staging_reference.table_id, str(err)))
+
+    def _run_merge_query(self, query: str, table_name: str, timeout: float) -> bigquery.QueryJob:
+        try:
+            query_job = self.bigquery_client.query(query, timeout=self.REQUEST_TIMEOUT)
+            try:
+                failed_job = JobTracker(timeout, self.POLLING_DELAY).wait([query_job])
+            except TimeoutError:
+                self._cancel_running_jobs([query_job])
+                raise UserException('Merging data into table %s didn\'t finish in %s seconds' % (table_name, timeout))
+        except GoogleAPICallError as err:
+            raise UserException('Merging data into table %s failed: %s' % (table_name, str(err)))
+        if failed_job is not None:
+            raise UserException('Merging data into table %s failed: %s' % (
+                table_name,
+                failed_job.errors or failed_job.error_result
+            ))
+        return query_job
 
-    def _split_csv(self, csv_file, table_name, nr_of_slices):
-        result = subprocess.run(
-            [
-                '/home/cli_linux_amd64',
-                '--table-name=' + str(table_name),
-                '--table-input-path=' + csv_file,
-                '--mode=slices',
-                '--number-of-slices=' + str(nr_of_slices),
-                '--table-output-path=' + self.TEMP_PATH,
-                '--table-output-manifest-path=/home/data/dump.manifest',
-                '--gzip=false',
-                '--data-type-mode=columns'
-            ],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
+    @staticmethod
+    def _cancel_running_jobs(jobs: List[bigquery.LoadJob]) -> None:
+        for job in jobs:
+            if job.state != 'DONE':
+                try:
+                    job.cancel()
+                except (bq_exceptions.ClientError, bq_exceptions.ServerError) as err:
+                    logging.warning('Cannot cancel job %s: %s' % (job.job_id, str(err)))
+
+    def _has_table_layout(self, table: bigquery.Table) -> bool:
+        """
+        Load jobs can't change partitioning and clustering of an existing table, only one missing or matching
+        the definition can be truncated by a load job.
+        """
+        try:
+            bq_table = self.bigquery_client.get_table(table.reference, timeout=self.REQUEST_TIMEOUT)
+        except bq_exceptions.NotFound:
+            return True
+        if self._get_table_layout(bq_table) == self._get_table_layout(table):
+            return True
+        print(f"[{table.table_id}] Partitioning or clustering of the table changed, the table is recreated")
+        return False
+
+    @staticmethod
+    def _get_table_layout(table: bigquery.Table) -> tuple:
+        time_partitioning = table.time_partitioning
+        range_partitioning = table.range_partitioning
+        return (
+            time_partitioning and (time_partitioning.type_, time_partitioning.field, time_partitioning.expiration_ms),
+            range_partitioning and (range_partitioning.field, range_partitioning.range_.start,
+                                    range_partitioning.range_.end, range_partitioning.range_.interval),
+            table.clustering_fields or None
         )
 
-        if result.returncode != 0:
-            print(f"Error running cli_linux_amd64: {result.stderr.strip()}")
+    @staticmethod
+    def _get_truncate_job_options(table: bigquery.Table) -> dict:
+        job_options = {
+            'create_disposition': bigquery.CreateDisposition.CREATE_IF_NEEDED,
+            'write_disposition': bigquery.WriteDisposition.WRITE_TRUNCATE,
+            'schema': table.schema,
+            'time_partitioning': table.time_partitioning,
+            'range_partitioning': table.range_partitioning,
+            'clustering_fields': table.clustering_fields,
+        }
+        return dict(filter(lambda option: option[1] is not None, job_options.items()))
+
+    def _wait_for_truncate_job(self, job: bigquery.LoadJob, polling_max_retries: int, polling_delay: int) -> None:
+        """
+        Chunks appended before the truncating job is done would be removed by it.
+        """
+        table_name = '%s.%s' % (job.destination.dataset_id, job.destination.table_id)
+        try:
+            failed_job = JobTracker(polling_max_retries * polling_delay, polling_delay).wait([job])
+        except TimeoutError:
+            job.cancel()
+            raise UserException('Loading data into table %s didn\'t finish in %s seconds' % (
+                table_name,
+                polling_max_retries * polling_delay
+            ))
+        if failed_job is not None:
+            raise UserException('Loading data into table %s failed: %s' % (
+                table_name,
+                failed_job.errors or failed_job.error_result
+            ))
 
     @staticmethod
-    def _calculate_slices(size_mb, max_chunk_size_mb):
-        return math.ceil(size_mb / max_chunk_size_mb)
+    def _cancel_jobs(futures) -> None:
+        """
+        Cancels load jobs of slices that were already submitted, the table must not end up with partial data.
+        """
+        for future in as_completed(futures):
+            if future.exception() is None:
+                future.result().cancel()
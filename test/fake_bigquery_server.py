@@ -0,0 +1,343 @@
+import collections
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import bigquery
+
+API_PREFIX = '/bigquery/v2'
+READ_SIZE = 1024 * 1024
+
+
+class FakeBigqueryServer(object):
+    """
+    In-process stand-in for the BigQuery REST endpoints used by the writer: projects, datasets, tables,
+    resumable uploads and jobs, plus an OAuth token endpoint for service account credentials.
+
+    Uploaded data is counted, not stored, so loads of any size can be simulated. `latency` (seconds) is added
+    to every request, `bandwidth` (bytes per second) limits the request bodies and load jobs finish
+    `job_duration` seconds after they are created. Datasets of `forbidden_projects` can't be listed. Requests are
+    counted in `rpc_counts` by route.
+
+    Usage: bigquery.Client(client_options={'api_endpoint': server.url}) or the BIGQUERY_EMULATOR_HOST variable.
+    """
+
+    def __init__(self, projects=('project',), latency: float = 0.0, bandwidth: float = None,
+                 job_duration: float = 0.0, forbidden_projects=()):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.job_duration = job_duration
+        self.projects = dict(map(lambda project: (project, {}), projects))
+        self.forbidden_projects = set(forbidden_projects)
+        self.jobs = {}
+        self.sessions = {}
+        self.rpc_counts = collections.Counter()
+        self.uploaded_bytes = 0
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._get_handler())
+        self.httpd.daemon_threads = True
+        self.url = 'http://127.0.0.1:%s' % self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    @property
+    def rpc_count(self) -> int:
+        with self.lock:
+            return sum(self.rpc_counts.values())
+
+    def create_client(self, project: str = 'project') -> bigquery.Client:
+        return bigquery.Client(
+            project,
+            credentials=AnonymousCredentials(),
+            client_options={'api_endpoint': self.url}
+        )
+
+    def get_tables(self, project: str, dataset: str) -> dict:
+        with self.lock:
+            return dict(self.projects[project][dataset]['tables'])
+
+    def _create_job(self, project: str, resource: dict, input_bytes: int = 0) -> dict:
+        job_reference = resource.setdefault('jobReference', {})
+        job_reference['projectId'] = project
+        job_reference.setdefault('jobId', uuid.uuid4().hex)
+        job_reference.setdefault('location', 'US')
+        resource['id'] = '%s:%s.%s' % (project, job_reference['location'], job_reference['jobId'])
+        resource['status'] = {'state': 'RUNNING'}
+        resource['statistics'] = {
+            'creationTime': str(int(time.time() * 1000)),
+            'load': {'inputFileBytes': str(input_bytes)}
+        }
+        with self.lock:
+            self.jobs[job_reference['jobId']] = {'resource': resource, 'done_at': time.monotonic() + self.job_duration}
+            destination = resource.get('configuration', {}).get('load', {}).get('destinationTable')
+            if destination:
+                dataset = self.projects.get(destination['projectId'], {}).get(destination['datasetId'])
+                if dataset is not None:
+                    dataset['tables'].setdefault(destination['tableId'], self._get_table_resource(
+                        destination,
+                        resource['configuration']['load'].get('schema', {})
+                    ))
+        return self._get_job(job_reference['jobId'])
+
+    def _get_job(self, job_id: str) -> dict:
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            if job['resource']['status']['state'] != 'DONE' and time.monotonic() >= job['done_at']:
+                job['resource']['status'] = {'state': 'DONE'}
+            return json.loads(json.dumps(job['resource']))
+
+    @staticmethod
+    def _get_table_resource(table_reference: dict, schema: dict) -> dict:
+        return {
+            'kind': 'bigquery#table',
+            'id': '%s:%s.%s' % (table_reference['projectId'], table_reference['datasetId'],
+                                table_reference['tableId']),
+            'tableReference': table_reference,
+            'schema': schema,
+            'type': 'TABLE',
+            'creationTime': str(int(time.time() * 1000)),
+        }
+
+    def _get_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                self._handle('GET')
+
+            def do_POST(self):
+                self._handle('POST')
+
+            def do_PUT(self):
+                self._handle('PUT')
+
+            def do_DELETE(self):
+                self._handle('DELETE')
+
+            def _handle(self, method):
+                if server.latency:
+                    time.sleep(server.latency)
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                for pattern, route_method, handler in ROUTES:
+                    match = re.fullmatch(pattern, url.path)
+                    if match and route_method == method:
+                        with server.lock:
+                            server.rpc_counts['%s %s' % (method, handler.__name__.strip('_'))] += 1
+                        return handler(self, query, *match.groups())
+                self._read_body()
+                self._send_error(404, 'Not found: %s %s' % (method, url.path))
+
+            def _token(self, query):
+                self._read_body()
+                self._send_json(200, {'access_token': 'fake-token', 'token_type': 'Bearer', 'expires_in': 3600})
+
+            def _list_projects(self, query):
+                self._send_json(200, {
+                    'kind': 'bigquery#projectList',
+                    'projects': list(map(lambda project: {
+                        'id': project,
+                        'numericId': '1',
+                        'projectReference': {'projectId': project},
+                        'friendlyName': project
+                    }, sorted(server.projects))),
+                    'totalItems': len(server.projects)
+                })
+
+            def _get_service_account(self, query, project):
+                if project not in server.projects:
+                    return self._send_error(404, 'Not found: Project %s' % project)
+                self._send_json(200, {'kind': 'bigquery#getServiceAccountResponse',
+                                      'email': 'bq-%s@bigquery-encryption.iam.gserviceaccount.com' % project})
+
+            def _list_datasets(self, query, project):
+                if project in server.forbidden_projects:
+                    return self._send_error(403, 'Access Denied: Project %s' % project)
+                with server.lock:
+                    datasets = sorted(server.projects.get(project, {}))
+                self._send_json(200, {'kind': 'bigquery#datasetList', 'datasets': list(map(lambda dataset: {
+                    'id': '%s:%s' % (project, dataset),
+                    'datasetReference': {'projectId': project, 'datasetId': dataset}
+                }, datasets))})
+
+            def _get_dataset(self, query, project, dataset):
+                with server.lock:
+                    found = dataset in server.projects.get(project, {})
+                if not found:
+                    return self._send_error(404, 'Not found: Dataset %s:%s' % (project, dataset))
+                self._send_json(200, self._get_dataset_resource(project, dataset))
+
+            def _create_dataset(self, query, project):
+                resource = json.loads(self._read_body())
+                dataset = resource['datasetReference']['datasetId']
+                with server.lock:
+                    if project not in server.projects:
+                        return self._send_error(404, 'Not found: Project %s' % project)
+                    if dataset in server.projects[project]:
+                        return self._send_error(409, 'Already Exists: Dataset %s:%s' % (project, dataset))
+                    server.projects[project][dataset] = {'tables': {}}
+                self._send_json(200, self._get_dataset_resource(project, dataset))
+
+            def _get_table(self, query, project, dataset, table):
+                with server.lock:
+                    resource = server.projects.get(project, {}).get(dataset, {}).get('tables', {}).get(table)
+                if resource is None:
+                    return self._send_error(404, 'Not found: Table %s:%s.%s' % (project, dataset, table))
+                self._send_json(200, resource)
+
+            def _create_table(self, query, project, dataset):
+                resource = json.loads(self._read_body())
+                table = resource['tableReference']['tableId']
+                with server.lock:
+                    tables = server.projects.get(project, {}).get(dataset, {}).get('tables')
+                    if tables is None:
+                        return self._send_error(404, 'Not found: Dataset %s:%s' % (project, dataset))
+                    if table in tables:
+                        return self._send_error(409, 'Already Exists: Table %s:%s.%s' % (project, dataset, table))
+                    resource.update(server._get_table_resource(resource['tableReference'], resource.get('schema')))
+                    tables[table] = resource
+                self._send_json(200, resource)
+
+            def _delete_table(self, query, project, dataset, table):
+                with server.lock:
+                    tables = server.projects.get(project, {}).get(dataset, {}).get('tables', {})
+                    if table not in tables:
+                        return self._send_error(404, 'Not found: Table %s:%s.%s' % (project, dataset, table))
+                    del tables[table]
+                self._send_empty(204)
+
+            def _start_upload(self, query, project):
+                resource = json.loads(self._read_body() or b'{}')
+                session_id = uuid.uuid4().hex
+                with server.lock:
+                    server.sessions[session_id] = {'project': project, 'resource': resource, 'size': 0}
+                self.send_response(200)
+                self.send_header('Location', '%s/upload/session/%s' % (server.url, session_id))
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def _upload(self, query, session_id):
+                size = self._read_body(discard=True)
+                with server.lock:
+                    session = server.sessions.get(session_id)
+                    if session is not None:
+                        session['size'] += size
+                        server.uploaded_bytes += size
+                if session is None:
+                    return self._send_error(404, 'No such upload')
+                total = self.headers.get('Content-Range', '').rsplit('/', 1)[-1]
+                if total == '*' or int(total) > session['size']:
+                    self.send_response(308)
+                    if session['size']:
+                        self.send_header('Range', 'bytes=0-%s' % (session['size'] - 1))
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                with server.lock:
+                    del server.sessions[session_id]
+                self._send_json(200, server._create_job(session['project'], session['resource'], session['size']))
+
+            def _insert_job(self, query, project):
+                resource = json.loads(self._read_body())
+                self._send_json(200, server._create_job(project, resource))
+
+            def _get_job(self, query, project, job_id):
+                resource = server._get_job(job_id)
+                if resource is None:
+                    return self._send_error(404, 'Not found: Job %s:%s' % (project, job_id))
+                self._send_json(200, resource)
+
+            def _cancel_job(self, query, project, job_id):
+                self._read_body()
+                with server.lock:
+                    job = server.jobs.get(job_id)
+                    if job is not None and job['resource']['status']['state'] != 'DONE':
+                        job['resource']['status'] = {
+                            'state': 'DONE',
+                            'errorResult': {'reason': 'stopped', 'message': 'Job execution was cancelled'}
+                        }
+                if job is None:
+                    return self._send_error(404, 'Not found: Job %s:%s' % (project, job_id))
+                self._send_json(200, {'kind': 'bigquery#jobCancelResponse', 'job': server._get_job(job_id)})
+
+            @staticmethod
+            def _get_dataset_resource(project, dataset):
+                return {
+                    'kind': 'bigquery#dataset',
+                    'id': '%s:%s' % (project, dataset),
+                    'datasetReference': {'projectId': project, 'datasetId': dataset},
+                    'location': 'US'
+                }
+
+            def _read_body(self, discard=False):
+                length = int(self.headers.get('Content-Length') or 0)
+                chunks = []
+                remaining = length
+                while remaining:
+                    chunk = self.rfile.read(min(READ_SIZE, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    if not discard:
+                        chunks.append(chunk)
+                    if server.bandwidth:
+                        time.sleep(len(chunk) / server.bandwidth)
+                return length if discard else b''.join(chunks)
+
+            def _send_json(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_empty(self, status):
+                self.send_response(status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def _send_error(self, status, message):
+                self._send_json(status, {'error': {
+                    'code': status,
+                    'message': message,
+                    'errors': [{'reason': {403: 'accessDenied', 404: 'notFound'}.get(status, 'invalid'),
+                                'message': message}]
+                }})
+
+        ROUTES = [
+            (r'/token', 'POST', Handler._token),
+            (API_PREFIX + r'/projects', 'GET', Handler._list_projects),
+            (API_PREFIX + r'/projects/([^/]+)/serviceAccount', 'GET', Handler._get_service_account),
+            (API_PREFIX + r'/projects/([^/]+)/datasets', 'GET', Handler._list_datasets),
+            (API_PREFIX + r'/projects/([^/]+)/datasets', 'POST', Handler._create_dataset),
+            (API_PREFIX + r'/projects/([^/]+)/datasets/([^/]+)', 'GET', Handler._get_dataset),
+            (API_PREFIX + r'/projects/([^/]+)/datasets/([^/]+)/tables', 'POST', Handler._create_table),
+            (API_PREFIX + r'/projects/([^/]+)/datasets/([^/]+)/tables/([^/]+)', 'GET', Handler._get_table),
+            (API_PREFIX + r'/projects/([^/]+)/datasets/([^/]+)/tables/([^/]+)', 'DELETE', Handler._delete_table),
+            (r'/upload' + API_PREFIX + r'/projects/([^/]+)/jobs', 'POST', Handler._start_upload),
+            (r'/upload/session/([0-9a-f]+)', 'PUT', Handler._upload),
+            (API_PREFIX + r'/projects/([^/]+)/jobs', 'POST', Handler._insert_job),
+            (API_PREFIX + r'/projects/([^/]+)/jobs/([^/]+)', 'GET', Handler._get_job),
+            (API_PREFIX + r'/projects/([^/]+)/jobs/([^/]+)/cancel', 'POST', Handler._cancel_job),
+        ]
+        return Handler
@@ -0,0 +1,166 @@
+import datetime
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import grpc
+from google.cloud.bigquery_storage_v1 import BigQueryWriteClient, types
+from google.cloud.bigquery_storage_v1.services.big_query_write.transports import BigQueryWriteGrpcTransport
+from google.protobuf import descriptor_pb2, descriptor_pool, message_factory
+from google.rpc import code_pb2, status_pb2
+
+SERVICE_NAME = 'google.cloud.bigquery.storage.v1.BigQueryWrite'
+
+
+class FakeBigqueryWriteServer(object):
+    """
+    In-process stand-in for the Storage Write API (gRPC) with pending and committed streams.
+    Rows visible in a table are kept in `tables` as {table path: [row dict]}.
+    Setting `append_error` makes the following append requests fail with that message.
+    """
+
+    def __init__(self):
+        self.tables = {}
+        self.streams = {}
+        self.append_requests = []
+        self.append_error = None
+        self.lock = threading.Lock()
+        self.server = grpc.server(ThreadPoolExecutor(max_workers=4))
+        self.server.add_generic_rpc_handlers([grpc.method_handlers_generic_handler(SERVICE_NAME, {
+            'CreateWriteStream': self._unary(self._create_write_stream, types.CreateWriteStreamRequest,
+                                             types.WriteStream),
+            'AppendRows': grpc.stream_stream_rpc_method_handler(
+                self._append_rows,
+                request_deserializer=types.AppendRowsRequest.deserialize,
+                response_serializer=types.AppendRowsResponse.serialize
+            ),
+            'GetWriteStream': self._unary(self._get_write_stream, types.GetWriteStreamRequest, types.WriteStream),
+            'FinalizeWriteStream': self._unary(self._finalize_write_stream, types.FinalizeWriteStreamRequest,
+                                               types.FinalizeWriteStreamResponse),
+            'BatchCommitWriteStreams': self._unary(self._batch_commit_write_streams,
+                                                   types.BatchCommitWriteStreamsRequest,
+                                                   types.BatchCommitWriteStreamsResponse),
+        })])
+        self.address = '127.0.0.1:%s' % self.server.add_insecure_port('127.0.0.1:0')
+
+    def __enter__(self):
+        self.server.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.stop(None)
+
+    def create_client(self) -> BigQueryWriteClient:
+        return BigQueryWriteClient(transport=BigQueryWriteGrpcTransport(
+            channel=grpc.insecure_channel(self.address)
+        ))
+
+    @staticmethod
+    def _unary(method, request_type, response_type):
+        return grpc.unary_unary_rpc_method_handler(
+            method,
+            request_deserializer=request_type.deserialize,
+            response_serializer=response_type.serialize
+        )
+
+    def _create_write_stream(self, request, context):
+        name = '%s/streams/%s' % (request.parent, uuid.uuid4().hex)
+        stream_type = request.write_stream.type_ or types.WriteStream.Type.COMMITTED
+        with self.lock:
+            self.tables.setdefault(request.parent, [])
+            self.streams[name] = {
+                'table': request.parent,
+                'type': stream_type,
+                'rows': [],
+                'finalized': False,
+                'committed': False
+            }
+        return types.WriteStream(name=name, type_=stream_type)
+
+    def _get_write_stream(self, request, context):
+        with self.lock:
+            stream = self.streams.get(request.name)
+        if stream is None:
+            context.abort(grpc.StatusCode.NOT_FOUND, 'Stream %s not found' % request.name)
+        return types.WriteStream(name=request.name, type_=stream['type'])
+
+    def _append_rows(self, requests, context):
+        stream_name = None
+        row_class = None
+        for request in requests:
+            with self.lock:
+                self.append_requests.append(request)
+            stream_name = request.write_stream or stream_name
+            if 'writer_schema' in request.proto_rows:
+                row_class = self._get_row_class(request.proto_rows.writer_schema.proto_descriptor)
+            with self.lock:
+                stream = self.streams.get(stream_name)
+                if stream is None or stream['finalized']:
+                    yield self._error_response(code_pb2.FAILED_PRECONDITION, 'Stream %s is not writable' % stream_name)
+                    continue
+                if self.append_error:
+                    yield self._error_response(code_pb2.INVALID_ARGUMENT, self.append_error)
+                    continue
+                if 'offset' in request and request.offset != len(stream['rows']):
+                    yield self._error_response(code_pb2.OUT_OF_RANGE, 'Offset %s, expected %s' % (
+                        request.offset,
+                        len(stream['rows'])
+                    ))
+                    continue
+                offset = len(stream['rows'])
+                rows = list(map(
+                    lambda serialized_row: self._decode_row(row_class, serialized_row),
+                    request.proto_rows.rows.serialized_rows
+                ))
+                stream['rows'].extend(rows)
+                if stream['type'] == types.WriteStream.Type.COMMITTED:
+                    self.tables[stream['table']].extend(rows)
+            yield types.AppendRowsResponse(
+                append_result=types.AppendRowsResponse.AppendResult(offset=offset),
+                write_stream=stream_name
+            )
+
+    def _finalize_write_stream(self, request, context):
+        with self.lock:
+            stream = self.streams.get(request.name)
+            if stream is None:
+                context.abort(grpc.StatusCode.NOT_FOUND, 'Stream %s not found' % request.name)
+            stream['finalized'] = True
+            return types.FinalizeWriteStreamResponse(row_count=len(stream['rows']))
+
+    def _batch_commit_write_streams(self, request, context):
+        stream_errors = []
+        with self.lock:
+            for name in request.write_streams:
+                stream = self.streams.get(name)
+                if stream is None or not stream['finalized'] or stream['committed']:
+                    stream_errors.append(types.StorageError(
+                        code=types.StorageError.StorageErrorCode.STREAM_NOT_FOUND
+                        if stream is None else types.StorageError.StorageErrorCode.INVALID_STREAM_STATE,
+                        entity=name,
+                        error_message='Stream %s cannot be committed' % name
+                    ))
+            if stream_errors:
+                return types.BatchCommitWriteStreamsResponse(stream_errors=stream_errors)
+            for name in request.write_streams:
+                stream = self.streams[name]
+                stream['committed'] = True
+                self.tables[stream['table']].extend(stream['rows'])
+        return types.BatchCommitWriteStreamsResponse(commit_time=datetime.datetime.now(datetime.timezone.utc))
+
+    @staticmethod
+    def _error_response(code, message):
+        return types.AppendRowsResponse(error=status_pb2.Status(code=code, message=message))
+
+    @staticmethod
+    def _get_row_class(descriptor: descriptor_pb2.DescriptorProto):
+        file_descriptor = descriptor_pb2.FileDescriptorProto(name='fake_row.proto', syntax='proto2')
+        file_descriptor.message_type.add().CopyFrom(descriptor)
+        pool = descriptor_pool.DescriptorPool()
+        pool.Add(file_descriptor)
+        return message_factory.GetMessageClass(pool.FindMessageTypeByName(descriptor.name))
+
+    @staticmethod
+    def _decode_row(row_class, serialized_row: bytes) -> dict:
+        row = row_class.FromString(serialized_row)
+        return dict(map(lambda field: (field[0].name, field[1]), row.ListFields()))
@@ -0,0 +1,165 @@
+import json
+import re
+import threading
+import uuid
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlparse
+
+
+class FakeGcsServer(object):
+    """
+    In-process stand-in for the Cloud Storage JSON API, covering the object uploads (multipart and resumable),
+    listing and deletes. Objects are kept in memory in `objects` as {(bucket, name): bytes}.
+
+    Usage: storage.Client(client_options={'api_endpoint': server.url}, credentials=AnonymousCredentials())
+    """
+
+    def __init__(self):
+        self.objects = {}
+        self.sessions = {}
+        self.requests = []
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._get_handler())
+        self.url = 'http://127.0.0.1:%s' % self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def get_objects(self, bucket: str) -> dict:
+        with self.lock:
+            return dict(map(
+                lambda item: (item[0][1], item[1]),
+                filter(lambda item: item[0][0] == bucket, self.objects.items())
+            ))
+
+    def _get_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                body = self._read_body()
+                with server.lock:
+                    server.requests.append(('POST', url.path))
+                match = re.fullmatch(r'/upload/storage/v1/b/([^/]+)/o', url.path)
+                if not match:
+                    return self._send_json(404, {'error': {'code': 404, 'message': 'Not found'}})
+                bucket = match.group(1)
+                upload_type = query.get('uploadType', [''])[0]
+                if upload_type == 'multipart':
+                    message = BytesParser(policy=HTTP).parsebytes(
+                        b'Content-Type: ' + self.headers['Content-Type'].encode() + b'\r\n\r\n' + body
+                    )
+                    metadata_part, media_part = list(message.iter_parts())
+                    metadata = json.loads(metadata_part.get_content())
+                    return self._store(bucket, metadata['name'], media_part.get_payload(decode=True), query)
+                if upload_type == 'resumable':
+                    metadata = json.loads(body or b'{}')
+                    session_id = uuid.uuid4().hex
+                    with server.lock:
+                        server.sessions[session_id] = {
+                            'bucket': bucket,
+                            'name': metadata.get('name') or query['name'][0],
+                            'data': b'',
+                            'query': query
+                        }
+                    self.send_response(200)
+                    self.send_header('Location', '%s/upload/session/%s' % (server.url, session_id))
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                return self._send_json(400, {'error': {'code': 400, 'message': 'Unsupported upload'}})
+
+            def do_PUT(self):
+                url = urlparse(self.path)
+                body = self._read_body()
+                match = re.fullmatch(r'/upload/session/([0-9a-f]+)', url.path)
+                with server.lock:
+                    session = server.sessions.get(match.group(1)) if match else None
+                if session is None:
+                    return self._send_json(404, {'error': {'code': 404, 'message': 'No such upload'}})
+                session['data'] += body
+                total = self.headers.get('Content-Range', '').rsplit('/', 1)[-1]
+                if total == '*' or int(total) > len(session['data']):
+                    self.send_response(308)
+                    if session['data']:
+                        self.send_header('Range', 'bytes=0-%s' % (len(session['data']) - 1))
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                with server.lock:
+                    del server.sessions[match.group(1)]
+                return self._store(session['bucket'], session['name'], session['data'], session['query'])
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                match = re.fullmatch(r'/storage/v1/b/([^/]+)/o', url.path)
+                if not match:
+                    return self._send_json(404, {'error': {'code': 404, 'message': 'Not found'}})
+                prefix = parse_qs(url.query).get('prefix', [''])[0]
+                objects = server.get_objects(match.group(1))
+                return self._send_json(200, {
+                    'kind': 'storage#objects',
+                    'items': list(map(
+                        lambda name: self._get_resource(match.group(1), name, objects[name]),
+                        sorted(filter(lambda name: name.startswith(prefix), objects))
+                    ))
+                })
+
+            def do_DELETE(self):
+                url = urlparse(self.path)
+                with server.lock:
+                    server.requests.append(('DELETE', url.path))
+                match = re.fullmatch(r'/storage/v1/b/([^/]+)/o/(.+)', url.path)
+                key = (match.group(1), unquote(match.group(2))) if match else None
+                with server.lock:
+                    if key not in server.objects:
+                        return self._send_json(404, {'error': {'code': 404, 'message': 'No such object'}})
+                    del server.objects[key]
+                self.send_response(204)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def _store(self, bucket, name, data, query):
+                with server.lock:
+                    if query.get('ifGenerationMatch') == ['0'] and (bucket, name) in server.objects:
+                        return self._send_json(412, {'error': {'code': 412, 'message': 'Precondition failed'}})
+                    server.objects[(bucket, name)] = data
+                return self._send_json(200, self._get_resource(bucket, name, data))
+
+            def _get_resource(self, bucket, name, data):
+                return {
+                    'kind': 'storage#object',
+                    'id': '%s/%s/1' % (bucket, name),
+                    'selfLink': '%s/storage/v1/b/%s/o/%s' % (server.url, bucket, quote(name, safe='')),
+                    'name': name,
+                    'bucket': bucket,
+                    'generation': '1',
+                    'size': str(len(data)),
+                }
+
+            def _read_body(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                return self.rfile.read(length)
+
+            def _send_json(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
@@ -1,4 +1,7 @@
 import os
+from unittest.mock import MagicMock
+from google.cloud import bigquery
+from google_bigquery_writer import schema_mapper, writer
 
 
 def get_table_configuration() -> dict:
@@ -112,3 +115,61 @@ def get_table_configuration_with_extra_column() -> dict:
             }
         ]
     }
+
+
+def write_csv(path: str, nr_of_rows: int, multiline: bool = False) -> str:
+    """
+    CSV file with columns col1 and col2 of the table by `get_table_definition`, values of col1 span two lines
+    when `multiline`.
+    """
+    row = '"val%s\non new line","%s"\n' if multiline else '"val%s","%s"\n'
+    with open(path, 'w') as csv_file:
+        csv_file.write('"col1","col2"\n')
+        for i in range(nr_of_rows):
+            csv_file.write(row % (i, i))
+    return path
+
+
+def get_table_definition(**options) -> dict:
+    return dict({
+        'dbName': 'table',
+        'items': [
+            {'name': 'col1', 'dbName': 'col1', 'type': 'STRING'},
+            {'name': 'col2', 'dbName': 'col2', 'type': 'INTEGER'},
+        ]
+    }, **options)
+
+
+def get_job(state: str = 'DONE', errors: list = None, error_result: dict = None) -> MagicMock:
+    job = MagicMock()
+    job.state = state
+    job.errors = errors
+    job.error_result = error_result
+    job.job_id = 'job-%s' % id(job)
+    return job
+
+
+def get_client(table: bigquery.Table = None) -> MagicMock:
+    """
+    Mocked client of project `project` with dataset `dataset`, every table of it exists as `table` (by default
+    not partitioned nor clustered). Load jobs succeed, the data they load is collected in `client.loaded_data`.
+    """
+    client = MagicMock()
+    client.project = 'project'
+    client.get_dataset = MagicMock(return_value=bigquery.Dataset('project.dataset'))
+    client.get_table = MagicMock(return_value=table or bigquery.Table('project.dataset.table'))
+    client.loaded_data = []
+    client.load_table_from_file = MagicMock(
+        side_effect=lambda readable, *args, **kwargs: client.loaded_data.append(readable.read()) or get_job()
+    )
+    return client
+
+
+def get_writer(client: MagicMock = None, **options) -> writer.Writer:
+    my_writer = writer.Writer(client or get_client(), **options)
+    my_writer._verified_projects['project'] = True
+    return my_writer
+
+
+def mock_csv_schema(monkeypatch, columns: list = ('col1', 'col2')) -> None:
+    monkeypatch.setattr(schema_mapper, 'get_csv_schema', lambda csv_file_path: list(columns))
@@ -89,13 +89,13 @@ class TestApp(GoogleBigQueryWriterTest):
         # assertions
         out, err = capsys.readouterr()
         assert err == ''
-        assert out == 'Loading table in.c-bucket.table1 into BigQuery ' \
-            'as %s.table1\n' \
-            'Loading table in.c-bucket.table2 into BigQuery as %s.table2\n' \
-            'BigQuery Writer finished\n' % (
-                os.environ.get('BIGQUERY_DATASET'),
-                os.environ.get('BIGQUERY_DATASET')
-            )
+        # tables are loaded in parallel, each with its own messages
+        lines = out.splitlines()
+        assert '[table1] Loading table in.c-bucket.table1 into BigQuery ' \
+            'as %s.table1' % os.environ.get('BIGQUERY_DATASET') in lines
+        assert '[table2] Loading table in.c-bucket.table2 into BigQuery ' \
+            'as %s.table2' % os.environ.get('BIGQUERY_DATASET') in lines
+        assert lines[-1] == 'BigQuery Writer finished'
 
         client = self.get_client('service_account_manage')
 
@@ -203,13 +203,13 @@ class TestApp(GoogleBigQueryWriterTest):
 
         out, err = capsys.readouterr()
         assert err == ''
-        assert out == 'Loading table in.c-bucket.table1 into BigQuery ' \
-            'as %s.table1\n' \
-            'Loading table in.c-bucket.table2 into BigQuery as %s.table2\n' \
-            'BigQuery Writer finished\n' % (
-                os.environ.get('BIGQUERY_DATASET'),
-                os.environ.get('BIGQUERY_DATASET')
-            )
+        # tables are loaded in parallel, each with its own messages
+        lines = out.splitlines()
+        assert '[table1] Loading table in.c-bucket.table1 into BigQuery ' \
+            'as %s.table1' % os.environ.get('BIGQUERY_DATASET') in lines
+        assert '[table2] Loading table in.c-bucket.table2 into BigQuery ' \
+            'as %s.table2' % os.environ.get('BIGQUERY_DATASET') in lines
+        assert lines[-1] == 'BigQuery Writer finished'
 
     def test_list(self, data_dir, capsys):
         client = self.get_client('service_account_manage')
@@ -0,0 +1,50 @@
+import json
+from unittest.mock import MagicMock
+import pytest
+from google.auth.exceptions import RefreshError
+from google_bigquery_writer import app, exceptions, project_lister
+
+
+class TestAppList:
+
+    def run_list(self, tmp_path, monkeypatch, projects, error=None):
+        def iter_projects(lister):
+            yield from projects
+            if error is not None:
+                raise error
+
+        with open(str(tmp_path / 'config.json'), 'w') as config_file:
+            json.dump({'action': 'list', 'parameters': {'dataset': 'dataset'}}, config_file)
+        monkeypatch.setenv('KBC_DATADIR', str(tmp_path))
+        monkeypatch.setattr(project_lister.ProjectLister, 'iter_projects', iter_projects)
+        application = app.App()
+        application.bigquery_client_factory = MagicMock()
+        application.action_list()
+
+    def test_list(self, tmp_path, monkeypatch, capsys):
+        projects = [{'id': 'project1', 'name': 'project1', 'datasets': []},
+                    {'id': 'project2', 'name': 'project2', 'datasets': [], 'error': 'Not found'}]
+
+        self.run_list(tmp_path, monkeypatch, projects)
+
+        assert json.loads(capsys.readouterr().out) == {'projects': projects, 'incomplete': False}
+
+    def test_no_projects(self, tmp_path, monkeypatch, capsys):
+        self.run_list(tmp_path, monkeypatch, [])
+
+        assert json.loads(capsys.readouterr().out) == {'projects': [], 'incomplete': False}
+
+    def test_failure_after_first_project(self, tmp_path, monkeypatch, capsys):
+        projects = [{'id': 'project1', 'name': 'project1', 'datasets': []}]
+
+        with pytest.raises(exceptions.UserException, match='Cannot connect to BigQuery'):
+            self.run_list(tmp_path, monkeypatch, projects, RefreshError('expired'))
+
+        # the document written out so far is closed
+        assert json.loads(capsys.readouterr().out) == {'projects': projects, 'incomplete': True}
+
+    def test_failure_before_first_project(self, tmp_path, monkeypatch, capsys):
+        with pytest.raises(KeyError):
+            self.run_list(tmp_path, monkeypatch, [], KeyError('id'))
+
+        assert capsys.readouterr().out == ''
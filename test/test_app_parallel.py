@@ -0,0 +1,146 @@
+import json
+import threading
+import pytest
+from google_bigquery_writer import app, exceptions
+from test import fixtures
+
+
+class FakeWriter:
+
+    def __init__(self, failures=None, barrier=None):
+        self.failures = failures or {}
+        self.barrier = barrier
+        self.loaded = []
+        self.lock = threading.Lock()
+
+    def write_table_sync(self, csv_file_path, dataset_name, table_definition, incremental=False,
+                         skip_unchanged=False):
+        with self.lock:
+            self.loaded.append(table_definition['dbName'])
+        if self.barrier is not None:
+            self.barrier.wait()
+        if table_definition['dbName'] in self.failures:
+            raise self.failures[table_definition['dbName']]
+
+
+class TestAppParallel:
+
+    def prepare(self, tmp_path, monkeypatch, sizes, max_parallel_tables, **parameters):
+        tables = []
+        input_tables = []
+        (tmp_path / 'in' / 'tables').mkdir(parents=True)
+        for name, size in sizes.items():
+            tables.append({
+                'dbName': name,
+                'tableId': 'in.c-bucket.%s' % name,
+                'items': [{'name': 'col1', 'dbName': 'col1', 'type': 'STRING'}]
+            })
+            input_tables.append({'source': 'in.c-bucket.%s' % name, 'destination': '%s.csv' % name})
+            (tmp_path / 'in' / 'tables' / ('%s.csv' % name)).write_text('"col1"\n' + '"value"\n' * size)
+        with open(str(tmp_path / 'config.json'), 'w') as config_file:
+            json.dump({
+                'parameters': dict({
+                    'dataset': 'dataset',
+                    'maxParallelTables': max_parallel_tables,
+                    'tables': tables
+                }, **parameters),
+                'storage': {'input': {'tables': input_tables}}
+            }, config_file)
+        monkeypatch.setenv('KBC_DATADIR', str(tmp_path))
+        return app.App()
+
+    def test_biggest_tables_first(self, tmp_path, monkeypatch):
+        application = self.prepare(tmp_path, monkeypatch, {'small': 1, 'big': 100, 'medium': 10}, 1)
+        application.writer = FakeWriter()
+
+        application.action_run()
+
+        assert application.writer.loaded == ['big', 'medium', 'small']
+        assert application.metrics.get_counter('tables_loaded_total') == 3
+
+    def test_tables_loaded_in_parallel(self, tmp_path, monkeypatch):
+        application = self.prepare(tmp_path, monkeypatch, {'first': 1, 'second': 1}, 2)
+        # both loads wait for each other, the barrier breaks when they don't run at the same time
+        application.writer = FakeWriter(barrier=threading.Barrier(2, timeout=10))
+
+        application.action_run()
+
+        assert sorted(application.writer.loaded) == ['first', 'second']
+
+    def test_failures_reported_together(self, tmp_path, monkeypatch):
+        application = self.prepare(tmp_path, monkeypatch, {'first': 3, 'second': 2, 'third': 1}, 2)
+        application.writer = FakeWriter({
+            'first': exceptions.UserException('Invalid data'),
+            'third': KeyError('col1')
+        })
+
+        with pytest.raises(exceptions.ApplicationException) as err:
+            application.action_run()
+
+        # all tables are loaded, the unexpected failure is reported with the others
+        assert sorted(application.writer.loaded) == ['first', 'second', 'third']
+        assert err.value.message.startswith('Loading of 2 tables failed:\n')
+        assert '[first] Invalid data' in err.value.message
+        assert "[third] KeyError: 'col1'" in err.value.message
+        assert isinstance(err.value.__cause__, KeyError)
+        assert application.metrics.get_counter('tables_loaded_total') == 1
+        assert application.metrics.get_counter('tables_failed_total') == 2
+
+    def test_user_failures_reported_together(self, tmp_path, monkeypatch):
+        application = self.prepare(tmp_path, monkeypatch, {'first': 2, 'second': 1}, 2)
+        application.writer = FakeWriter({
+            'first': exceptions.UserException('Invalid data'),
+            'second': exceptions.UserException('Missing column')
+        })
+
+        with pytest.raises(exceptions.UserException, match='Loading of 2 tables failed'):
+            application.action_run()
+
+    def test_single_unexpected_failure(self, tmp_path, monkeypatch):
+        application = self.prepare(tmp_path, monkeypatch, {'first': 2, 'second': 1}, 2)
+        application.writer = FakeWriter({'second': KeyError('col1')})
+
+        with pytest.raises(KeyError):
+            application.action_run()
+        assert application.metrics.get_counter('tables_loaded_total') == 1
+
+    def test_unchanged_state_kept(self, tmp_path, monkeypatch):
+        application = self.prepare(tmp_path, monkeypatch, {'first': 1}, 1)
+        (tmp_path / 'in' / 'state.json').write_text('{"tableFingerprints": {"dataset.first": "fingerprint"}}')
+        application.writer = FakeWriter()
+
+        application.action_run()
+
+        # a state stored with nothing written to out/state.json would be empty
+        with open(str(tmp_path / 'out' / 'state.json')) as state_file:
+            assert json.load(state_file) == {'tableFingerprints': {'dataset.first': 'fingerprint'}}
+
+    def test_skipped_table_keeps_fingerprint(self, tmp_path, monkeypatch):
+        fixtures.mock_csv_schema(monkeypatch, ('col1',))
+        client = fixtures.get_client()
+        for run in range(2):
+            application = self.prepare(tmp_path / str(run), monkeypatch, {'first': 1}, 1, skipUnchanged=True)
+            if run > 0:
+                # the state stored by the previous run
+                (tmp_path / '0' / 'out' / 'state.json').rename(tmp_path / '1' / 'in' / 'state.json')
+            application.writer = fixtures.get_writer(client, state=application.get_state())
+
+            application.action_run()
+
+        assert client.load_table_from_file.call_count == 1
+        assert application.writer.metrics.get_counter('tables_skipped_total', table='first') == 1
+        with open(str(tmp_path / '1' / 'out' / 'state.json')) as state_file:
+            assert list(json.load(state_file)['tableFingerprints']) == ['dataset.first']
+
+    def test_load_reported_by_table(self, tmp_path, monkeypatch, capsys):
+        application = self.prepare(tmp_path, monkeypatch, {'first': 1, 'second': 1}, 2)
+        application.writer = FakeWriter()
+
+        application.action_run()
+
+        lines = capsys.readouterr().out.splitlines()
+        assert sorted(lines[:-1]) == [
+            '[first] Loading table in.c-bucket.first into BigQuery as dataset.first',
+            '[second] Loading table in.c-bucket.second into BigQuery as dataset.second'
+        ]
+        assert lines[-1] == 'BigQuery Writer finished'
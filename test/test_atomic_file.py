@@ -0,0 +1,31 @@
+import os
+import pytest
+from google_bigquery_writer.atomic_file import write_atomic
+
+
+class TestAtomicFile:
+
+    def test_write(self, tmp_path):
+        path = str(tmp_path / 'dir' / 'file.json')
+
+        write_atomic(path, '{"a": 1}')
+        write_atomic(path, b'{"a": 2}', 0o600)
+
+        with open(path) as file:
+            assert file.read() == '{"a": 2}'
+        assert os.listdir(str(tmp_path / 'dir')) == ['file.json']
+
+    def test_mode_of_new_file(self, tmp_path):
+        path = str(tmp_path / 'secret')
+
+        write_atomic(path, 'token', 0o600)
+
+        assert os.stat(path).st_mode & 0o777 == 0o600
+
+    def test_failed_write_removes_temporary_file(self, tmp_path):
+        path = tmp_path / 'file'
+        path.mkdir()
+
+        with pytest.raises(OSError):
+            write_atomic(str(path), 'content')
+        assert os.listdir(str(tmp_path)) == ['file']
@@ -0,0 +1,55 @@
+import os
+import socket
+import pytest
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import bigquery
+from google_bigquery_writer.bigquery_client_factory import BigqueryClientFactory, PooledHTTPAdapter
+from google_bigquery_writer.exceptions import UserException
+from google_bigquery_writer.writer import Writer
+from test.fake_bigquery_server import FakeBigqueryServer
+
+
+class TestBigqueryClientFactory:
+
+    def test_pooled_upload(self, tmp_path, monkeypatch):
+        csv_file_path = str(tmp_path / 'table.csv')
+        with open(csv_file_path, 'w') as csv_file:
+            csv_file.write('"col1","col2"\n')
+            for i in range(50000):
+                csv_file.write('"val%s","%s"\n' % (i, i))
+
+        with FakeBigqueryServer() as server:
+            monkeypatch.setenv('BIGQUERY_EMULATOR_HOST', server.url)
+            factory = BigqueryClientFactory('project', AnonymousCredentials(), pool_size=3, keep_alive=30,
+                                            upload_chunk_size=256 * 1024)
+            client = factory.create()
+            assert client._http is factory.get_session()
+            assert factory.create()._http is client._http
+
+            table_reference = bigquery.TableReference.from_string('project.dataset.table')
+            job = Writer(client)._write_table(csv_file_path, table_reference, 1)
+
+            assert job.state == 'DONE'
+            assert server.uploaded_bytes == os.path.getsize(csv_file_path)
+            # ~0.9MB in chunks of 256kB
+            assert server.rpc_counts['PUT upload'] == 4
+
+        stats = factory.get_pool_stats()
+        assert len(stats) == 1
+        assert stats[0]['host'] == server.url
+        assert stats[0]['max_size'] == 3
+        assert stats[0]['requests'] == 5
+        # all requests were sent one after another through a single kept alive connection
+        assert stats[0]['created_connections'] == 1
+        assert stats[0]['idle_connections'] == 1
+
+    def test_keep_alive_socket_options(self):
+        options = PooledHTTPAdapter._get_socket_options(60)
+        assert (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1) in options
+        assert (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1) in options
+        assert PooledHTTPAdapter(keep_alive=60).poolmanager.connection_pool_kw['socket_options'] == options
+        assert 'socket_options' not in PooledHTTPAdapter().poolmanager.connection_pool_kw
+
+    def test_invalid_upload_chunk_size(self):
+        with pytest.raises(UserException, match='multiple of 256kB'):
+            BigqueryClientFactory('project', AnonymousCredentials(), upload_chunk_size=1000 * 1000)
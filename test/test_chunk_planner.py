@@ -0,0 +1,47 @@
+import pytest
+from google_bigquery_writer.chunk_planner import MB, plan_chunks
+from google_bigquery_writer.exceptions import UserException
+
+
+class TestChunkPlanner:
+
+    def test_small_file_single_upload(self):
+        plan = plan_chunks(100 * MB, 1000 * MB, 5, 64 * MB)
+        assert plan.nr_of_chunks == 1
+        assert plan.chunk_size == 100 * MB
+
+    def test_mid_size_file_uses_all_workers(self):
+        plan = plan_chunks(900 * MB, 1000 * MB, 5, 64 * MB)
+        assert plan.nr_of_chunks == 5
+        assert plan.chunk_size == 180 * MB
+        assert plan.reason == 'parallel uploads'
+
+    def test_minimal_chunk_size_limits_parallelism(self):
+        assert plan_chunks(200 * MB, 1000 * MB, 5, 64 * MB).nr_of_chunks == 3
+
+    def test_size_limit_is_not_truncated(self):
+        # 1000.5MB doesn't fit into one chunk of 1000MB
+        assert plan_chunks(int(1000.5 * MB), 1000 * MB, 1, 64 * MB).nr_of_chunks == 2
+        assert plan_chunks(int(2.5 * MB), 1 * MB, 1, 64 * MB).nr_of_chunks == 3
+
+    def test_big_file_split_into_whole_rounds(self):
+        plan = plan_chunks(8500 * MB, 1000 * MB, 5, 64 * MB)
+        assert plan.nr_of_chunks == 10
+        assert plan.chunk_size == 850 * MB
+        assert plan.reason == 'chunk size limit, 2 rounds of parallel uploads'
+
+    def test_rounding_limited(self):
+        # filling the last round would almost double the load jobs
+        plan = plan_chunks(5001 * MB, 1000 * MB, 5, 64 * MB)
+        assert plan.nr_of_chunks == 6
+        assert plan.reason == 'chunk size limit, 2 rounds of parallel uploads'
+        assert plan_chunks(20001 * MB, 1000 * MB, 5, 64 * MB).nr_of_chunks == 25
+
+    def test_load_job_quota(self):
+        assert plan_chunks(1495 * MB, 1 * MB, 5, 1, max_chunks=1500).nr_of_chunks == 1495
+        assert plan_chunks(1499 * MB, 1 * MB, 5, 1, max_chunks=1500).nr_of_chunks == 1500
+        with pytest.raises(UserException, match='more than the 1500 load jobs'):
+            plan_chunks(1501 * MB, 1 * MB, 5, 1, max_chunks=1500)
+
+    def test_empty_file(self):
+        assert plan_chunks(0, 1000 * MB, 5, 64 * MB) == (1, 0, 'single upload, smaller than two minimal chunks of 64MB')
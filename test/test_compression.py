@@ -0,0 +1,20 @@
+import gzip
+from google_bigquery_writer import compression
+
+
+class TestCompression:
+
+    def test_compress_chunk(self, tmp_path):
+        source_path = str(tmp_path / 'table.csv')
+        with open(source_path, 'wb') as source_file:
+            source_file.write(b'"col1","col2"\n' + b'"val1","1"\n' * 1000)
+        target_path = str(tmp_path / 'table.csv.gz')
+
+        result = compression.compress_chunk(source_path, target_path, (14, 25))
+
+        assert result['path'] == target_path
+        assert result['raw_bytes'] == 11
+        assert result['compressed_bytes'] > 0
+        assert result['cpu_time'] >= 0
+        with gzip.open(target_path, 'rb') as compressed_file:
+            assert compressed_file.read() == b'"val1","1"\n'
@@ -0,0 +1,107 @@
+import io
+import os
+import csv
+import pytest
+from google_bigquery_writer import csv_splitter, exceptions
+from google_bigquery_writer.file_window import FileWindow
+
+
+class TestCsvSplitter:
+
+    def write_csv(self, tmp_path, rows):
+        csv_file_path = str(tmp_path / 'table.csv')
+        with open(csv_file_path, 'w', newline='') as csv_file:
+            writer = csv.writer(csv_file, quoting=csv.QUOTE_ALL, lineterminator='\n')
+            writer.writerow(['col1', 'col2'])
+            writer.writerows(rows)
+        return csv_file_path
+
+    def read_slices(self, slice_paths):
+        rows = []
+        for slice_path in slice_paths:
+            with open(slice_path, newline='') as slice_file:
+                rows.extend(csv.reader(slice_file))
+        return rows
+
+    def test_split_csv(self, tmp_path):
+        rows = [['val%s' % i, str(i)] for i in range(1000)]
+        csv_file_path = self.write_csv(tmp_path, rows)
+        output_path = tmp_path / 'slices'
+        output_path.mkdir()
+
+        slices = list(csv_splitter.split_csv(csv_file_path, str(output_path), 4, block_size=256))
+
+        assert len(slices) == 4
+        assert self.read_slices(map(lambda slice_item: slice_item[0], slices)) == rows
+        with open(csv_file_path, 'rb') as csv_file:
+            content = csv_file.read()
+        for slice_path, (start, end) in slices:
+            with open(slice_path, 'rb') as slice_file:
+                assert slice_file.read() == content[start:end]
+        assert slices[-1][1][1] == len(content)
+
+    def test_split_csv_quoted_newlines(self, tmp_path):
+        rows = [['val%s\non new line, "quoted"\n' % i, str(i)] for i in range(500)]
+        csv_file_path = self.write_csv(tmp_path, rows)
+        output_path = tmp_path / 'slices'
+        output_path.mkdir()
+
+        slice_paths = list(map(
+            lambda slice_item: slice_item[0],
+            csv_splitter.split_csv(csv_file_path, str(output_path), 7, block_size=100)
+        ))
+
+        assert len(slice_paths) == 7
+        for slice_path in slice_paths:
+            with open(slice_path, newline='') as slice_file:
+                assert all(map(lambda row: len(row) == 2, csv.reader(slice_file)))
+        assert self.read_slices(slice_paths) == rows
+
+    def test_split_csv_header_only(self, tmp_path):
+        csv_file_path = self.write_csv(tmp_path, [])
+        assert list(csv_splitter.split_csv(csv_file_path, str(tmp_path), 3)) == []
+
+    def test_split_csv_unterminated_quote(self, tmp_path):
+        csv_file_path = str(tmp_path / 'table.csv')
+        with open(csv_file_path, 'w') as csv_file:
+            csv_file.write('"col1","col2"\n"val1","1"\n"val2,"2"\n')
+        output_path = tmp_path / 'slices'
+        output_path.mkdir()
+
+        with pytest.raises(exceptions.UserException, match='unterminated quoted value'):
+            list(csv_splitter.split_csv(csv_file_path, str(output_path), 2))
+
+    def test_find_record_ranges(self, tmp_path):
+        rows = [['val%s\non new line' % i, str(i)] for i in range(300)]
+        csv_file_path = self.write_csv(tmp_path, rows)
+
+        byte_ranges = csv_splitter.find_record_ranges(csv_file_path, 5, block_size=64)
+
+        assert len(byte_ranges) == 5
+        assert byte_ranges[0][0] == 0
+        assert byte_ranges[-1][1] == os.path.getsize(csv_file_path)
+        read_rows = []
+        for index, byte_range in enumerate(byte_ranges):
+            with FileWindow(csv_file_path, *byte_range) as readable:
+                window_rows = list(csv.reader(io.TextIOWrapper(readable, newline='')))
+            read_rows.extend(window_rows[1:] if index == 0 else window_rows)
+        assert read_rows == rows
+
+    def test_find_record_ranges_part_of_file(self, tmp_path):
+        rows = [['val%s\non new line' % i, str(i)] for i in range(300)]
+        csv_file_path = self.write_csv(tmp_path, rows)
+        byte_ranges = csv_splitter.find_record_ranges(csv_file_path, 5, block_size=64)
+
+        part_ranges = csv_splitter.find_record_ranges(
+            csv_file_path, 3, block_size=64, start=byte_ranges[1][0], end=byte_ranges[3][1]
+        )
+
+        assert part_ranges[0][0] == byte_ranges[1][0]
+        assert part_ranges[-1][1] == byte_ranges[3][1]
+        with FileWindow(csv_file_path, byte_ranges[1][0], byte_ranges[3][1]) as readable:
+            expected_rows = list(csv.reader(io.TextIOWrapper(readable, newline='')))
+        read_rows = []
+        for byte_range in part_ranges:
+            with FileWindow(csv_file_path, *byte_range) as readable:
+                read_rows.extend(csv.reader(io.TextIOWrapper(readable, newline='')))
+        assert read_rows == expected_rows
@@ -0,0 +1,54 @@
+import os
+import time
+from google.cloud import bigquery
+from google_bigquery_writer import writer
+from test import fixtures
+from test.fake_bigquery_server import FakeBigqueryServer
+
+
+class TestFakeBigqueryServer:
+
+    def prepare(self, tmp_path, monkeypatch, nr_of_rows=100000):
+        fixtures.mock_csv_schema(monkeypatch)
+        return fixtures.write_csv(str(tmp_path / 'table.csv'), nr_of_rows, multiline=True)
+
+    def get_table_definition(self):
+        return fixtures.get_table_definition(chunkSize=1, chunkMode='ranges')
+
+    def test_chunked_load(self, tmp_path, monkeypatch):
+        csv_file_path = self.prepare(tmp_path, monkeypatch)
+        input_size = os.path.getsize(csv_file_path)
+        with FakeBigqueryServer(job_duration=0.1) as server:
+            my_writer = writer.Writer(server.create_client())
+
+            my_writer.write_table_sync(csv_file_path, 'dataset', self.get_table_definition(), polling_delay=1)
+
+            assert list(server.get_tables('project', 'dataset')) == ['table']
+            schema = server.get_tables('project', 'dataset')['table']['schema']['fields']
+            assert list(map(lambda field: field['name'], schema)) == ['col1', 'col2']
+            assert server.uploaded_bytes == input_size
+            # ~2.7MB in chunks of up to 1MB
+            assert server.rpc_counts['POST start_upload'] == 3
+            assert server.rpc_counts['GET get_job'] >= 3
+            assert server.rpc_counts['POST create_dataset'] == 1
+
+            # full load of an existing table recreates it
+            my_writer.write_table_sync(csv_file_path, 'dataset', self.get_table_definition(), polling_delay=1)
+            assert server.rpc_counts['DELETE delete_table'] == 1
+            assert server.rpc_counts['POST create_dataset'] == 1
+
+    def test_latency_and_bandwidth(self, tmp_path, monkeypatch):
+        csv_file_path = self.prepare(tmp_path, monkeypatch, 1000)
+        with FakeBigqueryServer(latency=0.05, bandwidth=100 * 1024) as server:
+            client = server.create_client()
+            started = time.monotonic()
+            table_reference = bigquery.TableReference.from_string('project.dataset.table')
+            job = writer.Writer(client)._write_table(csv_file_path, table_reference, 1)
+
+            # two requests of the resumable upload, ~28kB at 100kB/s
+            assert time.monotonic() - started >= 2 * 0.05 + 0.25
+            assert job.state == 'DONE'
+            assert server.uploaded_bytes == os.path.getsize(csv_file_path)
+            job.cancel()
+            job.reload()
+            assert job.error_result is None
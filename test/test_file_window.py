@@ -0,0 +1,21 @@
+import os
+from google_bigquery_writer.file_window import FileWindow
+
+
+class TestFileWindow:
+
+    def test_window(self, tmp_path):
+        file_path = str(tmp_path / 'data.bin')
+        with open(file_path, 'wb') as data_file:
+            data_file.write(b'0123456789')
+
+        with FileWindow(file_path, 2, 7) as window:
+            assert window.mode == 'rb'
+            assert window.read(2) == b'23'
+            assert window.tell() == 2
+            assert window.read() == b'456'
+            assert window.read() == b''
+            assert window.seek(0, os.SEEK_END) == 5
+            window.seek(1)
+            assert window.read(100) == b'3456'
+        assert window.closed
@@ -0,0 +1,122 @@
+from unittest.mock import MagicMock
+import pytest
+from google.api_core import exceptions
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import storage
+from google_bigquery_writer import writer
+from google_bigquery_writer.gcs_staging import GcsStaging
+from test import fixtures
+from test.fake_gcs_server import FakeGcsServer
+
+
+class TestGcsStaging:
+
+    def get_staging(self, server):
+        storage_client = storage.Client(
+            project='project',
+            credentials=AnonymousCredentials(),
+            client_options={'api_endpoint': server.url}
+        )
+        return GcsStaging(storage_client, 'bucket')
+
+    def prepare(self, tmp_path, monkeypatch, nr_of_rows=100000):
+        fixtures.mock_csv_schema(monkeypatch)
+        csv_file_path = fixtures.write_csv(str(tmp_path / 'table.csv'), nr_of_rows, multiline=True)
+        with open(csv_file_path, 'rb') as csv_file:
+            csv_file.readline()
+            return csv_file_path, csv_file.read()
+
+    def get_client(self):
+        client = fixtures.get_client()
+        client.load_table_from_uri = MagicMock(side_effect=lambda *args, **kwargs: fixtures.get_job())
+        return client
+
+    def get_table_definition(self, chunk_mode):
+        return fixtures.get_table_definition(chunkSize=0.5, chunkMode=chunk_mode)
+
+    def test_upload_byte_range_and_delete(self, tmp_path):
+        file_path = str(tmp_path / 'file')
+        with open(file_path, 'wb') as file:
+            file.write(b'0123456789' * 1024 * 1024)
+
+        with FakeGcsServer() as server:
+            staging = self.get_staging(server)
+            assert staging.upload(file_path, 'path/range', (5, 15)) == 'gs://bucket/path/range'
+            # bigger than one multipart upload, uploaded in a resumable session
+            assert staging.upload(file_path, 'path/file') == 'gs://bucket/path/file'
+            objects = server.get_objects('bucket')
+            assert objects['path/range'] == b'5678901234'
+            assert objects['path/file'] == b'0123456789' * 1024 * 1024
+
+            staging.delete(['path/range', 'path/file', 'path/missing'])
+            assert server.get_objects('bucket') == {}
+
+    @pytest.mark.parametrize('chunk_mode', ['ranges', 'slices'])
+    def test_staged_chunks_loaded_by_one_job(self, tmp_path, monkeypatch, chunk_mode):
+        csv_file_path, expected_data = self.prepare(tmp_path, monkeypatch)
+        client = self.get_client()
+        with FakeGcsServer() as server:
+            my_writer = fixtures.get_writer(client, staging=self.get_staging(server))
+
+            my_writer.write_table_sync(csv_file_path, 'dataset', self.get_table_definition(chunk_mode))
+
+            assert client.load_table_from_uri.call_count == 1
+            client.load_table_from_file.assert_not_called()
+            uris = client.load_table_from_uri.call_args.args[0]
+            assert len(uris) > 1
+            job_config = client.load_table_from_uri.call_args.kwargs['job_config']
+            assert job_config.skip_leading_rows == 0
+            # staged objects are removed once the job is done
+            assert server.get_objects('bucket') == {}
+            assert list(filter(lambda request: request[0] == 'DELETE', server.requests)) != []
+
+    def test_staged_objects_content(self, tmp_path, monkeypatch):
+        csv_file_path, expected_data = self.prepare(tmp_path, monkeypatch)
+        client = self.get_client()
+        with FakeGcsServer() as server:
+            my_writer = fixtures.get_writer(client, staging=self.get_staging(server))
+
+            with my_writer.write_table(csv_file_path, 'dataset', self.get_table_definition('ranges')) as jobs:
+                objects = server.get_objects('bucket')
+                uris = client.load_table_from_uri.call_args.args[0]
+                data = b''.join(map(lambda uri: objects[uri[len('gs://bucket/'):]], uris))
+                # the header is left out, the object data make up the rest of the file
+                assert data == expected_data
+                assert len(jobs) == 1
+
+            # the returned jobs own the staged objects
+            assert server.get_objects('bucket') == {}
+            jobs.close()
+
+    def test_failed_job_submission_removes_staged_objects(self, tmp_path, monkeypatch):
+        csv_file_path, expected_data = self.prepare(tmp_path, monkeypatch)
+        client = self.get_client()
+        client.load_table_from_uri = MagicMock(side_effect=writer.UserException('Cannot load'))
+        with FakeGcsServer() as server:
+            my_writer = fixtures.get_writer(client, staging=self.get_staging(server))
+            try:
+                my_writer.write_table(csv_file_path, 'dataset', self.get_table_definition('ranges'))
+                assert False, 'UserException expected'
+            except writer.UserException as err:
+                assert err.message == 'Cannot load'
+            assert server.get_objects('bucket') == {}
+
+    def test_failed_upload_retried(self, tmp_path, monkeypatch):
+        csv_file_path, expected_data = self.prepare(tmp_path, monkeypatch, 1000)
+        client = self.get_client()
+        staging = MagicMock()
+        staging.get_staging_path = MagicMock(return_value='path')
+        staging.get_uri = MagicMock(side_effect=lambda object_name: 'gs://bucket/%s' % object_name)
+        # the second attempt finds the object uploaded by the first one
+        staging.upload = MagicMock(side_effect=[
+            exceptions.ServiceUnavailable('unavailable'),
+            exceptions.PreconditionFailed('exists')
+        ])
+        my_writer = fixtures.get_writer(client, staging=staging)
+
+        my_writer.write_table_sync(csv_file_path, 'dataset', self.get_table_definition('ranges'))
+
+        assert staging.upload.call_count == 2
+        assert client.load_table_from_uri.call_args.args[0] == ['gs://bucket/path/table.0000']
+        assert my_writer.metrics.get_counter('retries_total', operation='_upload_chunk', table='table') == 1
+        staging.delete.assert_called_once_with(['path/table.0000'])
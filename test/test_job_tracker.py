@@ -0,0 +1,41 @@
+import pytest
+from google_bigquery_writer.job_tracker import JobTracker
+
+
+class FakeJob:
+    def __init__(self, reloads_until_done, error_result=None):
+        self.reloads_until_done = reloads_until_done
+        self.error_result = error_result
+        self.errors = None
+        self.reloads = 0
+        self.state = 'DONE' if reloads_until_done == 0 else 'RUNNING'
+
+    def reload(self):
+        self.reloads += 1
+        if self.reloads >= self.reloads_until_done:
+            self.state = 'DONE'
+
+
+class TestJobTracker:
+
+    def test_wait_all_jobs(self):
+        jobs = [FakeJob(0), FakeJob(1), FakeJob(3)]
+        tracker = JobTracker(10, 0.01, initial_delay=0.001)
+
+        assert tracker.wait(jobs) is None
+        assert all(map(lambda job: job.state == 'DONE', jobs))
+        assert jobs[0].reloads == 0
+        assert jobs[1].reloads == 1
+
+    def test_wait_returns_first_failed_job(self):
+        failed_job = FakeJob(1, error_result={'reason': 'invalid'})
+        slow_job = FakeJob(1000)
+        tracker = JobTracker(10, 0.01, initial_delay=0.001)
+
+        assert tracker.wait([slow_job, failed_job]) is failed_job
+        assert slow_job.state == 'RUNNING'
+
+    def test_wait_timeout(self):
+        tracker = JobTracker(0.05, 0.01, initial_delay=0.001)
+        with pytest.raises(TimeoutError):
+            tracker.wait([FakeJob(0), FakeJob(100000)])
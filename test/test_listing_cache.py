@@ -0,0 +1,33 @@
+import time
+from google_bigquery_writer.listing_cache import ListingCache
+
+
+class TestListingCache:
+
+    def test_expiry(self, tmp_path):
+        cache = ListingCache(str(tmp_path), 'writer@project.iam.gserviceaccount.com', ttl=0.2)
+        assert cache.get_projects() is None
+        cache.set_projects([{'id': 'project1', 'name': 'Project 1'}])
+        cache.set_project({'id': 'project1', 'name': 'Project 1', 'datasets': [{'id': 'ds', 'name': 'ds'}]})
+        cache.save()
+
+        cache = ListingCache(str(tmp_path), 'writer@project.iam.gserviceaccount.com', ttl=0.2)
+        assert cache.get_projects() == [{'id': 'project1', 'name': 'Project 1'}]
+        assert cache.get_project('project1')['datasets'] == [{'id': 'ds', 'name': 'ds'}]
+        assert cache.get_project('project2') is None
+
+        time.sleep(0.3)
+        assert cache.get_projects() is None
+        assert cache.get_project('project1') is None
+        cache.save()
+        with open(cache.file_path) as cache_file:
+            assert 'project1' not in cache_file.read().replace('"projects"', '').split('"datasets"')[1]
+
+    def test_corrupted_file(self, tmp_path):
+        cache = ListingCache(str(tmp_path), 'writer@project.iam.gserviceaccount.com')
+        with open(cache.file_path, 'w') as cache_file:
+            cache_file.write('{"projects": ')
+        assert cache.get_projects() is None
+        cache.set_projects([])
+        cache.save()
+        assert ListingCache(str(tmp_path), 'writer@project.iam.gserviceaccount.com').get_projects() == []
@@ -0,0 +1,85 @@
+import json
+import os
+from google_bigquery_writer import schema_mapper, writer
+from google_bigquery_writer.metrics import Metrics
+from test.fake_bigquery_server import FakeBigqueryServer
+
+
+class TestMetrics:
+
+    def test_registry(self, tmp_path):
+        metrics = Metrics()
+        metrics.increment('chunks_total', table='table1')
+        metrics.increment('chunks_total', 2, table='table1')
+        metrics.increment('chunks_total', table='table2')
+        metrics.observe('chunk_bytes', 1024, buckets=(1000, 2000), table='table1')
+        metrics.observe('chunk_bytes', 3000, buckets=(1000, 2000), table='table1')
+        with metrics.timer('run_seconds'):
+            pass
+        metrics.add_event('chunk', table='table1', bytes=1024)
+
+        assert metrics.get_counter('chunks_total', table='table1') == 3
+        assert metrics.get_counter('chunks_total', table='table3') == 0
+        assert metrics.get_histogram('chunk_bytes', table='table1') == {
+            'count': 2,
+            'sum': 4024,
+            'min': 1024,
+            'max': 3000
+        }
+        assert metrics.get_histogram('run_seconds')['count'] == 1
+
+        prometheus = metrics.to_prometheus()
+        assert '# TYPE bigquery_writer_chunks_total counter\n' in prometheus
+        assert 'bigquery_writer_chunks_total{table="table1"} 3\n' in prometheus
+        assert 'bigquery_writer_chunk_bytes_bucket{table="table1",le="1000"} 0\n' in prometheus
+        assert 'bigquery_writer_chunk_bytes_bucket{table="table1",le="2000"} 1\n' in prometheus
+        assert 'bigquery_writer_chunk_bytes_bucket{table="table1",le="+Inf"} 2\n' in prometheus
+        assert 'bigquery_writer_chunk_bytes_count{table="table1"} 2\n' in prometheus
+
+        summary_path = str(tmp_path / 'out' / 'files' / 'metrics.json')
+        metrics.write_summary(summary_path)
+        with open(summary_path) as summary_file:
+            summary = json.load(summary_file)
+        assert {'name': 'chunks_total', 'labels': {'table': 'table2'}, 'value': 1} in summary['counters']
+        assert summary['events'] == [{'event': 'chunk', 'table': 'table1', 'bytes': 1024}]
+
+        textfile_path = str(tmp_path / 'metrics.prom')
+        metrics.write_prometheus(textfile_path)
+        with open(textfile_path) as textfile:
+            assert textfile.read() == prometheus
+        assert not os.path.exists(textfile_path + '.tmp')
+
+    def test_writer_metrics(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(schema_mapper, 'get_csv_schema', lambda csv_file_path: ['col1', 'col2'])
+        csv_file_path = str(tmp_path / 'table.csv')
+        with open(csv_file_path, 'w') as csv_file:
+            csv_file.write('"col1","col2"\n')
+            for i in range(100000):
+                csv_file.write('"val%s","%s"\n' % (i, i))
+        input_size = os.path.getsize(csv_file_path)
+        table_definition = {
+            'dbName': 'table',
+            'chunkSize': 0.5,
+            'chunkMode': 'ranges',
+            'items': [
+                {'name': 'col1', 'dbName': 'col1', 'type': 'STRING'},
+                {'name': 'col2', 'dbName': 'col2', 'type': 'INTEGER'},
+            ]
+        }
+        metrics = Metrics()
+        with FakeBigqueryServer(job_duration=0.1) as server:
+            my_writer = writer.Writer(server.create_client(), metrics=metrics)
+            my_writer.write_table_sync(csv_file_path, 'dataset', table_definition, polling_delay=1)
+
+        assert metrics.get_counter('uploaded_bytes_total', table='table') == input_size
+        # ~1.8MB in chunks of up to 0.5MB
+        assert metrics.get_counter('chunks_total', table='table') == 4
+        assert metrics.get_counter('load_jobs_total', table='table') == 4
+        assert metrics.get_counter('job_reloads_total', table='table') >= 4
+        for timer in ('verify_project_seconds', 'obtain_dataset_seconds', 'prepare_table_seconds', 'wait_seconds'):
+            assert metrics.get_histogram(timer, table='table')['count'] == 1
+        assert metrics.get_histogram('chunk_upload_seconds', table='table')['count'] == 4
+        assert metrics.get_histogram('chunk_planning_seconds', table='table')['count'] == 5
+        events = metrics.to_dict()['events']
+        assert sum(map(lambda event: event['bytes'], events)) == input_size
+        assert all(map(lambda event: event['job_id'], events))
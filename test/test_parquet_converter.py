@@ -0,0 +1,66 @@
+import datetime
+from decimal import Decimal
+import pyarrow.parquet
+import pytest
+from google_bigquery_writer import parquet_converter, exceptions
+
+ITEMS = [
+    {'name': 'string', 'dbName': 'string', 'type': 'STRING'},
+    {'name': 'integer', 'dbName': 'integer', 'type': 'INTEGER'},
+    {'name': 'float', 'dbName': 'float', 'type': 'FLOAT'},
+    {'name': 'boolean', 'dbName': 'boolean', 'type': 'BOOLEAN'},
+    {'name': 'timestamp', 'dbName': 'timestamp', 'type': 'TIMESTAMP'}
+]
+
+
+class TestParquetConverter:
+
+    def test_convert_csv(self, data_dir, tmp_path):
+        parquet_files = list(parquet_converter.convert_csv(
+            data_dir + 'sample/in/tables/in.c-bucket.table1.csv',
+            str(tmp_path),
+            ITEMS,
+            1024 * 1024
+        ))
+
+        assert len(parquet_files) == 1
+        rows = pyarrow.parquet.read_table(parquet_files[0]).to_pylist()
+        assert rows[0] == {
+            'string': 'MyString',
+            'integer': 123456,
+            'float': 123.456,
+            'boolean': True,
+            'timestamp': datetime.datetime(2014, 8, 19, 12, 41, 35, 220000, tzinfo=datetime.timezone.utc)
+        }
+        assert rows[1] == {'string': '', 'integer': 0, 'float': 0, 'boolean': False, 'timestamp': None}
+        assert rows[2] == {'string': None, 'integer': None, 'float': None, 'boolean': None, 'timestamp': None}
+
+    def test_convert_csv_invalid_value(self, tmp_path):
+        csv_file_path = str(tmp_path / 'table.csv')
+        with open(csv_file_path, 'w') as csv_file:
+            csv_file.write('"col1","col2"\n"val1","1"\n"val2","val2"\n')
+        items = [
+            {'name': 'col1', 'dbName': 'col1', 'type': 'STRING'},
+            {'name': 'col2', 'dbName': 'col2', 'type': 'INTEGER'}
+        ]
+
+        with pytest.raises(exceptions.UserException, match='Cannot convert column col2 in rows 1-2'):
+            list(parquet_converter.convert_csv(csv_file_path, str(tmp_path), items, 1024))
+
+    def test_unsupported_type(self):
+        with pytest.raises(exceptions.UserException, match='type GEOGRAPHY is not supported'):
+            parquet_converter.get_parquet_schema([{'name': 'geo', 'dbName': 'geo', 'type': 'GEOGRAPHY'}])
+
+    @pytest.mark.parametrize('data_type, values, expected', [
+        ('TIMESTAMP', ['2020-01-01 00:00:00', '2020-01-01 01:00:00+01:00', '2020-01-01 00:00:00 UTC', '2020-1-1 0:0:0',
+                       '2020-01-01'], [datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)] * 5),
+        ('DATE', ['2020-1-5', ' 2020-01-05'], [datetime.date(2020, 1, 5)] * 2),
+        ('DATETIME', ['2020-1-5 1:02:03'], [datetime.datetime(2020, 1, 5, 1, 2, 3)]),
+        ('BOOLEAN', ['Y', 'yes', 't', 'N', 'no', 'F', ''], [True, True, True, False, False, False, None]),
+        ('NUMERIC', ['1.1234567891', '-1.1234567895'], [Decimal('1.123456789'), Decimal('-1.123456790')]),
+        ('INTEGER', [' 5', '+5 '], [5, 5]),
+    ])
+    def test_convert_accepted_forms(self, data_type, values, expected):
+        column = parquet_converter.convert_column(pyarrow.array(values), parquet_converter.PARQUET_TYPES[data_type])
+
+        assert column.to_pylist() == expected
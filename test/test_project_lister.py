@@ -0,0 +1,98 @@
+import time
+from unittest.mock import MagicMock
+from google.api_core import exceptions
+from google_bigquery_writer.listing_cache import ListingCache
+from google_bigquery_writer.project_lister import ProjectLister
+from test.fake_bigquery_server import FakeBigqueryServer
+
+
+class TestProjectLister:
+
+    def test_list(self):
+        with FakeBigqueryServer(projects=['project1', 'project2', 'project3'], forbidden_projects=['project2']) \
+                as server:
+            server.projects['project1']['dataset1'] = {'tables': {}}
+            server.projects['project1']['dataset2'] = {'tables': {}}
+            lister = ProjectLister(server.create_client())
+
+            projects = sorted(lister.iter_projects(), key=lambda project: project['id'])
+
+            assert projects[1].pop('error').endswith('Access Denied: Project project2')
+            assert projects == [
+                {'id': 'project1', 'name': 'project1', 'datasets': [
+                    {'id': 'dataset1', 'name': 'dataset1'},
+                    {'id': 'dataset2', 'name': 'dataset2'},
+                ]},
+                {'id': 'project2', 'name': 'project2', 'datasets': []},
+                {'id': 'project3', 'name': 'project3', 'datasets': []},
+            ]
+            assert not lister.incomplete
+            assert server.rpc_counts['GET list_projects'] == 1
+            assert server.rpc_counts['GET list_datasets'] == 3
+
+    def test_project_error(self):
+        def list_datasets(project_id, **kwargs):
+            if project_id == 'project2':
+                raise exceptions.NotFound('Project project2 not found')
+            return [MagicMock(dataset_id='dataset1')]
+
+        client = MagicMock()
+        client.list_projects = MagicMock(return_value=[
+            MagicMock(project_id='project1', friendly_name='project1'),
+            MagicMock(project_id='project2', friendly_name='project2'),
+        ])
+        client.list_datasets = MagicMock(side_effect=list_datasets)
+
+        projects = sorted(ProjectLister(client).iter_projects(), key=lambda project: project['id'])
+
+        assert projects == [
+            {'id': 'project1', 'name': 'project1', 'datasets': [{'id': 'dataset1', 'name': 'dataset1'}]},
+            {'id': 'project2', 'name': 'project2', 'datasets': [], 'error': 'Project project2 not found'},
+        ]
+
+    def test_time_budget(self):
+        projects = list(map(lambda index: 'project%02d' % index, range(10)))
+        with FakeBigqueryServer(projects=projects, latency=0.2) as server:
+            lister = ProjectLister(server.create_client(), max_workers=2, time_budget=1)
+
+            started = time.monotonic()
+            listed = list(lister.iter_projects())
+
+            assert time.monotonic() - started < 1.5
+            assert lister.incomplete
+            assert sorted(map(lambda project: project['id'], listed)) == projects
+            incomplete = list(filter(lambda project: project.get('incomplete'), listed))
+            # the projects are listed in 0.2s, their datasets two at a time in 0.2s each
+            assert 2 <= len(incomplete) <= 6
+            assert listed[-len(incomplete):] == incomplete
+
+    def test_cache(self, tmp_path):
+        with FakeBigqueryServer(projects=['project1', 'project2']) as server:
+            server.projects['project1']['dataset1'] = {'tables': {}}
+            cache_path = str(tmp_path / 'cache')
+            lister = ProjectLister(server.create_client(), cache=ListingCache(cache_path, 'writer'))
+            listed = list(lister.iter_projects())
+            assert server.rpc_counts['GET list_datasets'] == 2
+
+            # a new listing (e.g. the next run of the action) reads the cache only
+            lister = ProjectLister(server.create_client(), cache=ListingCache(cache_path, 'writer'))
+            assert sorted(lister.iter_projects(), key=lambda project: project['id']) == \
+                sorted(listed, key=lambda project: project['id'])
+            assert server.rpc_counts['GET list_projects'] == 1
+            assert server.rpc_counts['GET list_datasets'] == 2
+
+            server.projects['project1']['dataset2'] = {'tables': {}}
+            cache = ListingCache(cache_path, 'writer')
+            cache.invalidate('project1')
+            listed = list(ProjectLister(server.create_client(), cache=cache).iter_projects())
+            assert server.rpc_counts['GET list_datasets'] == 3
+            # cached projects come first
+            assert list(map(lambda project: project['id'], listed)) == ['project2', 'project1']
+            assert listed[1]['datasets'] == [
+                {'id': 'dataset1', 'name': 'dataset1'},
+                {'id': 'dataset2', 'name': 'dataset2'},
+            ]
+
+            # another service account doesn't share the cache
+            list(ProjectLister(server.create_client(), cache=ListingCache(cache_path, 'other')).iter_projects())
+            assert server.rpc_counts['GET list_projects'] == 2
@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+from google_bigquery_writer import schema_mapper, writer
+from google_bigquery_writer.spill import SpillManager
+from test.fake_bigquery_server import FakeBigqueryServer
+
+
+class TestSpill:
+
+    def write_file(self, path, size):
+        with open(path, 'wb') as spilled_file:
+            spilled_file.write(b'x' * size)
+        return path
+
+    def test_directory(self, tmp_path):
+        spill = SpillManager(str(tmp_path / 'spill'))
+        with spill.directory('table') as first_path, spill.directory('table') as second_path:
+            assert first_path != second_path
+            assert os.path.dirname(first_path) == str(tmp_path / 'spill')
+            spill.track(self.write_file(os.path.join(first_path, 'slice'), 100))
+            spill.track(self.write_file(os.path.join(second_path, 'slice'), 50))
+            assert spill.used == 150
+        assert not os.path.exists(first_path)
+        assert not os.path.exists(second_path)
+        assert spill.used == 0
+        assert spill.peak == 150
+
+    def test_budget_backpressure(self, tmp_path):
+        spill = SpillManager(str(tmp_path / 'spill'), budget=250)
+        with spill.directory('table') as spill_path:
+            produced = []
+
+            def produce():
+                for index in range(4):
+                    produced.append(index)
+                    yield self.write_file(os.path.join(spill_path, 'slice%s' % index), 100)
+
+            files = spill.iter_files(produce(), 100)
+            first = next(files)
+            second = next(files)
+            blocked = threading.Thread(target=lambda: produced.append(next(files)))
+            blocked.start()
+            time.sleep(0.2)
+            # the third file would exceed the budget, the producer waits
+            assert produced == [0, 1]
+            spill.remove(first)
+            blocked.join(5)
+            third = produced.pop()
+            assert produced == [0, 1, 2]
+            assert third == os.path.join(spill_path, 'slice2')
+            assert not os.path.exists(first)
+            spill.remove(second)
+            spill.remove(third)
+            for spilled_file in files:
+                assert spilled_file == os.path.join(spill_path, 'slice3')
+                spill.remove(spilled_file)
+        assert spill.used == 0
+        assert spill.peak == 200
+
+    def test_file_over_budget(self, tmp_path):
+        spill = SpillManager(str(tmp_path / 'spill'), budget=50)
+        with spill.directory('table') as spill_path:
+            files = spill.iter_files(iter([self.write_file(os.path.join(spill_path, 'slice'), 100)]), 100)
+            spilled_file = next(files)
+            assert spill.used == 100
+            spill.remove(spilled_file)
+            assert next(files, None) is None
+            assert spill.used == 0
+
+    def test_writer_slices(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(schema_mapper, 'get_csv_schema', lambda csv_file_path: ['col1', 'col2'])
+        csv_file_path = str(tmp_path / 'table.csv')
+        with open(csv_file_path, 'w') as csv_file:
+            csv_file.write('"col1","col2"\n')
+            for i in range(100000):
+                csv_file.write('"val%s","%s"\n' % (i, i))
+        input_size = os.path.getsize(csv_file_path)
+        table_definition = {
+            'dbName': 'table',
+            'chunkSize': 0.5,
+            'chunkMode': 'slices',
+            'items': [
+                {'name': 'col1', 'dbName': 'col1', 'type': 'STRING'},
+                {'name': 'col2', 'dbName': 'col2', 'type': 'INTEGER'},
+            ]
+        }
+        budget = 1024 * 1024
+        spill = SpillManager(str(tmp_path / 'spill'), budget=budget)
+        with FakeBigqueryServer(job_duration=0.1) as server:
+            my_writer = writer.Writer(server.create_client(), spill=spill)
+            my_writer.write_table_sync(csv_file_path, 'dataset', table_definition, polling_delay=1)
+
+            # slices are uploaded without the header
+            assert server.uploaded_bytes == input_size - len('"col1","col2"\n')
+            assert server.rpc_counts['POST start_upload'] == 4
+
+        # ~1.8MB in 4 slices, no more than two of them on the disk at once
+        assert budget / 2 < spill.peak <= budget + 1024
+        assert spill.used == 0
+        assert os.listdir(str(tmp_path / 'spill')) == []
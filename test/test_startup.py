@@ -0,0 +1,61 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# seconds, a loose bound catching only gross regressions on slow machines, the heavy modules are checked on their own
+STARTUP_BUDGET = float(os.environ.get('STARTUP_BUDGET', 2))
+HEAVY_MODULES = ['google.cloud.bigquery', 'google.api_core', 'google.cloud.storage', 'pyarrow', 'grpc',
+                 'cryptography', 'backoff', 'requests']
+STARTUP_SCRIPT = '''
+import json
+import sys
+import time
+
+started = time.perf_counter()
+from google_bigquery_writer.app import App
+from google_bigquery_writer.exceptions import UserException
+try:
+    App().run()
+except UserException as err:
+    message = str(err)
+print(json.dumps({
+    'seconds': time.perf_counter() - started,
+    'message': message,
+    'modules': sorted(filter(lambda module: module.split('.')[0] in ('google', 'pyarrow', 'grpc', 'cryptography',
+                                                                     'backoff', 'requests'), sys.modules)),
+}))
+'''
+
+
+class TestStartup:
+
+    def test_config_error_startup(self, tmp_path):
+        with open(str(tmp_path / 'config.json'), 'w') as config_file:
+            json.dump({
+                'action': 'run',
+                'parameters': {
+                    'service_account': {
+                        '#private_key': 'private key',
+                        'client_email': 'writer@project.iam.gserviceaccount.com',
+                        'token_uri': 'https://oauth2.googleapis.com/token',
+                        'project_id': 'project'
+                    },
+                    'tables': []
+                }
+            }, config_file)
+        env = dict(os.environ, KBC_DATADIR=str(tmp_path) + '/')
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT_PATH, env.get('PYTHONPATH')]))
+
+        # fresh interpreter, nothing is imported by the test session yet
+        process = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], cwd=ROOT_PATH, env=env, capture_output=True,
+                                 text=True, check=True)
+        result = json.loads(process.stdout)
+
+        assert result['message'] == 'Google BigQuery dataset not specified in the configuration.'
+        assert list(filter(
+            lambda module: any(map(lambda heavy: module == heavy or module.startswith(heavy + '.'), HEAVY_MODULES)),
+            result['modules']
+        )) == []
+        assert result['seconds'] < STARTUP_BUDGET
@@ -0,0 +1,111 @@
+from unittest.mock import MagicMock
+import pytest
+from google.api_core.exceptions import InvalidArgument
+from google.cloud import bigquery
+from google_bigquery_writer import schema_mapper, writer
+from google_bigquery_writer.exceptions import UserException
+from google_bigquery_writer.stream_writer import StreamWriter
+from test.fake_bigquery_write_server import FakeBigqueryWriteServer
+
+ITEMS = [
+    {'name': 'string', 'dbName': 'string', 'type': 'STRING'},
+    {'name': 'integer', 'dbName': 'integer', 'type': 'INTEGER'},
+    {'name': 'float', 'dbName': 'float', 'type': 'FLOAT'},
+    {'name': 'boolean', 'dbName': 'boolean', 'type': 'BOOLEAN'},
+    {'name': 'numeric', 'dbName': 'numeric', 'type': 'NUMERIC'},
+    {'name': 'date', 'dbName': 'date', 'type': 'DATE'},
+    {'name': 'datetime', 'dbName': 'datetime', 'type': 'DATETIME'},
+    {'name': 'timestamp', 'dbName': 'timestamp', 'type': 'TIMESTAMP'}
+]
+TABLE_PATH = 'projects/project/datasets/dataset/tables/table'
+
+
+class TestStreamWriter:
+
+    def prepare(self, tmp_path, nr_of_rows=2):
+        csv_file_path = str(tmp_path / 'table.csv')
+        with open(csv_file_path, 'w') as csv_file:
+            csv_file.write('"string","integer","float","boolean","numeric","date","datetime","timestamp"\n')
+            csv_file.write('"My\nString","123","1.5","true","12.34","2020-01-02","2020-01-02 10:00:00",'
+                           '"2020-01-02 10:00:00+01:00"\n')
+            for i in range(nr_of_rows - 1):
+                csv_file.write('"","","","","","","",""\n')
+        return csv_file_path
+
+    def test_write_typed_rows(self, tmp_path):
+        csv_file_path = self.prepare(tmp_path)
+        with FakeBigqueryWriteServer() as server:
+            stream_writer = StreamWriter(server.create_client())
+
+            nr_of_rows = stream_writer.write(
+                csv_file_path,
+                bigquery.TableReference.from_string('project.dataset.table'),
+                ITEMS
+            )
+
+            assert nr_of_rows == 2
+            assert server.tables[TABLE_PATH] == [
+                {
+                    'string': 'My\nString',
+                    'integer': 123,
+                    'float': 1.5,
+                    'boolean': True,
+                    'numeric': '12.340000000',
+                    'date': 18263,
+                    'datetime': '2020-01-02 10:00:00.000000',
+                    'timestamp': 1577955600000000
+                },
+                # empty values are nulls for all types but STRING
+                {'string': ''}
+            ]
+            assert list(server.streams.values())[0]['type'] == 2  # PENDING
+
+    def test_rows_split_into_requests(self, tmp_path):
+        csv_file_path = self.prepare(tmp_path, 1000)
+        with FakeBigqueryWriteServer() as server:
+            stream_writer = StreamWriter(server.create_client())
+            stream_writer.MAX_REQUEST_SIZE = 100
+
+            stream_writer.write(csv_file_path, bigquery.TableReference.from_string('project.dataset.table'), ITEMS)
+
+            assert len(server.tables[TABLE_PATH]) == 1000
+            assert len(server.append_requests) > 1
+            offset = 0
+            for request in server.append_requests:
+                assert request.offset == offset
+                offset += len(request.proto_rows.rows.serialized_rows)
+
+    def test_failed_append_commits_nothing(self, tmp_path):
+        csv_file_path = self.prepare(tmp_path)
+        with FakeBigqueryWriteServer() as server:
+            server.append_error = 'Invalid row'
+            stream_writer = StreamWriter(server.create_client())
+
+            with pytest.raises(InvalidArgument, match='Invalid row'):
+                stream_writer.write(csv_file_path, bigquery.TableReference.from_string('project.dataset.table'), ITEMS)
+            assert server.tables[TABLE_PATH] == []
+
+    def test_writer_stream_mode(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(schema_mapper, 'get_csv_schema', lambda csv_file_path: list(map(
+            lambda item: item['name'],
+            ITEMS
+        )))
+        csv_file_path = self.prepare(tmp_path)
+        client = MagicMock()
+        client.project = 'project'
+        client.get_dataset = MagicMock(return_value=bigquery.Dataset('project.dataset'))
+        table_definition = {'dbName': 'table', 'mode': 'stream', 'items': ITEMS}
+        with FakeBigqueryWriteServer() as server:
+            my_writer = writer.Writer(client, stream_writer=StreamWriter(server.create_client()))
+            my_writer._verified_projects['project'] = True
+
+            with pytest.raises(UserException, match='Stream mode is supported for incremental tables only'):
+                my_writer.write_table(csv_file_path, 'dataset', table_definition)
+
+            my_writer.write_table_sync(csv_file_path, 'dataset', table_definition, incremental=True)
+            assert len(server.tables[TABLE_PATH]) == 2
+            client.load_table_from_file.assert_not_called()
+
+            server.append_error = 'Invalid row'
+            with pytest.raises(UserException, match='Streaming data into table dataset.table failed: .*Invalid row'):
+                my_writer.write_table_sync(csv_file_path, 'dataset', table_definition, incremental=True)
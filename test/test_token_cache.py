@@ -0,0 +1,72 @@
+import datetime
+import os
+import stat
+from google_bigquery_writer.token_cache import TokenCache
+from google_bigquery_writer.token_refresher import TokenRefresher
+from test.test_token_refresher import FakeCredentials
+
+SCOPES = ['https://www.googleapis.com/auth/bigquery']
+
+
+class TestTokenCache:
+
+    def test_save_and_load(self, tmp_path):
+        cache = TokenCache(str(tmp_path / 'cache'), 'private key', 'writer@project.iam.gserviceaccount.com', SCOPES)
+        fake_credentials = FakeCredentials(lifetime=3600)
+        fake_credentials.refresh(None)
+        cache.save(fake_credentials)
+
+        assert os.listdir(str(tmp_path / 'cache')) == [os.path.basename(cache.file_path)]
+        assert stat.S_IMODE(os.stat(cache.file_path).st_mode) == 0o600
+        with open(cache.file_path, 'rb') as cache_file:
+            assert b'token1' not in cache_file.read()
+
+        cached_credentials = FakeCredentials(lifetime=3600)
+        assert TokenCache(str(tmp_path / 'cache'), 'private key', 'writer@project.iam.gserviceaccount.com',
+                          list(reversed(SCOPES))).load(cached_credentials)
+        assert cached_credentials.token == 'token1'
+        assert cached_credentials.expiry == fake_credentials.expiry
+
+    def test_other_account_or_scopes(self, tmp_path):
+        cache = TokenCache(str(tmp_path), 'private key', 'writer@project.iam.gserviceaccount.com', SCOPES)
+        fake_credentials = FakeCredentials(lifetime=3600)
+        fake_credentials.refresh(None)
+        cache.save(fake_credentials)
+
+        other_scopes = SCOPES + ['https://www.googleapis.com/auth/devstorage.read_write']
+        assert not TokenCache(str(tmp_path), 'private key', 'writer@project.iam.gserviceaccount.com',
+                              other_scopes).load(FakeCredentials(lifetime=3600))
+        # a file of another account (e.g. copied over) can't be decrypted
+        other_cache = TokenCache(str(tmp_path), 'other private key', 'writer@project.iam.gserviceaccount.com', SCOPES)
+        assert other_cache.file_path == cache.file_path
+        assert not other_cache.load(FakeCredentials(lifetime=3600))
+
+    def test_expired_token(self, tmp_path):
+        cache = TokenCache(str(tmp_path), 'private key', 'writer@project.iam.gserviceaccount.com', SCOPES)
+        fake_credentials = FakeCredentials(lifetime=3600)
+        fake_credentials.refresh(None)
+        fake_credentials.expiry -= datetime.timedelta(hours=2)
+        cache.save(fake_credentials)
+        assert not cache.load(FakeCredentials(lifetime=3600))
+
+    def test_refresher_reuses_cached_token(self, tmp_path):
+        cache = TokenCache(str(tmp_path), 'private key', 'writer@project.iam.gserviceaccount.com', SCOPES)
+        first_run_credentials = FakeCredentials(lifetime=3600)
+        refresher = TokenRefresher(first_run_credentials, request=object(), cache=cache)
+        refresher.start()
+        refresher.stop()
+        assert first_run_credentials.refreshes == 1
+
+        second_run_credentials = FakeCredentials(lifetime=3600)
+        refresher = TokenRefresher(second_run_credentials, request=object(), cache=cache)
+        refresher.start()
+        refresher.stop()
+        assert second_run_credentials.refreshes == 0
+        assert second_run_credentials.token == 'token1'
+
+        # a cached token due for a refresh is renewed at once
+        third_run_credentials = FakeCredentials(lifetime=7200)
+        refresher = TokenRefresher(third_run_credentials, margin=3650, request=object(), cache=cache)
+        refresher.start()
+        refresher.stop()
+        assert third_run_credentials.refreshes == 1
@@ -0,0 +1,76 @@
+import datetime
+import threading
+import pytest
+from google.auth import credentials
+from google.auth.exceptions import RefreshError
+from google_bigquery_writer.token_refresher import TokenRefresher
+
+
+class FakeCredentials(credentials.Credentials):
+    """
+    Credentials issuing tokens valid for `lifetime` seconds, failing the refreshes listed in `failures`.
+    """
+
+    def __init__(self, lifetime, failures=()):
+        super().__init__()
+        self.lifetime = lifetime
+        self.failures = set(failures)
+        self.refreshes = 0
+        self.refreshed = threading.Event()
+
+    def refresh(self, request):
+        self.refreshes += 1
+        self.refreshed.set()
+        if self.refreshes in self.failures:
+            raise RefreshError('Token endpoint unavailable')
+        self.token = 'token%s' % self.refreshes
+        self.expiry = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None) + \
+            datetime.timedelta(seconds=self.lifetime)
+
+
+class TestTokenRefresher:
+
+    def test_refresh_before_expiry(self):
+        fake_credentials = FakeCredentials(lifetime=300.5)
+        refresher = TokenRefresher(fake_credentials, margin=300, request=object())
+        refresher.start()
+        try:
+            assert fake_credentials.token == 'token1'
+            assert fake_credentials.valid
+            fake_credentials.refreshed.clear()
+            # renewed half a second later, while the token is still valid
+            assert fake_credentials.refreshed.wait(5)
+        finally:
+            refresher.stop()
+        assert fake_credentials.refreshes >= 2
+        assert refresher.refreshes == fake_credentials.refreshes
+        assert fake_credentials.valid
+
+    def test_no_refresh_of_long_lived_token(self):
+        fake_credentials = FakeCredentials(lifetime=3600)
+        refresher = TokenRefresher(fake_credentials, margin=300, request=object())
+        refresher.start()
+        assert 3000 < refresher.get_seconds_to_refresh() <= 3300
+        refresher.stop()
+        assert fake_credentials.refreshes == 1
+
+    def test_retry_failed_refresh(self):
+        fake_credentials = FakeCredentials(lifetime=300.2, failures=[2])
+        refresher = TokenRefresher(fake_credentials, margin=300, request=object())
+        refresher.RETRY_DELAY = 0.1
+        refresher.start()
+        try:
+            for _ in range(50):
+                if fake_credentials.refreshes >= 3:
+                    break
+                fake_credentials.refreshed.clear()
+                fake_credentials.refreshed.wait(5)
+        finally:
+            refresher.stop()
+        assert fake_credentials.refreshes >= 3
+        assert fake_credentials.token != 'token1'
+
+    def test_rejected_credentials(self):
+        refresher = TokenRefresher(FakeCredentials(lifetime=3600, failures=[1]), request=object())
+        with pytest.raises(RefreshError):
+            refresher.start()
@@ -0,0 +1,89 @@
+import pyarrow
+import pytest
+from google_bigquery_writer import exceptions
+from google_bigquery_writer.type_validator import CsvTypeValidator, find_invalid_index
+
+ITEMS = [
+    {'name': 'string', 'dbName': 'string', 'type': 'STRING'},
+    {'name': 'integer', 'dbName': 'integer', 'type': 'INTEGER'},
+    {'name': 'float', 'dbName': 'float', 'type': 'FLOAT'},
+    {'name': 'boolean', 'dbName': 'boolean', 'type': 'BOOLEAN'},
+    {'name': 'timestamp', 'dbName': 'timestamp', 'type': 'TIMESTAMP'}
+]
+
+
+def write_csv(csv_file_path: str, nr_of_rows: int, invalid_rows: dict) -> None:
+    with open(csv_file_path, 'w') as csv_file:
+        csv_file.write('"id","amount","active","day"\n')
+        for row in range(1, nr_of_rows + 1):
+            csv_file.write(invalid_rows.get(row, '"%s","%s.5","%s","2024-01-%02d"' % (
+                row,
+                row,
+                ('yes', 'N', 'true', '0', '')[row % 5],
+                row % 28 + 1
+            )) + '\n')
+
+
+class TestTypeValidator:
+
+    def test_validate_csv(self, data_dir):
+        validator = CsvTypeValidator(data_dir + 'sample/in/tables/in.c-bucket.table1.csv', ITEMS, 2)
+
+        assert validator.validate() == 3
+
+    def test_validate_ranges(self, tmp_path):
+        csv_file_path = str(tmp_path / 'table.csv')
+        write_csv(csv_file_path, 1000, {})
+        items = [
+            {'name': 'id', 'dbName': 'id', 'type': 'INTEGER'},
+            {'name': 'amount', 'dbName': 'amount', 'type': 'NUMERIC'},
+            {'name': 'active', 'dbName': 'active', 'type': 'BOOLEAN'},
+            {'name': 'day', 'dbName': 'day', 'type': 'DATE'}
+        ]
+
+        assert CsvTypeValidator(csv_file_path, items, 4, range_size=1024, block_size=256).validate() == 1000
+
+    @pytest.mark.parametrize('invalid_row, message', [
+        ('"702","702.5","maybe","2024-01-01"', 'Column active has invalid BOOLEAN value "maybe" in row 702'),
+        ('"702","702.5","yes","2024-02-30"', 'Column day has invalid DATE value "2024-02-30" in row 702'),
+        ('"7o2","702.5","yes","2024-01-01"', 'Column id has invalid INTEGER value "7o2" in row 702'),
+    ])
+    def test_invalid_value(self, tmp_path, invalid_row, message):
+        csv_file_path = str(tmp_path / 'table.csv')
+        # the later invalid value is in another range, the first one is reported
+        write_csv(csv_file_path, 1000, {702: invalid_row, 950: '"950","x","x","x"'})
+        items = [
+            {'name': 'id', 'dbName': 'id', 'type': 'INTEGER'},
+            {'name': 'amount', 'dbName': 'amount', 'type': 'FLOAT'},
+            {'name': 'active', 'dbName': 'active', 'type': 'BOOLEAN'},
+            {'name': 'day', 'dbName': 'day', 'type': 'DATE'}
+        ]
+
+        with pytest.raises(exceptions.UserException, match=message + ' of file table.csv'):
+            CsvTypeValidator(csv_file_path, items, 4, range_size=1024, block_size=256).validate()
+
+    @pytest.mark.parametrize('data_type, values', [
+        ('TIMESTAMP', ['2020-01-01 00:00:00 UTC', '2020-01-01T00:00:00Z', '2020-1-5 1:2:3.123456 +01:00',
+                       '2020-01-01 00:00:00 Europe/Prague']),
+        ('TIMESTAMP', ['2020-01-01 00:00:00', '2020-01-01 00:00:00+00:00']),
+        ('DATE', ['2020-1-5', ' 2020-01-05 ']),
+        ('DATETIME', ['2020-1-5 1:02', '2020-01-05T01:02:03.5']),
+        ('NUMERIC', ['1.1234567891', '-.5', '+5', '1e3']),
+        ('INTEGER', [' 5', '+5', '-9223372036854775808']),
+        ('FLOAT', ['-Infinity', 'NaN', '1.5e-3', '.5']),
+        ('BOOLEAN', ['Y', 'yes', 't', 'FALSE', '0']),
+    ])
+    def test_accepted_forms(self, data_type, values):
+        assert find_invalid_index(pyarrow.array(values + ['', None]), data_type) is None
+
+    @pytest.mark.parametrize('data_type, values, index', [
+        ('TIMESTAMP', ['2020-01-01 00:00:00', '2020-01-01 00:00:00+00:00', '2020-01-01 00:00:00 X'], 2),
+        ('DATE', ['2020-02-28', '2020-02-30', 'x'], 1),
+        ('DATE', ['2020-02-28', 'x', '2020-02-30'], 1),
+        ('INTEGER', ['1', '1.5', '9223372036854775808'], 1),
+        ('INTEGER', ['1', '9223372036854775808', '1.5'], 1),
+        ('NUMERIC', ['1', '1' * 30], 1),
+        ('FLOAT', ['1', '1,5'], 1),
+    ])
+    def test_find_invalid_index(self, data_type, values, index):
+        assert find_invalid_index(pyarrow.array(values), data_type) == index
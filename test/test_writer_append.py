@@ -0,0 +1,77 @@
+import os
+from google_bigquery_writer.loaded_prefix import LoadedPrefix
+from google_bigquery_writer.state import State
+from test import fixtures
+
+
+class TestWriterAppend:
+
+    def write_rows(self, csv_file_path, rows, mode='a'):
+        with open(csv_file_path, mode) as csv_file:
+            if mode == 'w':
+                csv_file.write('"col1","col2"\n')
+            for i in rows:
+                csv_file.write('"val%s","%s"\n' % (i, i))
+
+    def get_table_definition(self):
+        return fixtures.get_table_definition(appendOnly=True)
+
+    def load(self, csv_file_path, data_dir):
+        my_writer = fixtures.get_writer(state=State(data_dir))
+        my_writer.write_table_sync(csv_file_path, 'dataset', self.get_table_definition(), True)
+        # the next run reads the state written by this one
+        (data_dir / 'in').mkdir(exist_ok=True)
+        (data_dir / 'out' / 'state.json').replace(data_dir / 'in' / 'state.json')
+        return my_writer
+
+    def test_load_appended_tail(self, tmp_path, monkeypatch):
+        fixtures.mock_csv_schema(monkeypatch)
+        csv_file_path = str(tmp_path / 'table.csv')
+        self.write_rows(csv_file_path, range(1000), 'w')
+        loaded_size = (tmp_path / 'table.csv').stat().st_size
+        first_writer = self.load(csv_file_path, tmp_path)
+        assert first_writer.metrics.get_counter('uploaded_bytes_total', table='table') == loaded_size
+
+        self.write_rows(csv_file_path, range(1000, 1100))
+        input_size = (tmp_path / 'table.csv').stat().st_size
+        second_writer = self.load(csv_file_path, tmp_path)
+
+        assert second_writer.metrics.get_counter('uploaded_bytes_total', table='table') == input_size - loaded_size
+        assert second_writer.metrics.get_counter('skipped_bytes_total', table='table') == loaded_size
+        load_call = second_writer.bigquery_client.load_table_from_file.call_args
+        assert load_call.kwargs['job_config'].skip_leading_rows == 0
+        appended_rows = b''.join(map(lambda i: b'"val%d","%d"\n' % (i, i), range(1000, 1100)))
+        assert second_writer.bigquery_client.loaded_data == [appended_rows]
+
+        # nothing appended, nothing loaded
+        third_writer = self.load(csv_file_path, tmp_path)
+        third_writer.bigquery_client.load_table_from_file.assert_not_called()
+        assert State(str(tmp_path)).get('loadedPrefix')['dataset.table']['size'] == input_size
+
+    def test_load_all_when_prefix_changed(self, tmp_path, monkeypatch):
+        fixtures.mock_csv_schema(monkeypatch)
+        csv_file_path = str(tmp_path / 'table.csv')
+        self.write_rows(csv_file_path, range(1000), 'w')
+        self.load(csv_file_path, tmp_path)
+
+        self.write_rows(csv_file_path, range(1, 1100), 'w')
+        my_writer = self.load(csv_file_path, tmp_path)
+
+        assert my_writer.metrics.get_counter('uploaded_bytes_total', table='table') == \
+            (tmp_path / 'table.csv').stat().st_size
+        assert my_writer.bigquery_client.load_table_from_file.call_args.kwargs['job_config'].skip_leading_rows == 1
+
+    def test_tail_without_new_line(self, tmp_path):
+        csv_file_path = str(tmp_path / 'table.csv')
+        with open(csv_file_path, 'w') as csv_file:
+            csv_file.write('"col1","col2"\n"val1","1"')
+        loaded_prefix = LoadedPrefix(State(str(tmp_path)), 'dataset.table')
+        tail_start, content_hash = loaded_prefix.find_tail(csv_file_path)
+        assert tail_start is None
+        loaded_prefix.save(os.path.getsize(csv_file_path), content_hash)
+
+        with open(csv_file_path, 'a') as csv_file:
+            csv_file.write('\n"val2","2"\n')
+
+        # the last loaded row continues in the appended data
+        assert loaded_prefix.find_tail(csv_file_path)[0] is None
@@ -0,0 +1,76 @@
+import gzip
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+import pytest
+from google_bigquery_writer import compression, writer
+from test import fixtures
+
+
+class ThreadCompressor(ThreadPoolExecutor):
+    """
+    Compresses in threads of the test process, so the compression can be patched.
+    """
+
+    def __init__(self, max_workers, mp_context=None):
+        super(ThreadCompressor, self).__init__(max_workers)
+
+
+class TestWriterCompression:
+
+    def prepare(self, tmp_path, monkeypatch):
+        fixtures.mock_csv_schema(monkeypatch)
+        return fixtures.write_csv(str(tmp_path / 'table.csv'), 5000)
+
+    def get_table_definition(self):
+        return fixtures.get_table_definition(chunkSize=0.02, chunkMode='ranges', compression='gzip')
+
+    def get_writer(self, load_table_from_file):
+        client = fixtures.get_client()
+        client.load_table_from_file = MagicMock(side_effect=load_table_from_file)
+        return fixtures.get_writer(client)
+
+    def test_compressed_chunks_loaded(self, tmp_path, monkeypatch):
+        csv_file_path = self.prepare(tmp_path, monkeypatch)
+        loaded = []
+
+        def load_table_from_file(readable, table_reference, job_config):
+            loaded.append((gzip.decompress(readable.read()), job_config.skip_leading_rows))
+            return fixtures.get_job()
+
+        my_writer = self.get_writer(load_table_from_file)
+
+        my_writer.write_table_sync(csv_file_path, 'dataset', self.get_table_definition(), True)
+
+        assert len(loaded) > 1
+        with open(csv_file_path, 'rb') as csv_file:
+            assert sorted(b''.join(map(lambda load: load[0], loaded)).splitlines()) == \
+                sorted(csv_file.read().splitlines())
+        # only the chunk starting with the header skips it
+        assert sorted(map(lambda load: load[1], loaded)) == [0] * (len(loaded) - 1) + [1]
+        assert my_writer.metrics.get_counter('compressed_bytes_total', table='table') > 0
+
+    @pytest.mark.parametrize('failure', ['compression', 'upload'])
+    def test_failure_cancels_submitted_jobs(self, tmp_path, monkeypatch, failure):
+        csv_file_path = self.prepare(tmp_path, monkeypatch)
+        compress_chunk = compression.compress_chunk
+        jobs = []
+
+        def failing_compress_chunk(source_path, target_path, byte_range=None):
+            if failure == 'compression' and target_path.endswith('.0002.csv.gz'):
+                raise MemoryError()
+            return compress_chunk(source_path, target_path, byte_range)
+
+        def load_table_from_file(readable, table_reference, job_config):
+            if failure == 'upload' and len(jobs) == 2:
+                raise KeyError('upload')
+            jobs.append(fixtures.get_job())
+            return jobs[-1]
+
+        monkeypatch.setattr(writer, 'ProcessPoolExecutor', ThreadCompressor)
+        monkeypatch.setattr(compression, 'compress_chunk', failing_compress_chunk)
+        my_writer = self.get_writer(load_table_from_file)
+
+        with pytest.raises((MemoryError, KeyError)):
+            my_writer.write_table_sync(csv_file_path, 'dataset', self.get_table_definition(), True)
+        assert jobs != []
+        assert all(map(lambda job: job.cancel.called, jobs))
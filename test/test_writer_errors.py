@@ -99,6 +99,22 @@ class TestWriterErrors(GoogleBigQueryWriterTest):
         except exceptions.UserException as err:
             assert 'column_index: 1 column_name: "col2" column_type: INT64 value: "val2"' in str(err)
 
+    def test_write_table_validate_types_error(self, data_dir):
+        my_writer = writer.Writer(self.get_client())
+        table_definition = dict(fixtures.get_table_configuration(), validateTypes=True)
+        try:
+            my_writer.write_table_sync(
+                data_dir + 'simple_csv_invalid_data_types/in/tables/table.csv',
+                os.environ.get('BIGQUERY_DATASET'),
+                table_definition
+            )
+            pytest.fail('Must raise exception.')
+        except exceptions.UserException as err:
+            assert str(err) == 'Column col2 has invalid INTEGER value "val1" in row 1 of file table.csv.'
+        # the validation runs before any request
+        assert my_writer.metrics.get_counter('uploaded_bytes_total', table=table_definition['dbName']) == 0
+        assert my_writer.metrics.get_histogram('obtain_dataset_seconds', table=table_definition['dbName']) is None
+
     def test_create_dataset_invalid_name(self, data_dir):
         my_writer = writer.Writer(self.get_client())
         try:
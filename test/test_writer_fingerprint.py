@@ -0,0 +1,88 @@
+from unittest.mock import MagicMock
+import pytest
+from google.cloud import exceptions as bq_exceptions
+from google_bigquery_writer import exceptions
+from google_bigquery_writer.state import State
+from test import fixtures
+
+
+class TestWriterFingerprint:
+
+    def prepare(self, tmp_path, monkeypatch):
+        fixtures.mock_csv_schema(monkeypatch)
+        return fixtures.write_csv(str(tmp_path / 'table.csv'), 2)
+
+    def get_table_definition(self, **options):
+        return dict(fixtures.get_table_definition(chunkSize=100), **options)
+
+    def get_writer(self, state, error_result=None):
+        client = fixtures.get_client()
+        if error_result is not None:
+            client.load_table_from_file = MagicMock(
+                side_effect=lambda *args, **kwargs: fixtures.get_job(error_result=error_result)
+            )
+        client.query = MagicMock(side_effect=lambda *args, **kwargs: fixtures.get_job())
+        return fixtures.get_writer(client, state=state)
+
+    def load(self, my_writer, csv_file_path, table_definition, incremental=False, skip_unchanged=True):
+        my_writer.write_table_sync(csv_file_path, 'dataset', table_definition, incremental,
+                                   skip_unchanged=skip_unchanged)
+        return my_writer.bigquery_client.load_table_from_file.call_count
+
+    def test_skip_unchanged_table(self, tmp_path, monkeypatch):
+        csv_file_path = self.prepare(tmp_path, monkeypatch)
+        my_writer = self.get_writer(State(str(tmp_path)))
+        assert self.load(my_writer, csv_file_path, self.get_table_definition()) == 1
+
+        # loading options are not part of the fingerprint
+        assert self.load(my_writer, csv_file_path, self.get_table_definition(chunkSize=10)) == 1
+        assert my_writer.metrics.get_counter('tables_skipped_total', table='table') == 1
+        assert my_writer.bigquery_client.delete_table.call_count == 1
+
+        assert self.load(my_writer, csv_file_path, self.get_table_definition(clustering=True,
+                                                                             clustering_columns=['col1'])) == 2
+
+        with open(csv_file_path, 'a') as csv_file:
+            csv_file.write('"val3","3"\n')
+        assert self.load(my_writer, csv_file_path, self.get_table_definition(clustering=True,
+                                                                             clustering_columns=['col1'])) == 3
+
+    def test_load_removed_table(self, tmp_path, monkeypatch):
+        csv_file_path = self.prepare(tmp_path, monkeypatch)
+        my_writer = self.get_writer(State(str(tmp_path)))
+        self.load(my_writer, csv_file_path, self.get_table_definition())
+
+        my_writer.bigquery_client.get_table = MagicMock(side_effect=bq_exceptions.NotFound('table'))
+
+        assert self.load(my_writer, csv_file_path, self.get_table_definition()) == 2
+
+    @pytest.mark.parametrize('incremental, skip_unchanged, options', [
+        (False, False, {}),
+        (True, True, {}),
+        (True, False, {}),
+        (True, True, {'primaryKey': ['col1']}),
+    ])
+    def test_load_between_skipped_runs(self, tmp_path, monkeypatch, incremental, skip_unchanged, options):
+        csv_file_path = self.prepare(tmp_path, monkeypatch)
+        my_writer = self.get_writer(State(str(tmp_path)))
+        assert self.load(my_writer, csv_file_path, self.get_table_definition()) == 1
+
+        # another input written into the table by a run not recording its fingerprint
+        other_csv_file_path = str(tmp_path / 'other.csv')
+        with open(other_csv_file_path, 'w') as csv_file:
+            csv_file.write('"col1","col2"\n"val3","3"\n')
+        self.load(my_writer, other_csv_file_path, self.get_table_definition(**options), incremental, skip_unchanged)
+        assert self.load(my_writer, csv_file_path, self.get_table_definition()) == 3
+
+    def test_failed_load_removes_fingerprint(self, tmp_path, monkeypatch):
+        csv_file_path = self.prepare(tmp_path, monkeypatch)
+        state = State(str(tmp_path))
+        self.load(self.get_writer(state), csv_file_path, self.get_table_definition())
+        assert list(state.get('tableFingerprints').keys()) == ['dataset.table']
+
+        # the table was replaced by the failed load, the next run loads it again
+        with open(csv_file_path, 'a') as csv_file:
+            csv_file.write('"val3","3"\n')
+        with pytest.raises(exceptions.UserException, match='Loading data into table dataset.table failed'):
+            self.load(self.get_writer(state, {'reason': 'invalid'}), csv_file_path, self.get_table_definition())
+        assert state.get('tableFingerprints') == {}
@@ -0,0 +1,126 @@
+import datetime
+from unittest.mock import MagicMock
+import pytest
+from google.cloud import bigquery
+from google_bigquery_writer import exceptions, merge_query
+from google_bigquery_writer.state import State
+from test import fixtures
+
+
+class TestWriterMerge:
+
+    def prepare(self, tmp_path, monkeypatch):
+        fixtures.mock_csv_schema(monkeypatch)
+        return fixtures.write_csv(str(tmp_path / 'table.csv'), 2)
+
+    def get_table_definition(self, primary_key):
+        return fixtures.get_table_definition(primaryKey=primary_key, partitioning='time', partitioning_column='col2')
+
+    def get_client(self, query_job):
+        client = fixtures.get_client()
+        client.query = MagicMock(return_value=query_job)
+        return client
+
+    def test_merge_query(self):
+        query = merge_query.get_merge_query(
+            bigquery.TableReference.from_string('project.dataset.table__merge_staging'),
+            bigquery.TableReference.from_string('project.dataset.table'),
+            [
+                {'name': 'id', 'dbName': 'id', 'type': 'INTEGER'},
+                {'name': 'name', 'dbName': 'name', 'type': 'STRING'},
+                {'name': 'amount', 'dbName': 'amount', 'type': 'INTEGER'},
+            ],
+            ['id']
+        )
+
+        assert query == 'MERGE `project.dataset.table` AS target\n' \
+                        'USING (\n' \
+                        '  SELECT * FROM `project.dataset.table__merge_staging`\n' \
+                        '  WHERE TRUE\n' \
+                        '  QUALIFY IF(COUNT(*) OVER (PARTITION BY `id`) > 1, ERROR(CONCAT(\n' \
+                        '    \'Primary key \', TO_JSON_STRING(STRUCT(`id`)), \' is not unique in the loaded data\'\n' \
+                        '  )), TRUE)\n' \
+                        ') AS source\n' \
+                        'ON target.`id` IS NOT DISTINCT FROM source.`id`\n' \
+                        'WHEN MATCHED AND (target.`name` IS DISTINCT FROM source.`name` ' \
+                        'OR target.`amount` IS DISTINCT FROM source.`amount`) THEN\n' \
+                        '  UPDATE SET `name` = source.`name`, `amount` = source.`amount`\n' \
+                        'WHEN NOT MATCHED THEN\n' \
+                        '  INSERT (`id`, `name`, `amount`) VALUES (source.`id`, source.`name`, source.`amount`)'
+
+    def test_merge_through_staging_table(self, tmp_path, monkeypatch):
+        csv_file_path = self.prepare(tmp_path, monkeypatch)
+        query_job = fixtures.get_job()
+        query_job.dml_stats.inserted_row_count = 1
+        query_job.dml_stats.updated_row_count = 1
+        client = self.get_client(query_job)
+        my_writer = fixtures.get_writer(client)
+
+        my_writer.write_table_sync(csv_file_path, 'dataset', self.get_table_definition('col1'), True)
+
+        # the table itself is only checked, the data is loaded into the staging table
+        client.create_table.assert_not_called()
+        load_call = client.load_table_from_file.call_args
+        assert load_call.args[1].table_id == 'table__merge_staging'
+        job_config = load_call.kwargs['job_config']
+        assert job_config.write_disposition == bigquery.WriteDisposition.WRITE_TRUNCATE
+        assert job_config.time_partitioning is None
+        assert 'MERGE `project.dataset.table` AS target' in client.query.call_args.args[0]
+        client.delete_table.assert_called_once()
+        assert client.delete_table.call_args.args[0].table_id == 'table__merge_staging'
+        assert my_writer.metrics.get_counter('merged_rows_total', table='table', operation='insert') == 1
+        assert my_writer.metrics.get_counter('merged_rows_total', table='table', operation='update') == 1
+
+    def test_merge_error_removes_staging_table(self, tmp_path, monkeypatch):
+        csv_file_path = self.prepare(tmp_path, monkeypatch)
+        query_job = fixtures.get_job(errors=[{'message': 'UPDATE/MERGE must match at most one source row'}])
+        client = self.get_client(query_job)
+        my_writer = fixtures.get_writer(client)
+
+        with pytest.raises(exceptions.UserException, match='Merging data into table dataset.table failed'):
+            my_writer.write_table_sync(csv_file_path, 'dataset', self.get_table_definition(['col1']), True)
+        assert client.delete_table.call_args.args[0].table_id == 'table__merge_staging'
+
+    def test_unknown_primary_key_column(self, tmp_path, monkeypatch):
+        csv_file_path = self.prepare(tmp_path, monkeypatch)
+        client = self.get_client(fixtures.get_job())
+        my_writer = fixtures.get_writer(client)
+
+        with pytest.raises(exceptions.UserException, match='Primary key columns code of table table'):
+            my_writer.write_table_sync(csv_file_path, 'dataset', self.get_table_definition(['col1', 'code']), True)
+        client.load_table_from_file.assert_not_called()
+
+    @pytest.mark.parametrize('resumable', [False, True])
+    def test_failed_staging_load(self, tmp_path, monkeypatch, resumable):
+        csv_file_path = self.prepare(tmp_path, monkeypatch)
+        client = self.get_client(fixtures.get_job())
+        client.load_table_from_file = MagicMock(
+            side_effect=lambda *args, **kwargs: fixtures.get_job(errors=[{'reason': 'x'}])
+        )
+        my_writer = fixtures.get_writer(client, state=State(str(tmp_path)) if resumable else None)
+
+        with pytest.raises(exceptions.UserException, match='Loading data into table dataset.table__merge_staging'):
+            my_writer.write_table_sync(csv_file_path, 'dataset', self.get_table_definition(['col1']), True)
+        client.query.assert_not_called()
+        # the staging table is kept only for the next run resuming its load, and expires when there is none
+        if resumable:
+            client.delete_table.assert_not_called()
+            table, fields = client.update_table.call_args.args
+            assert table.table_id == 'table__merge_staging'
+            assert fields == ['expires']
+            assert table.expires > datetime.datetime.now(datetime.timezone.utc)
+        else:
+            assert client.delete_table.call_args.args[0].table_id == 'table__merge_staging'
+            client.update_table.assert_not_called()
+
+    def test_staging_table_without_loaded_chunks_removed(self, tmp_path, monkeypatch):
+        csv_file_path = self.prepare(tmp_path, monkeypatch)
+        client = self.get_client(fixtures.get_job())
+        client.load_table_from_file = MagicMock(side_effect=exceptions.UserException('Cannot load'))
+        my_writer = fixtures.get_writer(client, state=State(str(tmp_path)))
+
+        with pytest.raises(exceptions.UserException, match='Cannot load'):
+            my_writer.write_table_sync(csv_file_path, 'dataset', self.get_table_definition(['col1']), True)
+        # nothing to resume, the state doesn't keep the staging table
+        assert client.delete_table.call_args.args[0].table_id == 'table__merge_staging'
+        client.update_table.assert_not_called()
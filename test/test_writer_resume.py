@@ -0,0 +1,108 @@
+import os
+from unittest.mock import MagicMock
+import pytest
+from google.api_core import exceptions
+from google_bigquery_writer import csv_splitter
+from google_bigquery_writer.load_progress import LoadProgress, get_content_hash
+from google_bigquery_writer.state import State
+from test import fixtures
+
+
+class TestWriterResume:
+
+    def prepare(self, tmp_path):
+        csv_file_path = fixtures.write_csv(str(tmp_path / 'table.csv'), 1000, multiline=True)
+        state = State(str(tmp_path))
+        return csv_file_path, state
+
+    def test_resume_skips_loaded_chunks(self, tmp_path):
+        csv_file_path, state = self.prepare(tmp_path)
+        byte_ranges = csv_splitter.find_record_ranges(csv_file_path, 4)
+        progress = LoadProgress(state, 'dataset.table')
+        progress.start(os.path.getsize(csv_file_path))
+        for index, byte_range in enumerate(byte_ranges[:3]):
+            progress.add_chunk(byte_range, get_content_hash(csv_file_path, byte_range), 'job-%s' % index)
+
+        jobs = {
+            'job-0': fixtures.get_job(),
+            'job-1': fixtures.get_job(error_result={'reason': 'invalid'}),
+            'job-2': fixtures.get_job(state='RUNNING'),
+        }
+        client = fixtures.get_client()
+        client.get_job = MagicMock(side_effect=lambda job_id, timeout: jobs[job_id])
+        # state persisted by the interrupted run is the input state of the next one
+        os.makedirs(str(tmp_path / 'in'))
+        os.replace(str(tmp_path / 'out' / 'state.json'), str(tmp_path / 'in' / 'state.json'))
+        my_writer = fixtures.get_writer(client, state=State(str(tmp_path)))
+        resumed_progress = LoadProgress(my_writer.state, 'dataset.table')
+
+        resumed_jobs = my_writer._get_resumed_jobs(resumed_progress, csv_file_path)
+
+        assert resumed_jobs == {byte_ranges[0]: jobs['job-0'], byte_ranges[2]: jobs['job-2']}
+        assert list(map(lambda chunk: chunk['jobId'], resumed_progress.get_chunks())) == ['job-0', 'job-2']
+
+        chunks = list(my_writer._iter_resumed_chunks(csv_file_path, resumed_jobs.keys(), 1000, {'dbName': 'table'}))
+        assert list(map(lambda chunk: chunk.byte_range, chunks)) == [byte_ranges[1], byte_ranges[3]]
+        assert all(map(lambda chunk: chunk.skip == 0, chunks))
+
+    def test_resumed_chunks_after_tail_start(self, tmp_path):
+        csv_file_path, state = self.prepare(tmp_path)
+        byte_ranges = csv_splitter.find_record_ranges(csv_file_path, 4)
+        my_writer = fixtures.get_writer(state=state)
+        tail_start = byte_ranges[2][0]
+
+        # chunks loaded before the tail don't move the upload back below its start
+        chunks = list(my_writer._iter_resumed_chunks(csv_file_path, byte_ranges[:1] + byte_ranges[3:], 1000,
+                                                     {'dbName': 'table'}, tail_start))
+
+        assert list(map(lambda chunk: chunk.byte_range, chunks)) == [byte_ranges[2]]
+
+    def test_changed_input_starts_new_load(self, tmp_path):
+        csv_file_path, state = self.prepare(tmp_path)
+        progress = LoadProgress(state, 'dataset.table')
+        progress.start(os.path.getsize(csv_file_path) - 1)
+        progress.add_chunk((0, 10), 'hash', 'job-0')
+        client = fixtures.get_client()
+        my_writer = fixtures.get_writer(client, state=state)
+
+        assert my_writer._get_resumed_jobs(progress, csv_file_path) == {}
+        assert progress.get() == {'inputSize': os.path.getsize(csv_file_path), 'chunks': []}
+        client.get_job.assert_not_called()
+
+        progress.complete()
+        assert progress.get() is None
+
+    @pytest.mark.parametrize('change', ['content', 'missing job'])
+    def test_unresumable_loaded_chunk_starts_new_load(self, tmp_path, monkeypatch, change):
+        csv_file_path, state = self.prepare(tmp_path)
+        fixtures.mock_csv_schema(monkeypatch)
+        byte_ranges = csv_splitter.find_record_ranges(csv_file_path, 4)
+        progress = LoadProgress(state, 'dataset.table')
+        progress.start(os.path.getsize(csv_file_path))
+        for index, byte_range in enumerate(byte_ranges[:3]):
+            progress.add_chunk(byte_range, get_content_hash(csv_file_path, byte_range), 'job-%s' % index)
+        if change == 'content':
+            # same size, a row of the second chunk changed
+            with open(csv_file_path, 'r+b') as csv_file:
+                csv_file.seek(byte_ranges[1][0] + 1)
+                csv_file.write(b'VAL')
+        jobs = {'job-0': fixtures.get_job(), 'job-1': fixtures.get_job(), 'job-2': fixtures.get_job(state='RUNNING')}
+
+        def get_job(job_id, timeout):
+            if change == 'missing job' and job_id == 'job-1':
+                raise exceptions.NotFound('job-1')
+            return jobs[job_id]
+
+        client = fixtures.get_client()
+        client.get_job = MagicMock(side_effect=get_job)
+        my_writer = fixtures.get_writer(client, state=state)
+
+        my_writer.write_table_sync(csv_file_path, 'dataset', fixtures.get_table_definition())
+
+        # the rows of the loaded chunks are removed with the table, the whole input is loaded again
+        client.delete_table.assert_called_once()
+        client.create_table.assert_called_once()
+        with open(csv_file_path, 'rb') as csv_file:
+            assert b''.join(client.loaded_data) == csv_file.read()
+        assert jobs['job-0'].cancel.called is False
+        assert jobs['job-2'].cancel.called
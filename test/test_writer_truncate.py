@@ -0,0 +1,77 @@
+from unittest.mock import MagicMock
+import pytest
+from google.cloud import bigquery
+from google_bigquery_writer import writer
+from test import fixtures
+
+
+class TestWriterTruncate:
+
+    def prepare(self, tmp_path, monkeypatch, nr_of_rows=100000):
+        fixtures.mock_csv_schema(monkeypatch)
+        return fixtures.write_csv(str(tmp_path / 'table.csv'), nr_of_rows)
+
+    def get_table_definition(self, full_load_mode='truncate'):
+        return fixtures.get_table_definition(chunkSize=0.5, fullLoadMode=full_load_mode, chunkMode='ranges')
+
+    def test_truncate_first_chunk_then_append(self, tmp_path, monkeypatch):
+        csv_file_path = self.prepare(tmp_path, monkeypatch)
+        client = fixtures.get_client()
+        my_writer = fixtures.get_writer(client)
+
+        jobs = my_writer.write_table(csv_file_path, 'dataset', self.get_table_definition())
+
+        assert len(jobs) > 1
+        client.delete_table.assert_not_called()
+        client.create_table.assert_not_called()
+        job_configs = list(map(lambda call: call.kwargs['job_config'], client.load_table_from_file.call_args_list))
+        assert job_configs[0].write_disposition == bigquery.WriteDisposition.WRITE_TRUNCATE
+        assert job_configs[0].create_disposition == bigquery.CreateDisposition.CREATE_IF_NEEDED
+        assert list(map(lambda field: field.name, job_configs[0].schema)) == ['col1', 'col2']
+        # appended chunks keep the default disposition
+        assert all(map(lambda job_config: job_config.write_disposition is None, job_configs[1:]))
+
+    def test_failed_truncate_job_stops_load(self, tmp_path, monkeypatch):
+        csv_file_path = self.prepare(tmp_path, monkeypatch)
+        client = fixtures.get_client()
+        client.load_table_from_file = MagicMock(
+            return_value=fixtures.get_job(error_result={'message': 'invalid schema'})
+        )
+        my_writer = fixtures.get_writer(client)
+
+        with pytest.raises(writer.UserException, match='invalid schema'):
+            my_writer.write_table(csv_file_path, 'dataset', self.get_table_definition())
+        assert client.load_table_from_file.call_count == 1
+
+    def test_truncate_job_timeout(self, tmp_path, monkeypatch):
+        csv_file_path = self.prepare(tmp_path, monkeypatch)
+        client = fixtures.get_client()
+        job = fixtures.get_job(state='RUNNING')
+        client.load_table_from_file = MagicMock(return_value=job)
+        my_writer = fixtures.get_writer(client)
+
+        with pytest.raises(writer.UserException, match='didn\'t finish in 1 seconds'):
+            my_writer.write_table_sync(csv_file_path, 'dataset', self.get_table_definition(), polling_max_retries=1,
+                                       polling_delay=1)
+        assert client.load_table_from_file.call_count == 1
+        job.cancel.assert_called()
+
+    def test_changed_partitioning_recreates_table(self, tmp_path, monkeypatch):
+        csv_file_path = self.prepare(tmp_path, monkeypatch)
+        table = bigquery.Table('project.dataset.table')
+        table.time_partitioning = bigquery.TimePartitioning(field='col2')
+        client = fixtures.get_client(table)
+        my_writer = fixtures.get_writer(client)
+
+        my_writer.write_table(csv_file_path, 'dataset', self.get_table_definition())
+
+        client.delete_table.assert_called_once()
+        client.create_table.assert_called_once()
+        job_configs = list(map(lambda call: call.kwargs['job_config'], client.load_table_from_file.call_args_list))
+        assert all(map(lambda job_config: job_config.write_disposition is None, job_configs))
+
+    def test_unsupported_full_load_mode(self, tmp_path, monkeypatch):
+        csv_file_path = self.prepare(tmp_path, monkeypatch, 1)
+        my_writer = fixtures.get_writer()
+        with pytest.raises(writer.UserException, match='^Unsupported full load mode: merge$'):
+            my_writer.write_table(csv_file_path, 'dataset', self.get_table_definition('merge'))
@@ -0,0 +1,40 @@
+import pytest
+from unittest.mock import MagicMock
+from google.api_core import exceptions as api_exceptions
+from google_bigquery_writer import writer, exceptions
+
+
+class TestWriterVerifyProject:
+
+    def get_client(self, project='my-project'):
+        client = MagicMock()
+        client.project = project
+        return client
+
+    def test_verify_project_is_memoized(self):
+        client = self.get_client()
+        my_writer = writer.Writer(client)
+        my_writer.verify_project()
+        my_writer.verify_project()
+        assert client.get_service_account_email.call_count == 1
+        client.list_projects.assert_not_called()
+
+    def test_verify_project_not_found(self):
+        client = self.get_client()
+        client.get_service_account_email = MagicMock(side_effect=api_exceptions.NotFound('Not found'))
+        my_writer = writer.Writer(client)
+        for _ in range(2):
+            with pytest.raises(exceptions.UserException, match='Project my-project was not found.'):
+                my_writer.verify_project()
+        assert client.get_service_account_email.call_count == 1
+
+    def test_verify_project_access_denied_falls_back_to_project_list(self):
+        client = self.get_client()
+        client.get_service_account_email = MagicMock(side_effect=api_exceptions.Forbidden('Access Denied'))
+        other_project = MagicMock()
+        other_project.project_id = 'other-project'
+        client.list_projects = MagicMock(return_value=[other_project])
+        my_writer = writer.Writer(client)
+        with pytest.raises(exceptions.UserException, match='Project my-project was not found.'):
+            my_writer.verify_project()
+        assert client.list_projects.call_count == 1